@@ -0,0 +1,124 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class IngestBackpressure:
+    """Paces OpenCTI delivery to the backlog of the connector queue
+
+    The queue fill level, as a fraction of CONNECTOR_QUEUE_THRESHOLD, is
+    read through the helper at most once per poll interval. Above the high
+    watermark the send concurrency and the aggregate batch size are halved;
+    below the low watermark they grow back step by step up to their
+    configured maximum. Once the threshold is reached delivery pauses until
+    the backlog drains below the high watermark, while the stages feeding
+    it keep working until their queues fill up.
+
+    A batch size of 0 is unbounded. It is reduced from REFERENCE_BATCH_SIZE
+    under pressure, and becomes unbounded again once it grows back to it.
+    """
+
+    LOW_WATERMARK = 0.5
+    HIGH_WATERMARK = 0.8
+    REFERENCE_BATCH_SIZE = 50
+
+    def __init__(
+        self,
+        helper,
+        max_concurrency: int,
+        max_batch_size: int,
+        poll_interval: float,
+        max_wait: float,
+    ):
+        self.helper = helper
+        self.logger = helper.connector_logger
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_batch_size = max(0, int(max_batch_size))
+        self.poll_interval = float(poll_interval)
+        self.max_wait = float(max_wait)
+        self.concurrency = self.max_concurrency
+        self.batch_size = self.max_batch_size
+        self.paused = False
+        self.load = 0.0
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self._checked_at = None
+
+    def queue_load(self) -> float:
+        """Connector queue size as a fraction of the queue threshold"""
+        self.helper.check_connector_buffering()
+        info = self.helper.connector_info
+        threshold = float(info.queue_threshold or 0)
+        if threshold <= 0:
+            return 0.0
+        return float(info.queue_messages_size or 0) / threshold
+
+    def refresh(self) -> None:
+        with self.condition:
+            now = time.monotonic()
+            if (
+                self._checked_at is not None
+                and now - self._checked_at < self.poll_interval
+            ):
+                return
+            self._checked_at = now
+        try:
+            load = self.queue_load()
+        except Exception as e:
+            self.logger.error(f"Connector queue check failed: {str(e)}")
+            return
+        with self.condition:
+            self.adjust(load)
+            self.condition.notify_all()
+
+    def adjust(self, load: float) -> None:
+        previous = (self.paused, self.concurrency, self.batch_size)
+        self.load = load
+        if load >= 1.0:
+            self.paused = True
+            self.concurrency = 1
+            self.batch_size = 1
+        elif load >= self.HIGH_WATERMARK:
+            if not self.paused:
+                self.concurrency = max(1, self.concurrency // 2)
+                self.batch_size = max(1, (self.batch_size or self._ceiling) // 2)
+        else:
+            self.paused = False
+            if load < self.LOW_WATERMARK:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                if self.batch_size:
+                    grown = self.batch_size + max(1, self._ceiling // 4)
+                    self.batch_size = (
+                        grown if grown < self._ceiling else self.max_batch_size
+                    )
+        if (self.paused, self.concurrency, self.batch_size) != previous:
+            self.logger.info(
+                f"Connector queue at {load:.0%} of threshold - Paused: {self.paused}, Concurrency: {self.concurrency}, Batch size: {self.batch_size or 'unbounded'}"
+            )
+
+    @property
+    def _ceiling(self) -> int:
+        return self.max_batch_size or self.REFERENCE_BATCH_SIZE
+
+    @contextmanager
+    def slot(self):
+        """Holds a delivery until the platform can take it"""
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            self.refresh()
+            with self.condition:
+                if not self.paused and self.in_flight < self.concurrency:
+                    self.in_flight += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        "OpenCTI ingestion still behind after OPENCTI_QUEUE_MAX_WAIT"
+                    )
+                self.condition.wait(min(remaining, max(self.poll_interval, 0.01)))
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
@@ -0,0 +1,105 @@
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Iterator, List
+from urllib.parse import urlparse
+
+_TOKEN = re.compile(r"\S+\s*")
+
+
+class _DomainModel:
+    __slots__ = ("pages", "seen", "counts")
+
+    def __init__(self):
+        # Pages counted so far, and the IDs of the most recent ones
+        self.pages = 0
+        self.seen: "OrderedDict[object, None]" = OrderedDict()
+        self.counts = Counter()
+
+
+class BoilerplateStripper:
+    """Learns text blocks repeated across pages of a site and strips them
+
+    Page text is flattened, so blocks are fingerprinted as word shingles.
+    A shingle seen on at least min_pages pages and min_ratio of the pages of
+    its domain is chrome (navigation, banners, footers); every run of words
+    covered by such shingles is removed before the text goes to txt2stix.
+
+    Pages are recognized as already counted by their ID among the last
+    max_seen_pages of their domain, which covers records fetched again on
+    later runs while the ID window stays bounded.
+    """
+
+    def __init__(
+        self,
+        min_pages: int,
+        min_ratio: float,
+        shingle_size: int = 8,
+        max_domains: int = 500,
+        max_fingerprints: int = 200000,
+        max_seen_pages: int = 10000,
+    ):
+        self.min_pages = min_pages
+        self.min_ratio = min_ratio
+        self.shingle_size = shingle_size
+        self.max_domains = max_domains
+        self.max_fingerprints = max_fingerprints
+        self.max_seen_pages = max_seen_pages
+        self.domains: "OrderedDict[str, _DomainModel]" = OrderedDict()
+
+    @staticmethod
+    def _domain(url: str) -> str:
+        return (urlparse(url or "").hostname or "").lower()
+
+    def _shingles(self, words: List[str]) -> Iterator[int]:
+        size = self.shingle_size
+        for i in range(len(words) - size + 1):
+            yield hash(tuple(words[i : i + size]))
+
+    def _model(self, domain: str) -> _DomainModel:
+        model = self.domains.get(domain)
+        if model is None:
+            model = self.domains[domain] = _DomainModel()
+            if len(self.domains) > self.max_domains:
+                self.domains.popitem(last=False)
+        self.domains.move_to_end(domain)
+        return model
+
+    def observe(self, page_id, url: str, text: str) -> None:
+        """Counts the shingles of a page once per page"""
+        model = self._model(self._domain(url))
+        if page_id in model.seen:
+            model.seen.move_to_end(page_id)
+            return
+        model.seen[page_id] = None
+        if len(model.seen) > self.max_seen_pages:
+            model.seen.popitem(last=False)
+        model.pages += 1
+        words = text.lower().split()
+        model.counts.update(set(self._shingles(words)))
+        if len(model.counts) > self.max_fingerprints:
+            # Shingles seen on a single page can never be boilerplate yet
+            model.counts = Counter(
+                {fp: count for fp, count in model.counts.items() if count > 1}
+            )
+
+    def strip(self, url: str, text: str) -> str:
+        model = self.domains.get(self._domain(url))
+        if model is None:
+            return text
+        threshold = max(self.min_pages, math.ceil(self.min_ratio * model.pages))
+        if model.pages < threshold:
+            return text
+
+        tokens = _TOKEN.findall(text)
+        words = [token.rstrip().lower() for token in tokens]
+        covered = bytearray(len(tokens))
+        for i, fingerprint in enumerate(self._shingles(words)):
+            if model.counts.get(fingerprint, 0) >= threshold:
+                covered[i : i + self.shingle_size] = b"\x01" * self.shingle_size
+
+        stripped = "".join(
+            token for token, is_chrome in zip(tokens, covered) if not is_chrome
+        )
+        # A page made only of chrome is left alone rather than sent empty
+        return stripped if stripped.strip() else text
@@ -0,0 +1,144 @@
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+_TOKEN = re.compile(r"\S+\s*")
+
+# Rough characters per LLM token for English/forum text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_text(text: str, max_tokens: int, overlap_tokens: int) -> List[str]:
+    """
+    Splits text on word boundaries into chunks of at most max_tokens
+    estimated tokens, each starting overlap_tokens before the previous end
+    """
+    words = _TOKEN.findall(text)
+    costs = [estimate_tokens(word) for word in words]
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        end, budget = start, max_tokens
+        while end < len(words) and (costs[end] <= budget or end == start):
+            budget -= costs[end]
+            end += 1
+        chunks.append("".join(words[start:end]).strip())
+        if end >= len(words):
+            break
+
+        # Step back over the overlap, always moving forward at least one word
+        next_start, overlap = end, overlap_tokens
+        while next_start - 1 > start and costs[next_start - 1] <= overlap:
+            overlap -= costs[next_start - 1]
+            next_start -= 1
+        start = next_start
+    return chunks
+
+
+def _dedup_key(obj: Dict) -> Optional[Tuple[str, str]]:
+    value = obj.get("value")
+    if value is None and obj.get("type") == "file":
+        value = obj.get("name")
+    return (obj["type"], value) if value is not None else None
+
+
+def _remap_refs(value, id_map: Dict[str, str]):
+    if isinstance(value, str):
+        return id_map.get(value, value)
+    if isinstance(value, list):
+        remapped = []
+        for item in value:
+            item = _remap_refs(item, id_map)
+            if item not in remapped:
+                remapped.append(item)
+        return remapped
+    if isinstance(value, dict):
+        return {
+            key: (
+                _remap_refs(item, id_map)
+                if key.endswith("_ref") or key.endswith("_refs")
+                else item
+            )
+            for key, item in value.items()
+        }
+    return value
+
+
+def merge_bundles(bundles: List[Dict], description: str = None) -> Dict:
+    """
+    Merges txt2stix bundles extracted from chunks of one page
+
+    Objects are de-duplicated by STIX ID, then by (type, value); references
+    to a dropped duplicate are pointed at the object that was kept. Reports
+    sharing an ID are combined by taking the union of their object_refs.
+    """
+    objects: Dict[str, Dict] = {}
+    by_value: Dict[Tuple[str, str], str] = {}
+    id_map: Dict[str, str] = {}
+
+    for bundle in bundles:
+        for obj in bundle.get("objects", []):
+            key = _dedup_key(obj)
+            if key in by_value and by_value[key] != obj["id"]:
+                id_map[obj["id"]] = by_value[key]
+                continue
+            if key:
+                by_value[key] = obj["id"]
+
+            existing = objects.get(obj["id"])
+            if existing is None:
+                objects[obj["id"]] = dict(obj)
+            elif "object_refs" in obj:
+                refs = existing.setdefault("object_refs", [])
+                refs.extend(ref for ref in obj["object_refs"] if ref not in refs)
+
+    # Relationships that became identical once their ends were merged
+    relationships: Dict[Tuple[str, str, str], str] = {}
+    for obj in objects.values():
+        if obj["type"] == "relationship":
+            signature = (
+                id_map.get(obj["source_ref"], obj["source_ref"]),
+                obj["relationship_type"],
+                id_map.get(obj["target_ref"], obj["target_ref"]),
+            )
+            kept = relationships.setdefault(signature, obj["id"])
+            if kept != obj["id"]:
+                id_map[obj["id"]] = kept
+
+    merged = []
+    for obj in objects.values():
+        if obj["id"] in id_map:
+            continue
+        obj = _remap_refs(obj, id_map)
+        if obj["type"] == "report" and description is not None:
+            obj["description"] = description
+        merged.append(obj)
+
+    first = bundles[0] if bundles else {"type": "bundle"}
+    return {**first, "objects": merged}
+
+
+def merge_data(data: List[Dict]) -> Dict:
+    """Merges the txt2stix data objects (extractions, relationships) of chunks"""
+    merged = {"content_check": None, "extractions": None, "relationships": []}
+    for item in data:
+        content_check = item.get("content_check")
+        if content_check and (
+            merged["content_check"] is None
+            or content_check.get("describes_incident")
+            and not merged["content_check"].get("describes_incident")
+        ):
+            merged["content_check"] = content_check
+        for source, extractions in (item.get("extractions") or {}).items():
+            merged["extractions"] = merged["extractions"] or {}
+            merged["extractions"].setdefault(source, []).extend(extractions)
+        merged["relationships"].extend(item.get("relationships") or [])
+        for key, value in item.items():
+            merged.setdefault(key, value)
+    return merged
@@ -1,13 +1,38 @@
-from .v2.classifier import DataClassifierSingleton
-from .v3_2.classifier import DataClassifierSingletonV32
+from .inference_server import InferenceClient
+from ..config_variables import ConfigConnector
 from ..db import DBSingleton
+from ..metrics import CLASSIFY_V2, CLASSIFY_V3, stage_timer
+from ..tracing import span
+
+
+class _RemoteModel:
+    """Forwards classify_data calls for one model to the inference server"""
+
+    def __init__(self, client: InferenceClient, name: str):
+        self.client = client
+        self.name = name
+
+    def classify_data(self, text: str, entity_id: int, features: dict) -> dict:
+        return self.client.classify(self.name, text, features)
 
 
 class DataClassifier:
 
     def __init__(self):
-        self.classifier_v2 = DataClassifierSingleton.get_instance()
-        self.classifier_v32 = DataClassifierSingletonV32.get_instance()
+        self.config = ConfigConnector()
+        if self.config.classifier_server_url:
+            # Client mode: models live in the shared inference server
+            client = InferenceClient(
+                self.config.classifier_server_url, self.config.classifier_timeout
+            )
+            self.classifier_v2 = _RemoteModel(client, "v2")
+            self.classifier_v32 = _RemoteModel(client, "v32")
+        else:
+            from .v2.classifier import DataClassifierSingleton
+            from .v3_2.classifier import DataClassifierSingletonV32
+
+            self.classifier_v2 = DataClassifierSingleton.get_instance()
+            self.classifier_v32 = DataClassifierSingletonV32.get_instance()
         self.db_handler = DBSingleton().get_instance()
 
     def classify_data(self, text: str, entity_id: int) -> None:
@@ -18,8 +43,14 @@ class DataClassifier:
             "Obfuscation Level": 1,  # Example encoded value for "Monitoring"
         }
 
-        result = self.classifier_v2.classify_data(text, entity_id, additional_features)
-        self.db_handler.save_classification(entity_id, result)
+        with stage_timer(CLASSIFY_V2), span(
+            "classifier.predict", entity_id, model="v2"
+        ):
+            result = self.classifier_v2.classify_data(
+                text, entity_id, additional_features
+            )
+        with span("db.save_classification", entity_id, model="v2"):
+            self.db_handler.save_classification(entity_id, result)
 
         additional_features32 = {
             "sentiment": -0.32,
@@ -27,7 +58,11 @@ class DataClassifier:
             "obfuscation": 12,
         }
 
-        result = self.classifier_v32.classify_data(
-            text, entity_id, additional_features32
-        )
-        self.db_handler.save_classificationv3(entity_id, result)
+        with stage_timer(CLASSIFY_V3), span(
+            "classifier.predict", entity_id, model="v32"
+        ):
+            result = self.classifier_v32.classify_data(
+                text, entity_id, additional_features32
+            )
+        with span("db.save_classification", entity_id, model="v32"):
+            self.db_handler.save_classificationv3(entity_id, result)
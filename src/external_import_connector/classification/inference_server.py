@@ -0,0 +1,244 @@
+import http.client
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from ..config_variables import ConfigConnector
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collects single-sample requests into bounded micro-batches
+
+    With validate, each request's features are checked before batching, so
+    an invalid request fails alone instead of failing its whole batch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        classify_batch: Callable[[List[Tuple[str, Dict]]], List[Dict]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        validate: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.name = name
+        self.classify_batch = classify_batch
+        self.validate = validate
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000)
+        self.requests: "queue.Queue[Tuple[str, Dict, Future]]" = queue.Queue()
+        self.worker = threading.Thread(
+            target=self._run, name=f"batcher-{name}", daemon=True
+        )
+        self.worker.start()
+
+    def submit(self, text: str, features: Dict) -> Future:
+        future = Future()
+        self.requests.put((text, features, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[str, Dict, Future]]) -> None:
+        if self.validate:
+            batch = [request for request in batch if self._is_valid(*request)]
+            if not batch:
+                return
+        try:
+            results = self.classify_batch(
+                [(text, features) for text, features, _ in batch]
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+        logger.debug(f"{self.name}: classified batch of {len(batch)}")
+
+    def _is_valid(self, text: str, features: Dict, future: Future) -> bool:
+        try:
+            self.validate(features)
+        except Exception as e:
+            future.set_exception(e)
+            return False
+        return True
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler routing POST /classify/<model> to the model batchers"""
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"status": "ok", "models": list(self.server.batchers)})
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        model = self.path.rsplit("/", 1)[-1]
+        batcher = self.server.batchers.get(model)
+        if not self.path.startswith("/classify/") or batcher is None:
+            self._reply(404, {"error": f"Unknown model endpoint {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            result = batcher.submit(payload["text"], payload["features"]).result()
+            self._reply(200, result)
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+
+    def _reply(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+
+class InferenceServer:
+    """Hosts the V2 and V3.2 classifiers behind a local micro-batching endpoint"""
+
+    def __init__(self, config: ConfigConnector = None):
+        self.config = config or ConfigConnector()
+        self.listen = urlparse(self.config.classifier_server_listen)
+
+    def _load_batchers(self) -> Dict[str, MicroBatcher]:
+        from .v2.classifier import DataClassifierSingleton
+        from .v3_2.classifier import DataClassifierSingletonV32
+
+        models = {
+            "v2": DataClassifierSingleton.get_instance(),
+            "v32": DataClassifierSingletonV32.get_instance(),
+        }
+        return {
+            name: MicroBatcher(
+                name,
+                model.classify_batch,
+                self.config.classifier_max_batch_size,
+                self.config.classifier_max_wait_ms,
+                getattr(model, "validate", None),
+            )
+            for name, model in models.items()
+        }
+
+    def serve_forever(self) -> None:
+        if self.listen.scheme == "unix":
+            server = _ThreadingUnixHTTPServer(self.listen.path, _RequestHandler)
+        else:
+            server = ThreadingHTTPServer(
+                (self.listen.hostname or "127.0.0.1", self.listen.port or 8765),
+                _RequestHandler,
+            )
+        server.batchers = self._load_batchers()
+        logger.info(
+            f"Classifier inference server listening on {self.config.classifier_server_listen}"
+        )
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class InferenceClient:
+    """Client side of InferenceServer, mirrors DataClassifierV2/V32.classify_data"""
+
+    def __init__(self, url: str, timeout: float = 60):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        # Keep-alive connection per calling thread
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            if self.url.scheme == "unix":
+                conn = _UnixHTTPConnection(self.url.path, self.timeout)
+            else:
+                conn = http.client.HTTPConnection(
+                    self.url.hostname, self.url.port or 8765, timeout=self.timeout
+                )
+            self.local.conn = conn
+        return conn
+
+    def classify(self, model: str, text: str, features: Dict) -> Dict:
+        body = json.dumps({"text": text, "features": features})
+        conn = self._connection()
+        try:
+            conn.request(
+                "POST",
+                f"/classify/{model}",
+                body=body,
+                headers={"Content-Type": "application/json"},
+            )
+            response = conn.getresponse()
+            payload = json.loads(response.read())
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self.local.conn = None
+            raise
+        if response.status != 200:
+            raise RuntimeError(
+                f"Inference server error for {model}: {payload.get('error')}"
+            )
+        return payload
+
+
+if __name__ == "__main__":
+    """
+    Run from the connector's src directory so the model paths resolve:
+    python3 -m external_import_connector.classification.inference_server
+    """
+    logging.basicConfig(level=logging.INFO)
+    InferenceServer().serve_forever()
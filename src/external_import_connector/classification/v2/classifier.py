@@ -1,5 +1,5 @@
 import os
-from typing import Dict
+from typing import Dict, List, Tuple
 from threading import Lock
 import joblib
 import pandas as pd
@@ -29,29 +29,40 @@ class DataClassifierV2:
         self, data: str, processed_data_id: int, additional_features: Dict
     ) -> Dict:
         """Classify the input data using the pre-trained model."""
-        # Ensure all required features are present
-        for column in self.required_columns:
-            if column not in additional_features:
-                additional_features[column] = (
-                    "Unknown"  # Default value for missing features
-                )
+        return self.classify_batch([(data, additional_features)])[0]
 
-        # Combine text content with additional features
-        input_data = pd.DataFrame([{**additional_features, "Content": data}])
+    def classify_batch(self, items: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Classify several (text, additional_features) pairs in one model call."""
+        rows = []
+        for data, additional_features in items:
+            # Ensure all required features are present
+            for column in self.required_columns:
+                if column not in additional_features:
+                    additional_features[column] = (
+                        "Unknown"  # Default value for missing features
+                    )
+
+            # Combine text content with additional features
+            rows.append({**additional_features, "Content": data})
+
+        input_data = pd.DataFrame(rows)
 
         # Predict using the model
         try:
-            prediction = self.model.predict(input_data)[0]
-            prediction_proba = self.model.predict_proba(input_data)[0]
+            predictions = self.model.predict(input_data)
+            predictions_proba = self.model.predict_proba(input_data)
         except Exception as e:
             raise ValueError(f"Error during prediction: {e}")
 
-        # Map prediction to label
-        label = "Exploit" if prediction == 1 else "Non-Exploit"
-
-        result = {"category": label, "confidence": max(prediction_proba)}
+        results = []
+        for prediction, prediction_proba in zip(predictions, predictions_proba):
+            # Map prediction to label
+            label = "Exploit" if prediction == 1 else "Non-Exploit"
+            results.append(
+                {"category": label, "confidence": float(max(prediction_proba))}
+            )
 
-        return result
+        return results
 
 
 class DataClassifierSingleton:
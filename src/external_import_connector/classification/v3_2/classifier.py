@@ -3,7 +3,7 @@ import joblib
 import pandas as pd
 import numpy as np
 from threading import Lock
-from typing import Dict
+from typing import Dict, List, Tuple
 from tensorflow.keras.models import load_model
 
 
@@ -59,14 +59,25 @@ class DataClassifierV32:
         Returns:
             Dictionary with classification results
         """
-        # Validate input features
+        return self.classify_batch([(raw_content, features)])[0]
+
+    def validate(self, features: Dict) -> None:
+        """Raises ValueError if a required feature is missing."""
         for feat in self.required_features:
             if feat not in features:
                 raise ValueError(f"Missing required feature: {feat}")
 
+    def classify_batch(self, items: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Classify several (raw_content, features) pairs in one forward pass."""
+        # Validate input features
+        for _, features in items:
+            self.validate(features)
+
         # Process text features
         # with self.lock:
-        text_vector = self.tfidf.transform([raw_content]).toarray()
+        text_vector = self.tfidf.transform(
+            [raw_content for raw_content, _ in items]
+        ).toarray()
 
         # Process numerical features
         numerical_features = pd.DataFrame(
@@ -76,6 +87,7 @@ class DataClassifierV32:
                     features["keyword_count"],
                     features["obfuscation"],
                 ]
+                for _, features in items
             ],
             columns=self.required_features,
         )
@@ -88,27 +100,33 @@ class DataClassifierV32:
         # Make prediction
         # with self.lock:
         #     try:
-        probabilities = self.model.predict(combined_input, verbose=0)[0]
-        prediction = int(np.argmax(probabilities))
-        confidence = float(np.max(probabilities))
+        batch_probabilities = self.model.predict(
+            combined_input, batch_size=len(items), verbose=0
+        )
         # except Exception as e:
         #     raise RuntimeError(f"Classification failed: {str(e)}")
 
         # Format results
-        result = {
-            "category": "Exploit" if prediction == 1 else "Non-Exploit",
-            "confidence": confidence,
-            "probabilities": {
-                "Non-Exploit": float(probabilities[0]),
-                "Exploit": float(probabilities[1]),
-            },
-        }
+        results = []
+        for probabilities in batch_probabilities:
+            prediction = int(np.argmax(probabilities))
+            confidence = float(np.max(probabilities))
+            results.append(
+                {
+                    "category": "Exploit" if prediction == 1 else "Non-Exploit",
+                    "confidence": confidence,
+                    "probabilities": {
+                        "Non-Exploit": float(probabilities[0]),
+                        "Exploit": float(probabilities[1]),
+                    },
+                }
+            )
 
         # Save to database
         # db = SaveDBSingleton.get_instance()
         # db.save_classificationv3(processed_data_id, result)
 
-        return result
+        return results
 
 
 class DataClassifierSingletonV32:
@@ -1,5 +1,6 @@
 from .record_repository import RecordRepository
 from .classification.classifier import DataClassifier
+from .tracing import span
 
 
 class ClassificationManager:
@@ -11,10 +12,15 @@ class ClassificationManager:
 
     def ensure_classification(self, record_data: dict) -> None:
         """Ensures V2/V3 classifications exist"""
-        if self._needs_classification(record_data["id"]):
-            self.classifier.classify_data(record_data["html"], record_data["id"])
+        with span("classification.ensure", record_data["id"]):
+            if self._needs_classification(record_data["id"]):
+                self.classifier.classify_data(record_data["html"], record_data["id"])
 
     def _needs_classification(self, record_id: int) -> bool:
+        with span("db.get_classification_results", record_id):
+            return self._missing_classification(record_id)
+
+    def _missing_classification(self, record_id: int) -> bool:
         return not self.db.get_classification_results(
             record_id, "classification_results"
         ) or not self.db.get_classification_results(
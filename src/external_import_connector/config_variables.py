@@ -115,3 +115,425 @@ class ConfigConnector:
             ["connector", "vulmatch_api_key"],
             self.load,
         )
+
+        # Shared classifier inference service
+        self.classifier_server_url = get_config_variable(
+            "CLASSIFIER_SERVER_URL",
+            ["connector", "classifier_server_url"],
+            self.load,
+        )
+        self.classifier_server_listen = get_config_variable(
+            "CLASSIFIER_SERVER_LISTEN",
+            ["connector", "classifier_server_listen"],
+            self.load,
+            default="http://127.0.0.1:8765",
+        )
+        self.classifier_max_batch_size = get_config_variable(
+            "CLASSIFIER_MAX_BATCH_SIZE",
+            ["connector", "classifier_max_batch_size"],
+            self.load,
+            isNumber=True,
+            default=32,
+        )
+        self.classifier_max_wait_ms = get_config_variable(
+            "CLASSIFIER_MAX_WAIT_MS",
+            ["connector", "classifier_max_wait_ms"],
+            self.load,
+            isNumber=True,
+            default=10,
+        )
+        self.classifier_timeout = get_config_variable(
+            "CLASSIFIER_TIMEOUT",
+            ["connector", "classifier_timeout"],
+            self.load,
+            isNumber=True,
+            default=60,
+        )
+
+        # txt2stix execution: "subprocess" (one python3 per record) or "inprocess"
+        self.txt2stix_mode = get_config_variable(
+            "TXT2STIX_MODE",
+            ["connector", "txt2stix_mode"],
+            self.load,
+            default="subprocess",
+        )
+
+        # Concurrent txt2stix execution and DeepSeek quota
+        self.txt2stix_workers = get_config_variable(
+            "TXT2STIX_WORKERS",
+            ["connector", "txt2stix_workers"],
+            self.load,
+            isNumber=True,
+            default=1,
+        )
+        self.deepseek_requests_per_minute = get_config_variable(
+            "DEEPSEEK_REQUESTS_PER_MINUTE",
+            ["connector", "deepseek_requests_per_minute"],
+            self.load,
+            isNumber=True,
+            default=60,
+        )
+        self.deepseek_burst = get_config_variable(
+            "DEEPSEEK_BURST",
+            ["connector", "deepseek_burst"],
+            self.load,
+            isNumber=True,
+            default=5,
+        )
+        self.deepseek_max_retries = get_config_variable(
+            "DEEPSEEK_MAX_RETRIES",
+            ["connector", "deepseek_max_retries"],
+            self.load,
+            isNumber=True,
+            default=5,
+        )
+
+        # Persistent cache of DeepSeek extraction responses
+        self.llm_cache_enabled = get_config_variable(
+            "LLM_CACHE_ENABLED",
+            ["connector", "llm_cache_enabled"],
+            self.load,
+            default=True,
+        )
+        self.llm_cache_path = get_config_variable(
+            "LLM_CACHE_PATH",
+            ["connector", "llm_cache_path"],
+            self.load,
+            default="cache/llm_cache.sqlite",
+        )
+        self.llm_cache_max_mb = get_config_variable(
+            "LLM_CACHE_MAX_MB",
+            ["connector", "llm_cache_max_mb"],
+            self.load,
+            isNumber=True,
+            default=256,
+        )
+
+        # Cross-page boilerplate stripping before txt2stix
+        self.boilerplate_stripping = get_config_variable(
+            "BOILERPLATE_STRIPPING",
+            ["connector", "boilerplate_stripping"],
+            self.load,
+            default=True,
+        )
+        self.boilerplate_min_pages = get_config_variable(
+            "BOILERPLATE_MIN_PAGES",
+            ["connector", "boilerplate_min_pages"],
+            self.load,
+            isNumber=True,
+            default=5,
+        )
+        self.boilerplate_min_ratio = get_config_variable(
+            "BOILERPLATE_MIN_RATIO",
+            ["connector", "boilerplate_min_ratio"],
+            self.load,
+            default=0.5,
+        )
+
+        # Token-budgeted chunking of large pages
+        self.txt2stix_chunk_tokens = get_config_variable(
+            "TXT2STIX_CHUNK_TOKENS",
+            ["connector", "txt2stix_chunk_tokens"],
+            self.load,
+            isNumber=True,
+            default=4000,
+        )
+        self.txt2stix_chunk_overlap_tokens = get_config_variable(
+            "TXT2STIX_CHUNK_OVERLAP_TOKENS",
+            ["connector", "txt2stix_chunk_overlap_tokens"],
+            self.load,
+            isNumber=True,
+            default=200,
+        )
+        self.txt2stix_chunk_workers = get_config_variable(
+            "TXT2STIX_CHUNK_WORKERS",
+            ["connector", "txt2stix_chunk_workers"],
+            self.load,
+            isNumber=True,
+            default=4,
+        )
+
+        # OpenCTI delivery: "record" (one work per record) or "aggregate"
+        self.opencti_delivery_mode = get_config_variable(
+            "OPENCTI_DELIVERY_MODE",
+            ["connector", "opencti_delivery_mode"],
+            self.load,
+            default="record",
+        )
+        self.opencti_aggregate_batch_size = get_config_variable(
+            "OPENCTI_AGGREGATE_BATCH_SIZE",
+            ["connector", "opencti_aggregate_batch_size"],
+            self.load,
+            isNumber=True,
+            default=50,
+        )
+
+        # Queue-based delivery through the OpenCTI workers
+        self.opencti_send_to_queue = get_config_variable(
+            "OPENCTI_SEND_TO_QUEUE",
+            ["connector", "opencti_send_to_queue"],
+            self.load,
+            default=False,
+        )
+        self.opencti_queue_max_wait = get_config_variable(
+            "OPENCTI_QUEUE_MAX_WAIT",
+            ["connector", "opencti_queue_max_wait"],
+            self.load,
+            isNumber=True,
+            default=600,
+        )
+        self.opencti_queue_poll_interval = get_config_variable(
+            "OPENCTI_QUEUE_POLL_INTERVAL",
+            ["connector", "opencti_queue_poll_interval"],
+            self.load,
+            isNumber=True,
+            default=30,
+        )
+        # Adapt send concurrency and batch size to the connector queue backlog
+        self.opencti_backpressure = get_config_variable(
+            "OPENCTI_BACKPRESSURE",
+            ["connector", "opencti_backpressure"],
+            self.load,
+            default=False,
+        )
+
+        # Local index of objects already delivered to OpenCTI
+        self.known_objects_enabled = get_config_variable(
+            "KNOWN_OBJECTS_ENABLED",
+            ["connector", "known_objects_enabled"],
+            self.load,
+            default=False,
+        )
+        self.known_objects_path = get_config_variable(
+            "KNOWN_OBJECTS_PATH",
+            ["connector", "known_objects_path"],
+            self.load,
+            default="cache/known_objects.sqlite",
+        )
+        self.known_objects_capacity = get_config_variable(
+            "KNOWN_OBJECTS_CAPACITY",
+            ["connector", "known_objects_capacity"],
+            self.load,
+            isNumber=True,
+            default=1000000,
+        )
+        self.known_objects_ttl_days = get_config_variable(
+            "KNOWN_OBJECTS_TTL_DAYS",
+            ["connector", "known_objects_ttl_days"],
+            self.load,
+            isNumber=True,
+            default=30,
+        )
+
+        # Lifetime of cached OpenCTI entity lookups, in seconds
+        self.entity_cache_ttl = get_config_variable(
+            "ENTITY_CACHE_TTL",
+            ["connector", "entity_cache_ttl"],
+            self.load,
+            isNumber=True,
+            default=300,
+        )
+
+        # Parallel OpenCTI delivery with per-call timeouts and retries
+        self.opencti_workers = get_config_variable(
+            "OPENCTI_WORKERS",
+            ["connector", "opencti_workers"],
+            self.load,
+            isNumber=True,
+            default=1,
+        )
+        self.opencti_max_retries = get_config_variable(
+            "OPENCTI_MAX_RETRIES",
+            ["connector", "opencti_max_retries"],
+            self.load,
+            isNumber=True,
+            default=3,
+        )
+        self.opencti_import_timeout = get_config_variable(
+            "OPENCTI_IMPORT_TIMEOUT",
+            ["connector", "opencti_import_timeout"],
+            self.load,
+            isNumber=True,
+            default=300,
+        )
+        self.opencti_work_timeout = get_config_variable(
+            "OPENCTI_WORK_TIMEOUT",
+            ["connector", "opencti_work_timeout"],
+            self.load,
+            isNumber=True,
+            default=30,
+        )
+        self.opencti_lookup_timeout = get_config_variable(
+            "OPENCTI_LOOKUP_TIMEOUT",
+            ["connector", "opencti_lookup_timeout"],
+            self.load,
+            isNumber=True,
+            default=60,
+        )
+
+        # Send only objects that changed since a source URL was last delivered
+        self.delta_bundles_enabled = get_config_variable(
+            "DELTA_BUNDLES_ENABLED",
+            ["connector", "delta_bundles_enabled"],
+            self.load,
+            default=False,
+        )
+        self.delta_bundles_path = get_config_variable(
+            "DELTA_BUNDLES_PATH",
+            ["connector", "delta_bundles_path"],
+            self.load,
+            default="cache/delta_bundles.sqlite",
+        )
+
+        # Pipeline execution: "streaming" (chained generators) or "staged"
+        self.pipeline_mode = get_config_variable(
+            "PIPELINE_MODE",
+            ["connector", "pipeline_mode"],
+            self.load,
+            default="streaming",
+        )
+        self.pipeline_classify_workers = get_config_variable(
+            "PIPELINE_CLASSIFY_WORKERS",
+            ["connector", "pipeline_classify_workers"],
+            self.load,
+            isNumber=True,
+            default=1,
+        )
+        self.pipeline_queue_size = get_config_variable(
+            "PIPELINE_QUEUE_SIZE",
+            ["connector", "pipeline_queue_size"],
+            self.load,
+            isNumber=True,
+            default=8,
+        )
+
+        # Tracing spans: 'none', 'jsonl', 'console' or a 'module:Class' exporter
+        self.tracing_exporter = get_config_variable(
+            "TRACING_EXPORTER",
+            ["connector", "tracing_exporter"],
+            self.load,
+            default="none",
+        )
+        self.tracing_path = get_config_variable(
+            "TRACING_PATH",
+            ["connector", "tracing_path"],
+            self.load,
+            default="traces/spans.jsonl",
+        )
+
+        # Memory accounting per run, and the RSS ceiling that restarts the process
+        self.memory_monitoring = get_config_variable(
+            "MEMORY_MONITORING",
+            ["connector", "memory_monitoring"],
+            self.load,
+            default=False,
+        )
+        self.memory_tracemalloc_frames = get_config_variable(
+            "MEMORY_TRACEMALLOC_FRAMES",
+            ["connector", "memory_tracemalloc_frames"],
+            self.load,
+            isNumber=True,
+            default=0,
+        )
+        self.memory_rss_limit_mb = get_config_variable(
+            "MEMORY_RSS_LIMIT_MB",
+            ["connector", "memory_rss_limit_mb"],
+            self.load,
+            isNumber=True,
+            default=0,
+        )
+
+        # Profile N (profiling_runs) out of every M (profiling_every) runs
+        self.profiling_mode = get_config_variable(
+            "PROFILING_MODE",
+            ["connector", "profiling_mode"],
+            self.load,
+            default="none",
+        )
+        self.profiling_runs = get_config_variable(
+            "PROFILING_RUNS",
+            ["connector", "profiling_runs"],
+            self.load,
+            isNumber=True,
+            default=1,
+        )
+        self.profiling_every = get_config_variable(
+            "PROFILING_EVERY",
+            ["connector", "profiling_every"],
+            self.load,
+            isNumber=True,
+            default=10,
+        )
+        self.profiling_dir = get_config_variable(
+            "PROFILING_DIR",
+            ["connector", "profiling_dir"],
+            self.load,
+            default="profiles",
+        )
+        self.profiling_keep = get_config_variable(
+            "PROFILING_KEEP",
+            ["connector", "profiling_keep"],
+            self.load,
+            isNumber=True,
+            default=20,
+        )
+
+        # Per-run budget: seconds and records admitted, 0 for no limit
+        self.run_max_seconds = get_config_variable(
+            "RUN_MAX_SECONDS",
+            ["connector", "run_max_seconds"],
+            self.load,
+            isNumber=True,
+            default=0,
+        )
+        self.run_max_records = get_config_variable(
+            "RUN_MAX_RECORDS",
+            ["connector", "run_max_records"],
+            self.load,
+            isNumber=True,
+            default=0,
+        )
+
+        # Retries of failing stages: backoff between attempts, then quarantine
+        self.stage_max_attempts = get_config_variable(
+            "STAGE_MAX_ATTEMPTS",
+            ["connector", "stage_max_attempts"],
+            self.load,
+            isNumber=True,
+            default=5,
+        )
+        self.stage_retry_base_delay = get_config_variable(
+            "STAGE_RETRY_BASE_DELAY",
+            ["connector", "stage_retry_base_delay"],
+            self.load,
+            isNumber=True,
+            default=300,
+        )
+        self.stage_retry_max_delay = get_config_variable(
+            "STAGE_RETRY_MAX_DELAY",
+            ["connector", "stage_retry_max_delay"],
+            self.load,
+            isNumber=True,
+            default=86400,
+        )
+
+        # Order each run's records by recency, exploit likelihood and keywords
+        self.priority_scheduling = get_config_variable(
+            "PRIORITY_SCHEDULING",
+            ["connector", "priority_scheduling"],
+            self.load,
+            default=True,
+        )
+        self.priority_recency_half_life_hours = get_config_variable(
+            "PRIORITY_RECENCY_HALF_LIFE_HOURS",
+            ["connector", "priority_recency_half_life_hours"],
+            self.load,
+            isNumber=True,
+            default=24,
+        )
+        self.priority_aging_per_day = get_config_variable(
+            "PRIORITY_AGING_PER_DAY",
+            ["connector", "priority_aging_per_day"],
+            self.load,
+            default=0.05,
+        )
@@ -1,11 +1,30 @@
+import threading
+from contextlib import nullcontext
+from typing import Iterable, Iterator, Optional, Tuple
+
 from pycti import OpenCTIApiClient, OpenCTIConnectorHelper
 from .classification.classifier import DataClassifier
 from .classify_manager import ClassificationManager
 from .config_variables import ConfigConnector
 from .lock_manager import LockManager
+from .memory import MemoryMonitor
+from .metrics import FETCH, RECORDS, observe_backlog, stage_timer
+from .opencti_client import OpenCTICaller, PooledSession, install_session
 from .opencti_processor import OpenCTIProcessor
+from .pipeline import Stage, StagedPipeline
+from .processing_state import (
+    CLASSIFY,
+    OPENCTI,
+    TXT2STIX,
+    ProcessingState,
+    RetryPolicy,
+)
+from .profiling import RunProfiler
 from .record_repository import RecordRepository
+from .run_budget import RunBudget
+from .scheduling import PriorityScheduler, meets_criteria
 from .text_to_stix_processor import Text2StixProcessor
+from .tracing import configure_tracing, span
 
 
 class DarcConnector:
@@ -13,6 +32,9 @@ class DarcConnector:
 
     def __init__(self):
         self.config = ConfigConnector()
+        self.tracer_provider = configure_tracing(
+            self.config.tracing_exporter, self.config.tracing_path
+        )
         self.helper = OpenCTIConnectorHelper(self.config.load)
         self.client = OpenCTIApiClient(self.config.url, self.config.token)
         self.logger = self.helper.connector_logger
@@ -22,72 +44,322 @@ class DarcConnector:
         self.lock_manager = LockManager()
         self.classifier = ClassificationManager(DataClassifier(), self.db)
         self.deepseek_processor = Text2StixProcessor(self.config, self.db, self.logger)
-        self.opencti_processor = OpenCTIProcessor(self.client, self.helper, self.db)
+
+        # One keep-alive pool shared by the connector's OpenCTI clients
+        opencti_session = PooledSession(max(10, 2 * int(self.config.opencti_workers)))
+        install_session(opencti_session, self.client, self.helper.api)
+        opencti_caller = OpenCTICaller(
+            opencti_session,
+            {
+                "import": self.config.opencti_import_timeout,
+                "work": self.config.opencti_work_timeout,
+                "lookup": self.config.opencti_lookup_timeout,
+            },
+            int(self.config.opencti_max_retries),
+        )
+        self.opencti_processor = OpenCTIProcessor(
+            self.client, self.helper, self.db, opencti_caller
+        )
+        self.processing_state = ProcessingState(
+            self.db,
+            RetryPolicy(
+                int(self.config.stage_max_attempts),
+                float(self.config.stage_retry_base_delay),
+                float(self.config.stage_retry_max_delay),
+            ),
+            self.logger,
+        )
+        self.memory = MemoryMonitor(
+            self.logger,
+            (
+                self.config.memory_tracemalloc_frames
+                if self.config.memory_monitoring
+                else 0
+            ),
+            self.config.memory_rss_limit_mb,
+        )
+        self.profiler = RunProfiler(
+            self.config.profiling_mode,
+            self.config.profiling_runs,
+            self.config.profiling_every,
+            self.config.profiling_dir,
+            self.config.profiling_keep,
+            self.logger,
+        )
+        self.scheduler = PriorityScheduler(
+            float(self.config.priority_recency_half_life_hours),
+            float(self.config.priority_aging_per_day),
+        )
 
     def process_data(self) -> None:
         """Main processing loop"""
-        with self.lock_manager.global_lock:
-            records = self.db.fetch_unprocessed()
-            if not records:
-                self.logger.info("No new records to process")
-                return
+        try:
+            budget = RunBudget(self.config.run_max_seconds, self.config.run_max_records)
+            memory = self.memory.run() if self.config.memory_monitoring else None
+            with memory or nullcontext(), self.profiler.profile(), span("run"):
+                self._process_records(budget)
+        finally:
+            self.lock_manager.prune()
+        if self.memory.over_limit():
+            self._recycle()
 
-        results = {"success": 0, "errors": 0, "not_classified": 0}
-        for record in records:
-            record_data = self.db.unpack_record(record)
-            if not record_data:
-                continue
+    def _recycle(self) -> None:
+        """Restarts the process between runs once RSS is above its ceiling"""
+        if self.tracer_provider:
+            self.tracer_provider.shutdown()
+        self.memory.recycle()
 
-            with self.lock_manager.acquire_record_lock(record_data["id"]):
-                status = self._process_record(record_data)
-                results[status] += 1
+    def _fetch_records(self, budget: RunBudget) -> Tuple[list, Optional[int]]:
+        """
+        Fetches the records of this run in processing order; with a record
+        budget, only the selected records' HTML is loaded
+        """
+        with self.lock_manager.global_lock, stage_timer(FETCH), span("fetch"):
+            rows = self.db.fetch_unprocessed(with_html=not budget.max_records)
+        records = [data for data in map(self.db.unpack_record, rows) if data]
+        observe_backlog([record_data["timestamp"] for record_data in records])
+        order = self._prioritize if self.config.priority_scheduling else None
+        if not budget.max_records or not records:
+            return (order(records) if order and records else records), None
+
+        cursor = self.db.get_run_cursor()
+        records = budget.select(records, cursor, order)
+        with stage_timer(FETCH), span("fetch_html", records=len(records)):
+            html = self.db.fetch_html([record_data["id"] for record_data in records])
+        for record_data in records:
+            record_data["html"] = html.get(record_data["id"]) or ""
+        return records, cursor
 
+    def _process_records(self, budget: RunBudget) -> None:
+        records, cursor = self._fetch_records(budget)
+        if not records:
+            self.logger.info("No new records to process")
+            return
+        selected = list(records)
+
+        self.deepseek_processor.learn_boilerplate(records)
+        self.opencti_processor.prefetch(records)
+
+        results = {"success": 0, "errors": 0, "not_classified": 0}
+        try:
+            self._run_pipeline(budget.admit(records), results)
+        finally:
+            if budget.max_records:
+                self.db.save_run_cursor(budget.cursor(selected, cursor))
+
+        if budget.stopped:
+            self.logger.info(
+                f"Run budget reached after {budget.elapsed:.0f}s - {len(records) - len(budget.admitted)} records left for the next run"
+            )
         self.logger.info(
             f"Processing complete - Successful: {results['success']}, Failed: {results['errors']}, Not Classified: {results['not_classified']}"
         )
 
-    def _process_record(self, record_data: dict) -> str:
+    def _run_pipeline(self, records: Iterator[dict], results: dict) -> None:
+        if self.config.pipeline_mode == "staged":
+            self._run_staged(records, results)
+            return
+
+        # Classification feeds the txt2stix pool lazily, so the two overlap;
+        # converted records come back in fetch order
+        ready = self._classified_records(records, results)
+        converted = self.deepseek_processor.process_many(ready)
+        deliverable = self._deliverable_records(converted, results)
+        if self.config.opencti_delivery_mode == "aggregate":
+            delivered = self._deliver_batches(deliverable)
+        else:
+            delivered = self.opencti_processor.process_many(deliverable)
+        for record_data, sent in delivered:
+            with self.lock_manager.acquire_record_lock(record_data["id"]):
+                results[self._complete_record(record_data, sent, OPENCTI)] += 1
+
+    def _prioritize(self, records: list) -> list:
+        """Orders records by priority, fast lane first"""
+        record_ids = [record_data["id"] for record_data in records]
         try:
-            self.classifier.ensure_classification(record_data)
+            v2 = self.db.get_latest_classifications(
+                "classification_results", record_ids
+            )
+            v3 = self.db.get_latest_classifications(
+                "classification_results_v3", record_ids
+            )
+        except Exception as e:
+            self.logger.error(f"Priority scheduling failed: {str(e)}")
+            return records
+        return self.scheduler.order(records, v2, v3)
 
-            if not self._meets_criteria(record_data["id"]):
-                return "not_classified"
+    def _run_staged(self, records: Iterable[dict], results: dict) -> None:
+        """
+        Runs classify -> txt2stix -> OpenCTI as overlapping stages, each
+        with its own workers, connected by bounded queues
+        """
+        results_lock = threading.Lock()
 
-            return "success" if self._execute_pipeline(record_data) else "errors"
+        def count(status: str) -> None:
+            with results_lock:
+                results[status] += 1
+
+        def classify(record_data: dict) -> Optional[dict]:
+            with self.lock_manager.acquire_record_lock(record_data["id"]):
+                status = self._classify_record(record_data)
+            if status:
+                count(status)
+                return None
+            return record_data
+
+        def convert(record_data: dict) -> Optional[dict]:
+            with self.lock_manager.acquire_record_lock(record_data["id"]):
+                try:
+                    converted = record_data[
+                        "sent_to_deepseek"
+                    ] or self.deepseek_processor.process(record_data)
+                except Exception as e:
+                    self.logger.error(
+                        f"txt2stix stage failed for {record_data['id']}: {str(e)}"
+                    )
+                    record_data["last_error"] = str(e)
+                    converted = False
+                if converted and not record_data["sent_to_opencti"]:
+                    return record_data
+                count(self._complete_record(record_data, converted, TXT2STIX))
+            return None
+
+        def complete(record_data: dict, sent: bool) -> None:
+            with self.lock_manager.acquire_record_lock(record_data["id"]):
+                count(self._complete_record(record_data, sent, OPENCTI))
+
+        if self.config.opencti_delivery_mode == "aggregate":
+            batch = []
+
+            def flush() -> None:
+                for record_data, sent in self._deliver_batch(list(batch)):
+                    complete(record_data, sent)
+                batch.clear()
+
+            def deliver(record_data: dict) -> None:
+                batch.append(record_data)
+                if self.opencti_processor.batch_full(batch):
+                    flush()
+
+            # Batches are built by a single worker
+            delivery = Stage("opencti", deliver, 1, on_close=flush)
+        else:
+
+            def deliver(record_data: dict) -> None:
+                try:
+                    sent = self.opencti_processor.process(record_data)
+                except Exception as e:
+                    self.logger.error(
+                        f"Pipeline failed for {record_data['id']}: {str(e)}"
+                    )
+                    record_data["last_error"] = str(e)
+                    sent = False
+                complete(record_data, sent)
+
+            delivery = Stage("opencti", deliver, self.config.opencti_workers)
+
+        pipeline = StagedPipeline(
+            [
+                Stage("classify", classify, self.config.pipeline_classify_workers),
+                Stage("txt2stix", convert, self.config.txt2stix_workers),
+                delivery,
+            ],
+            self.config.pipeline_queue_size,
+            self.logger,
+        )
+        pipeline.run(records)
+
+    def _classified_records(
+        self, records: Iterable[dict], results: dict
+    ) -> Iterator[dict]:
+        """Yields the records that pass classification, counting the others"""
+        for record_data in records:
+            with self.lock_manager.acquire_record_lock(record_data["id"]):
+                status = self._classify_record(record_data)
+            if status:
+                results[status] += 1
+            else:
+                yield record_data
+
+    def _classify_record(self, record_data: dict) -> Optional[str]:
+        """Returns a final status, or None when the record goes on to txt2stix"""
+        try:
+            with span("classify", record_data["id"]):
+                self.classifier.ensure_classification(record_data)
+
+                if not self._meets_criteria(record_data["id"]):
+                    return self._outcome("not_classified")
+                return None
         except Exception as e:
             self.logger.error(
                 f"Error processing {record_data['id']}: {str(e)}", exc_info=True
             )
-            return "errors"
+            self.processing_state.failed(record_data["id"], CLASSIFY, str(e))
+            return self._outcome("errors")
 
     def _meets_criteria(self, record_id: int) -> bool:
         v2 = self.db.get_classification_results(record_id, "classification_results")
         v3 = self.db.get_classification_results(record_id, "classification_results_v3")
-        return (
-            v2
-            and v3
-            and v2["category"] == "Exploit"
-            and v3["category"] == "Exploit"
-            and v2["confidence"] > 0.9
-            and v3["confidence"] > 0.9
-        )
+        return meets_criteria(v2, v3)
+
+    def _deliverable_records(self, converted, results: dict) -> Iterator[dict]:
+        """Yields converted records still to be sent to OpenCTI"""
+        for record_data, ok in converted:
+            if ok and not record_data["sent_to_opencti"]:
+                yield record_data
+                continue
+            with self.lock_manager.acquire_record_lock(record_data["id"]):
+                results[self._complete_record(record_data, ok, TXT2STIX)] += 1
 
-    def _execute_pipeline(self, record_data: dict) -> bool:
-        """Executes DeepSeek -> OpenCTI processing pipeline"""
+    def _deliver_batches(self, records: Iterator[dict]) -> Iterator[Tuple[dict, bool]]:
+        """Sends records to OpenCTI in aggregated bundles"""
+        batch = []
+        for record_data in records:
+            batch.append(record_data)
+            if self.opencti_processor.batch_full(batch):
+                yield from self._deliver_batch(batch)
+                batch = []
+        if batch:
+            yield from self._deliver_batch(batch)
+
+    def _deliver_batch(self, batch: list) -> Iterator[Tuple[dict, bool]]:
         try:
-            if not record_data[
-                "sent_to_deepseek"
-            ] and not self.deepseek_processor.process(record_data):
-                return False
-            if not record_data[
-                "sent_to_opencti"
-            ] and not self.opencti_processor.process(record_data):
-                return False
-            self.db.mark_processed(record_data["id"])
-            return True
+            delivered = self.opencti_processor.process_batch(batch)
+        except Exception as e:
+            self.logger.error(
+                f"Aggregated delivery failed for {len(batch)} records: {str(e)}"
+            )
+            delivered = {}
+            for record_data in batch:
+                record_data["last_error"] = str(e)
+        for record_data in batch:
+            yield record_data, delivered.get(record_data["id"], False)
+
+    def _complete_record(self, record_data: dict, delivered: bool, stage: str) -> str:
+        """
+        Marks a record processed once it reached OpenCTI, or schedules a
+        retry of the stage it failed in
+        """
+        try:
+            with span("complete", record_data["id"], stage=stage, delivered=delivered):
+                if not delivered:
+                    # Stages leave the cause of a failure in last_error
+                    error = record_data.pop("last_error", None)
+                    self.processing_state.failed(
+                        record_data["id"], stage, error or f"{stage} stage failed"
+                    )
+                    return self._outcome("errors")
+                self.db.mark_processed(record_data["id"])
+                self.processing_state.completed(record_data["id"])
+                return self._outcome("success")
         except Exception as e:
             self.logger.error(f"Pipeline failed for {record_data['id']}: {str(e)}")
-            return False
+            return self._outcome("errors")
+
+    @staticmethod
+    def _outcome(status: str) -> str:
+        RECORDS.labels(status).inc()
+        return status
 
     def run(self) -> None:
         """Main execution entry point"""
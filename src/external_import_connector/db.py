@@ -1,8 +1,11 @@
 import psycopg2  # or the appropriate database driver you're using
 import json
-from threading import Lock
+from contextlib import contextmanager
+from threading import Lock, RLock
 from datetime import datetime
+from typing import Dict, Optional, Tuple, Union
 from .config_variables import ConfigConnector
+from .metrics import DB_WRITE, stage_timer
 
 
 class DatabaseHandler:
@@ -18,8 +21,20 @@ class DatabaseHandler:
         }
         # Database connection
         self.db_conn = psycopg2.connect(**self.db_config)
+        # Pipeline stages share the connection; one statement+commit at a time
+        self.conn_lock = RLock()
         self._initialize_database()
 
+    @contextmanager
+    def _cursor(self):
+        with self.conn_lock, self.db_conn.cursor() as cursor:
+            yield cursor
+
+    @contextmanager
+    def _write_cursor(self):
+        with stage_timer(DB_WRITE), self._cursor() as cursor:
+            yield cursor
+
     def _initialize_database(self):
         with psycopg2.connect(**self.db_config) as conn:
             with conn.cursor() as cursor:
@@ -27,6 +42,8 @@ class DatabaseHandler:
                 self._create_table_selenium_output(cursor)
                 self._create_classification_tables(cursor)
                 self._add_matched_content_columns(cursor)
+                self._create_table_processing_state(cursor)
+                self._create_table_connector_state(cursor)
                 conn.commit()
 
     def _create_table_matched_content(self, cursor):
@@ -99,6 +116,34 @@ class DatabaseHandler:
             """
         )
 
+    def _create_table_processing_state(self, cursor):
+        # One row per record and stage once that stage failed; status is
+        # 'retry', 'quarantined' or 'done'
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS db.processing_state (
+                record_id INT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INT NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (record_id, stage),
+                FOREIGN KEY (record_id) REFERENCES db.matched_content(id)
+            )"""
+        )
+
+    def _create_table_connector_state(self, cursor):
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS db.connector_state (
+                name TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP NOT NULL
+            )"""
+        )
+
     def save_classification(self, processed_data_id: int, classification: dict):
         self._save_classification_result(
             "classification_results", processed_data_id, classification
@@ -112,7 +157,7 @@ class DatabaseHandler:
     def _save_classification_result(
         self, table: str, processed_data_id: int, classification: dict
     ):
-        with self.db_conn.cursor() as cursor:
+        with self._write_cursor() as cursor:
             cursor.execute(
                 f"""
                 INSERT INTO db.{table} 
@@ -129,28 +174,114 @@ class DatabaseHandler:
             )
             self.db_conn.commit()
 
-    def fetch_unprocessed_data(self):
-        """Fetch unprocessed records from database"""
-        query = """
-            SELECT id, url, matched_keywords, html, timestamp, sent_to_deepseek, sent_to_opencti 
-            FROM db.matched_content 
-            WHERE processed = FALSE
+    def fetch_unprocessed_data(self, with_html: bool = True):
+        """
+        Fetch unprocessed records that are due, skipping quarantined ones.
+        Without html, the html column is NULL and loaded later with fetch_html.
+        """
+        html = "m.html" if with_html else "NULL"
+        query = f"""
+            SELECT m.id, m.url, m.matched_keywords, {html}, m.timestamp, m.sent_to_deepseek, m.sent_to_opencti 
+            FROM db.matched_content m
+            WHERE m.processed = FALSE
+            AND NOT EXISTS (
+                SELECT 1 FROM db.processing_state s
+                WHERE s.record_id = m.id
+                AND (s.status = 'quarantined' OR s.next_attempt_at > %s)
+            )
         """
         # Use the existing self.db_conn but create a fresh cursor
-        with self.db_conn.cursor() as cursor:
-            cursor.execute(query)
+        with self._cursor() as cursor:
+            cursor.execute(query, (datetime.now(),))
             return cursor.fetchall()
 
-    def mark_sent_to_deepseek(self, record_id: int, stix_data: dict, stix_bundle: dict):
+    def fetch_html(self, record_ids: list) -> dict:
+        """HTML of many records in one query, by record ID"""
+        query = "SELECT id, html FROM db.matched_content WHERE id = ANY(%s)"
+        with self._cursor() as cursor:
+            cursor.execute(query, (list(record_ids),))
+            return dict(cursor.fetchall())
+
+    def get_state(self, name: str) -> Optional[str]:
+        query = "SELECT value FROM db.connector_state WHERE name = %s"
+        with self._cursor() as cursor:
+            cursor.execute(query, (name,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    def set_state(self, name: str, value: Optional[str]):
+        query = """
+            INSERT INTO db.connector_state (name, value, updated_at)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (name) DO UPDATE
+            SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at
+        """
+        with self._write_cursor() as cursor:
+            cursor.execute(query, (name, value, datetime.now()))
+            self.db_conn.commit()
+
+    def record_stage_failure(self, record_id: int, stage: str, error: str) -> int:
+        """Counts a failed attempt of a stage, returning the attempts so far"""
+        query = """
+            INSERT INTO db.processing_state AS s
+            (record_id, stage, status, attempts, last_error, updated_at)
+            VALUES (%s, %s, 'retry', 1, %s, %s)
+            ON CONFLICT (record_id, stage) DO UPDATE
+            SET attempts = s.attempts + 1, status = 'retry',
+                last_error = EXCLUDED.last_error, updated_at = EXCLUDED.updated_at
+            RETURNING attempts
+        """
+        with self._write_cursor() as cursor:
+            cursor.execute(query, (record_id, stage, error, datetime.now()))
+            attempts = cursor.fetchone()[0]
+            self.db_conn.commit()
+            return attempts
+
+    def schedule_stage_retry(
+        self, record_id: int, stage: str, next_attempt_at: Optional[datetime]
+    ):
+        """Sets when a failed stage is due again; None quarantines the record"""
+        query = """
+            UPDATE db.processing_state
+            SET status = %s, next_attempt_at = %s
+            WHERE record_id = %s AND stage = %s
+        """
+        status = "retry" if next_attempt_at else "quarantined"
+        with self._write_cursor() as cursor:
+            cursor.execute(query, (status, next_attempt_at, record_id, stage))
+            self.db_conn.commit()
+
+    def mark_stages_done(self, record_id: int):
+        """Closes the retry state of the stages of a completed record"""
+        query = """
+            UPDATE db.processing_state
+            SET status = 'done', next_attempt_at = NULL, updated_at = %s
+            WHERE record_id = %s AND status != 'done'
+        """
+        with self._write_cursor() as cursor:
+            cursor.execute(query, (datetime.now(), record_id))
+            self.db_conn.commit()
+
+    def mark_sent_to_deepseek(
+        self, record_id: int, stix_data: dict, stix_bundle: Union[dict, str]
+    ):
         update_query = """
             UPDATE db.matched_content 
             SET sent_to_deepseek = TRUE, stix_data = %s::jsonb, stix_bundle = %s::jsonb 
             WHERE id = %s
         """
-        with self.db_conn.cursor() as cursor:
+        with self._write_cursor() as cursor:
             cursor.execute(
                 update_query,
-                (json.dumps(stix_data), json.dumps(stix_bundle), record_id),
+                (
+                    json.dumps(stix_data),
+                    (
+                        stix_bundle
+                        if isinstance(stix_bundle, str)
+                        else json.dumps(stix_bundle)
+                    ),
+                    record_id,
+                ),
             )
             self.db_conn.commit()
 
@@ -160,27 +291,41 @@ class DatabaseHandler:
             SET sent_to_opencti = TRUE 
             WHERE id = %s
         """
-        with self.db_conn.cursor() as cursor:
+        with self._write_cursor() as cursor:
             cursor.execute(update_query, (record_id,))
             self.db_conn.commit()
 
-    def get_stix_bundle(self, record_id: int) -> dict:
+    def get_stix_bundle(self, record_id: int) -> Optional[str]:
+        """Returns the stored bundle as serialized JSON"""
         query = """
             SELECT stix_bundle::text 
             FROM db.matched_content 
             WHERE id = %s
         """
-        with self.db_conn.cursor() as cursor:
+        with self._cursor() as cursor:
             cursor.execute(query, (record_id,))
             result = cursor.fetchone()
             if result and result[0]:
-                return json.loads(result[0])
+                return result[0]
             return None
 
+    def get_report_refs(self, record_ids: list) -> Dict[int, Tuple[str, Optional[str]]]:
+        """STIX ID and created_by_ref of the report in many stored bundles"""
+        query = """
+            SELECT DISTINCT ON (m.id) m.id, obj->>'id', obj->>'created_by_ref'
+            FROM db.matched_content m,
+                 jsonb_array_elements(m.stix_bundle->'objects') obj
+            WHERE m.id = ANY(%s) AND obj->>'type' = 'report'
+            ORDER BY m.id
+        """
+        with self._cursor() as cursor:
+            cursor.execute(query, (list(record_ids),))
+            return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
     def mark_as_processed(self, record_id):
         """Mark record as processed in database"""
         update_query = "UPDATE db.matched_content SET processed = TRUE WHERE id = %s"
-        with self.db_conn.cursor() as cursor:
+        with self._write_cursor() as cursor:
             cursor.execute(update_query, (record_id,))
             self.db_conn.commit()
 
@@ -192,11 +337,26 @@ class DatabaseHandler:
             ORDER BY timestamp DESC 
             LIMIT 1
         """
-        with self.db_conn.cursor() as cursor:
+        with self._cursor() as cursor:
             cursor.execute(query, (record_id,))
             result = cursor.fetchone()
             return {"category": result[0], "confidence": result[1]} if result else None
 
+    def get_latest_classifications(self, table: str, record_ids: list) -> dict:
+        """Latest classification of many records in one query, by record ID"""
+        query = f"""
+            SELECT DISTINCT ON (processed_data_id) processed_data_id, category, confidence
+            FROM db.{table}
+            WHERE processed_data_id = ANY(%s)
+            ORDER BY processed_data_id, timestamp DESC
+        """
+        with self._cursor() as cursor:
+            cursor.execute(query, (list(record_ids),))
+            return {
+                row[0]: {"category": row[1], "confidence": row[2]}
+                for row in cursor.fetchall()
+            }
+
 
 class DBSingleton:
     """
@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, Optional
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace and unicode variants so near-identical pages match"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class LLMCache:
+    """Persistent cache of txt2stix AI responses
+
+    Entries are keyed by the normalized input text, the call made and the
+    extraction settings (model, extraction list, temperature), stored in
+    SQLite and evicted least-recently-used once the cache exceeds max_mb.
+    The cache size is kept as a running total rather than summed on every
+    insert; it is re-read every RESYNC_INTERVAL inserts to pick up entries
+    written by other processes sharing the file.
+
+    on_lookup(hit, count) is told about hits and misses, e.g. to export
+    them as metrics. The module imports nothing from the package, as the
+    txt2stix worker script loads it as a top-level module.
+    """
+
+    RESYNC_INTERVAL = 100
+
+    def __init__(
+        self,
+        path: str,
+        max_mb: float,
+        settings: Dict,
+        on_lookup: Optional[Callable[[bool, int], None]] = None,
+    ):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.settings = settings
+        self.on_lookup = on_lookup
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    response_type TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)"
+            )
+        self.total = self._stored_size()
+        self.puts = 0
+
+    def _stored_size(self) -> int:
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()[0]
+
+    def key(self, call_name: str, text: str, context=None) -> str:
+        payload = json.dumps(
+            {
+                "call": call_name,
+                "text": normalize_text(text),
+                "context": context,
+                **self.settings,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response_type, response FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                self._count(False)
+                return None
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE llm_cache SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+            self.hits += 1
+        self._count(True)
+        module_name, class_name = row[0].rsplit(":", 1)
+        response_type = getattr(importlib.import_module(module_name), class_name)
+        return response_type.model_validate_json(row[1])
+
+    def put(self, key: str, response) -> None:
+        response_type = f"{type(response).__module__}:{type(response).__qualname__}"
+        data = response.model_dump_json()
+        with self.lock, self.conn:
+            replaced = self.conn.execute(
+                "SELECT size FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (key, response_type, data, len(data), time.time()),
+            )
+            self.puts += 1
+            if self.puts % self.RESYNC_INTERVAL == 0:
+                self.total = self._stored_size()
+            else:
+                self.total += len(data) - (replaced[0] if replaced else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.total <= self.max_bytes:
+            return
+        total = self.total
+        rows = self.conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY last_used ASC"
+        ).fetchall()
+        expired = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            expired.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM llm_cache WHERE key = ?", expired)
+        self.total = total
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def add_stats(self, stats: Dict[str, int]) -> None:
+        """Adds hit/miss counts reported by a txt2stix worker process"""
+        with self.lock:
+            self.hits += stats.get("hits", 0)
+            self.misses += stats.get("misses", 0)
+        self._count(True, stats.get("hits", 0))
+        self._count(False, stats.get("misses", 0))
+
+    def _count(self, hit: bool, count: int = 1) -> None:
+        if self.on_lookup and count:
+            self.on_lookup(hit, count)
+
+    def wrap(self, call_name: str, fn: Callable) -> Callable:
+        """Puts the cache in front of one BaseAIExtractor call"""
+        if call_name == "extract_attack_flow":
+            return fn
+
+        @functools.wraps(fn)
+        def cached(input_text, *args, **kwargs):
+            # extract_objects gets extractor definitions already covered by the
+            # settings; relationships also depend on the extractions passed in
+            context = args[0] if call_name == "extract_relationships" else None
+            key = self.key(call_name, input_text, context)
+            response = self.get(key)
+            if response is None:
+                response = fn(input_text, *args, **kwargs)
+                self.put(key, response)
+            return response
+
+        return cached
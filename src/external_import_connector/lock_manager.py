@@ -16,3 +16,12 @@ class LockManager:
             if record_id not in self.record_locks:
                 self.record_locks[record_id] = threading.Lock()
             return self.record_locks[record_id]
+
+    def prune(self) -> None:
+        """Drops the locks of records nobody holds, once a run is over"""
+        with self.global_lock:
+            self.record_locks = {
+                record_id: lock
+                for record_id, lock in self.record_locks.items()
+                if lock.locked()
+            }
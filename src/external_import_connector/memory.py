@@ -0,0 +1,182 @@
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from prometheus_client import Gauge
+
+PROCESS_RSS = Gauge("darc_process_rss_bytes", "Resident set size of the connector")
+PYTHON_HEAP = Gauge(
+    "darc_python_heap_bytes", "Python memory traced by tracemalloc, when enabled"
+)
+
+MB = 1024 * 1024
+
+# Stages running right now, by name; maintained by active_stage
+_active_stages: Counter = Counter()
+_active_lock = threading.Lock()
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def heap_bytes() -> Optional[int]:
+    """Python memory currently traced by tracemalloc, None when not tracing"""
+    if not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.get_traced_memory()[0]
+
+
+@contextmanager
+def active_stage(stage: str):
+    """Marks a stage as running, so memory samples are attributed to it"""
+    with _active_lock:
+        _active_stages[stage] += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active_stages[stage] -= 1
+            if _active_stages[stage] <= 0:
+                del _active_stages[stage]
+
+
+def _mb(value: Optional[int]) -> str:
+    return f"{value / MB:.1f} MB" if value is not None else "n/a"
+
+
+class MemoryMonitor:
+    """Accounts the connector's memory across runs
+
+    During a run, RSS and the tracemalloc heap are sampled at a fixed
+    interval; each sample counts toward the peak of every stage running at
+    that time. After the run the totals are logged, and with tracemalloc
+    enabled the allocation snapshot is diffed against the previous run's to
+    log the sites that grew most.
+    """
+
+    TOP_GROWTH = 10
+    # Frames of these files are left out of snapshot diffs
+    IGNORED_FILES = ("<frozen importlib._bootstrap>", "<unknown>", tracemalloc.__file__)
+
+    def __init__(
+        self,
+        logger,
+        tracemalloc_frames: int = 0,
+        rss_limit_mb: float = 0,
+        interval: float = 0.5,
+    ):
+        self.logger = logger
+        self.rss_limit = float(rss_limit_mb or 0) * MB
+        self.interval = interval
+        self.stage_peaks: Dict[str, int] = {}
+        self.run_peak: Optional[int] = None
+        self.last_rss: Optional[int] = None
+        self.previous_snapshot: Optional[tracemalloc.Snapshot] = None
+        if tracemalloc_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(int(tracemalloc_frames))
+
+    def sample(self) -> None:
+        rss = rss_bytes()
+        heap = heap_bytes()
+        if rss is not None:
+            PROCESS_RSS.set(rss)
+        if heap is not None:
+            PYTHON_HEAP.set(heap)
+        value = rss if rss is not None else heap
+        if value is None:
+            return
+        self.run_peak = max(self.run_peak or 0, value)
+        with _active_lock:
+            stages = list(_active_stages)
+        for stage in stages:
+            self.stage_peaks[stage] = max(self.stage_peaks.get(stage, 0), value)
+
+    @contextmanager
+    def run(self):
+        """Samples memory while the block runs and logs the outcome"""
+        self.stage_peaks = {}
+        self.run_peak = None
+        stop = threading.Event()
+
+        def sampler() -> None:
+            while not stop.wait(self.interval):
+                self.sample()
+
+        self.sample()
+        thread = threading.Thread(target=sampler, name="memory-sampler", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            self.sample()
+            try:
+                self.report()
+            except Exception as e:
+                self.logger.error(f"Memory report failed: {str(e)}")
+
+    def report(self) -> None:
+        rss = rss_bytes()
+        growth = ""
+        if rss is not None and self.last_rss is not None:
+            growth = f" ({(rss - self.last_rss) / MB:+.1f} MB since last run)"
+        self.last_rss = rss
+        peaks = ", ".join(
+            f"{stage} {_mb(peak)}"
+            for stage, peak in sorted(
+                self.stage_peaks.items(), key=lambda item: -item[1]
+            )
+        )
+        self.logger.info(
+            f"Memory - RSS: {_mb(rss)}{growth}, Peak: {_mb(self.run_peak)}, Python heap: {_mb(heap_bytes())}, Peak by stage: {peaks or 'n/a'}"
+        )
+        if tracemalloc.is_tracing():
+            self._log_growth()
+
+    def _log_growth(self) -> None:
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, path) for path in self.IGNORED_FILES]
+        )
+        previous, self.previous_snapshot = self.previous_snapshot, snapshot
+        if previous is None:
+            return
+        growth = [
+            stat
+            for stat in snapshot.compare_to(previous, "lineno")
+            if stat.size_diff > 0
+        ][: self.TOP_GROWTH]
+        if not growth:
+            return
+        self.logger.info(
+            "Top memory growth since last run:\n"
+            + "\n".join(
+                f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks) {stat.traceback}"
+                for stat in growth
+            )
+        )
+
+    def over_limit(self) -> bool:
+        if not self.rss_limit:
+            return False
+        rss = rss_bytes()
+        return rss is not None and rss > self.rss_limit
+
+    def recycle(self) -> None:
+        """Replaces the process with a fresh copy of itself"""
+        self.logger.warning(
+            f"RSS {_mb(rss_bytes())} above the {_mb(int(self.rss_limit))} limit, restarting the connector"
+        )
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
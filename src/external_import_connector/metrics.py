@@ -0,0 +1,75 @@
+"""
+Prometheus metrics of the connector
+
+The metrics live in the default registry, which the HTTP endpoint pycti
+starts with CONNECTOR_EXPOSE_METRICS / CONNECTOR_METRICS_PORT serves next
+to its own connector metrics.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .memory import active_stage
+
+# Stage labels of STAGE_SECONDS
+FETCH = "fetch"
+CLASSIFY_V2 = "classify_v2"
+CLASSIFY_V3 = "classify_v3"
+TXT2STIX = "txt2stix"
+DB_WRITE = "db_write"
+OPENCTI_IMPORT = "opencti_import"
+
+STAGE_SECONDS = Histogram(
+    "darc_stage_duration_seconds",
+    "Time spent per stage call",
+    ["stage"],
+    buckets=(0.005, 0.025, 0.1, 0.25, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+RECORDS = Counter(
+    "darc_records_total",
+    "Records handled, by outcome",
+    ["outcome"],
+)
+CACHE_REQUESTS = Counter(
+    "darc_cache_requests_total",
+    "Cache lookups, by cache and result",
+    ["cache", "result"],
+)
+BACKLOG = Gauge(
+    "darc_backlog_records",
+    "Unprocessed records due at the last fetch",
+)
+OLDEST_UNPROCESSED_AGE = Gauge(
+    "darc_oldest_unprocessed_age_seconds",
+    "Age of the oldest unprocessed record due at the last fetch",
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Observes the duration of a stage call and marks the stage as running"""
+    with STAGE_SECONDS.labels(stage).time(), active_stage(stage):
+        yield
+
+
+def count_cache(cache: str, hit: bool, n: int = 1) -> None:
+    if n:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(n)
+
+
+def observe_backlog(
+    timestamps: List[Optional[datetime]], now: Optional[datetime] = None
+) -> None:
+    """Sets the backlog gauges from the insert times of the fetched records"""
+    BACKLOG.set(len(timestamps))
+    timestamps = [t for t in timestamps if isinstance(t, datetime)]
+    if not timestamps:
+        OLDEST_UNPROCESSED_AGE.set(0)
+        return
+    oldest = min(timestamps)
+    OLDEST_UNPROCESSED_AGE.set(
+        max(0.0, ((now or datetime.now()) - oldest).total_seconds())
+    )
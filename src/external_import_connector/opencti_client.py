@@ -0,0 +1,104 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses worth retrying: throttling and gateway/availability errors
+TRANSIENT_STATUSES = (429, 502, 503, 504)
+
+
+class PooledSession(requests.Session):
+    """requests session with a sized keep-alive pool and per-call timeouts
+
+    pycti posts every query with a fixed 300 s timeout; a timeout set for
+    the current thread with timeout() replaces it. The status of the last
+    response on each thread is kept, as pycti turns HTTP errors into a bare
+    ValueError.
+    """
+
+    def __init__(self, pool_size: int):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self._local = threading.local()
+
+    @contextmanager
+    def timeout(self, seconds: Optional[float]):
+        previous = getattr(self._local, "timeout", None)
+        self._local.timeout = seconds
+        try:
+            yield
+        finally:
+            self._local.timeout = previous
+
+    @property
+    def last_status(self) -> Optional[int]:
+        return getattr(self._local, "last_status", None)
+
+    def request(self, method, url, **kwargs):
+        timeout = getattr(self._local, "timeout", None)
+        if timeout:
+            kwargs["timeout"] = timeout
+        self._local.last_status = None
+        response = super().request(method, url, **kwargs)
+        self._local.last_status = response.status_code
+        return response
+
+
+def install_session(session: PooledSession, *clients) -> None:
+    """Replaces the session of pycti API clients, keeping their auth"""
+    for client in clients:
+        session.auth = session.auth or getattr(client.session, "auth", None)
+        client.session = session
+
+
+class OpenCTICaller:
+    """Runs OpenCTI API calls with per-call-type timeouts and retries
+
+    Transient failures (connection errors, timeouts, HTTP 429/5xx from the
+    gateway) are retried with exponential backoff and jitter. Only calls that
+    are safe to repeat should go through call(): imports are upserts, and
+    work updates and lookups have no side effects beyond their first run.
+    """
+
+    def __init__(
+        self,
+        session: PooledSession,
+        timeouts: Dict[str, float],
+        max_retries: int,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        self.session = session
+        self.timeouts = timeouts
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retried = 0
+
+    def is_transient(self, error: BaseException) -> bool:
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        return (
+            isinstance(error, ValueError)
+            and self.session.last_status in TRANSIENT_STATUSES
+        )
+
+    def call(self, call_type: str, fn: Callable, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                with self.session.timeout(self.timeouts.get(call_type)):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if not self.is_transient(e) or attempt >= self.max_retries:
+                    raise
+                self.retried += 1
+                delay = min(self.max_delay, self.base_delay * 2**attempt)
+                time.sleep(delay + random.uniform(0, self.base_delay))
+                attempt += 1
@@ -1,6 +1,12 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
 from pycti import OpenCTIApiClient, OpenCTIConnectorHelper
 
+from .profiling import profiled
 from .record_repository import RecordRepository
+from .stix.delta import DeltaTracker
 from .stix.handle_opencti_entity import OpenCTIEntityHandler
 from .stix.opencti_handler import OpenCTIHandler
 from .config_variables import ConfigConnector
@@ -14,25 +20,170 @@ class OpenCTIProcessor:
         client: OpenCTIApiClient,
         helper: OpenCTIConnectorHelper,
         db: RecordRepository,
+        caller=None,
     ):
         self.config = ConfigConnector()
-        self.handler = OpenCTIHandler(client, helper)
-        self.entity_checker = OpenCTIEntityHandler(helper, ConfigConnector())
+        self.handler = OpenCTIHandler(client, helper, self.config, caller)
+        self.entity_checker = OpenCTIEntityHandler(helper, self.config)
         self.db = db
+        self.delta_tracker = None
+        if self.config.delta_bundles_enabled:
+            self.delta_tracker = DeltaTracker(self.config.delta_bundles_path)
+        # Objects of bundles in flight, remembered once they are delivered
+        self._pending_delta: Dict[int, list] = {}
 
-    def process(self, record_data: dict) -> bool:
+    @property
+    def batch_size(self) -> int:
+        """
+        Records per aggregated bundle, reduced while OpenCTI is behind;
+        0 means no limit, the whole run goes in one bundle
+        """
+        if self.handler.backpressure:
+            return self.handler.backpressure.batch_size
+        return max(0, int(self.config.opencti_aggregate_batch_size))
+
+    def batch_full(self, batch: list) -> bool:
+        batch_size = self.batch_size
+        return bool(batch_size) and len(batch) >= batch_size
+
+    def prefetch(self, records: List[dict]) -> None:
+        """Resolves the existence checks of many records in one lookup"""
+        try:
+            self._load_report_refs(records)
+        except Exception as e:
+            self.handler.helper.connector_logger.error(
+                f"Loading stored reports failed: {str(e)}"
+            )
+            return
+        self.entity_checker.prefetch(records)
+
+    def _load_report_refs(self, records: List[dict]) -> None:
+        """Sets report_ref on records whose report may already be delivered"""
+        pending = [
+            record_data
+            for record_data in records
+            if "report_ref" not in record_data
+            and self.entity_checker.may_exist(record_data)
+        ]
+        if not pending:
+            return
+        refs = self.db.get_report_refs([record_data["id"] for record_data in pending])
+        for record_data in pending:
+            record_data["report_ref"] = refs.get(record_data["id"])
+
+    def _prepare(self, record_data: dict) -> Union[str, bool]:
+        """Returns the bundle to send, or the outcome if there is none to send"""
+        # Bundles converted in this run are handed over in memory; the DB
+        # copy is only read back for records converted in an earlier run
+        stix_bundle = record_data.pop("stix_bundle", None)
+
+        self._load_report_refs([record_data])
         if self.entity_checker.entity_exists(record_data):
             return True  # Skip existing entities
 
-        stix_data = self.db.get_stix_bundle(record_data["id"])
-        if (
-            not stix_data
-            or not isinstance(stix_data, dict)
-            or not isinstance(stix_data.get("objects"), list)
-        ):
+        if stix_bundle is None:
+            stix_bundle = self.db.get_stix_bundle(record_data["id"])
+        if not stix_bundle:
+            record_data["last_error"] = "No STIX bundle stored"
             return False
 
-        if self.handler.send_stix_bundle(stix_data, record_data["id"]):
+        if self.delta_tracker and record_data.get("url"):
+            stix_bundle, delivered = self.delta_tracker.delta(
+                record_data["url"], stix_bundle
+            )
+            self._pending_delta[record_data["id"]] = delivered
+        return stix_bundle
+
+    def _record_outcome(self, record_data: dict, sent: bool) -> bool:
+        delivered = self._pending_delta.pop(record_data["id"], None)
+        error = self.handler.errors.pop(record_data["id"], None)
+        if not sent:
+            record_data["last_error"] = error
+        else:
             self.db.mark_opencti_complete(record_data["id"])
-            return True
-        return False
+            if delivered:
+                self.delta_tracker.remember(record_data["url"], delivered)
+        return sent
+
+    def process(self, record_data: dict) -> bool:
+        stix_bundle = self._prepare(record_data)
+        if isinstance(stix_bundle, bool):
+            return stix_bundle
+        return self._record_outcome(
+            record_data, self.handler.send_stix_bundle(stix_bundle, record_data["id"])
+        )
+
+    def process_many(self, records: Iterable[dict]) -> Iterator[Tuple[dict, bool]]:
+        """
+        Delivers records on a bounded pool of OPENCTI_WORKERS threads
+
+        Only the OpenCTI calls run on the pool; bundles are loaded and
+        delivery is recorded on the calling thread, in input order.
+        """
+        workers = max(1, int(self.config.opencti_workers))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="opencti"
+        ) as executor:
+            pending = deque()
+            for record_data in records:
+                pending.append((record_data, self._submit(executor, record_data)))
+                if len(pending) >= workers * 2:
+                    yield self._complete(*pending.popleft())
+            while pending:
+                yield self._complete(*pending.popleft())
+
+    def _submit(
+        self, executor: ThreadPoolExecutor, record_data: dict
+    ) -> Union[Future, bool]:
+        try:
+            stix_bundle = self._prepare(record_data)
+        except Exception as e:
+            self.handler.helper.connector_logger.error(
+                f"Pipeline failed for {record_data['id']}: {str(e)}"
+            )
+            record_data["last_error"] = str(e)
+            return False
+        if isinstance(stix_bundle, bool):
+            return stix_bundle
+        return executor.submit(
+            profiled(self.handler.send_stix_bundle), stix_bundle, record_data["id"]
+        )
+
+    def _complete(
+        self, record_data: dict, outcome: Union[Future, bool]
+    ) -> Tuple[dict, bool]:
+        try:
+            if isinstance(outcome, Future):
+                return record_data, self._record_outcome(record_data, outcome.result())
+            return record_data, outcome
+        except Exception as e:
+            self._pending_delta.pop(record_data["id"], None)
+            self.handler.helper.connector_logger.error(
+                f"Pipeline failed for {record_data['id']}: {str(e)}"
+            )
+            record_data["last_error"] = str(e)
+            return record_data, False
+
+    def process_batch(self, records: List[dict]) -> Dict[int, bool]:
+        """Sends the bundles of several records in one aggregated import"""
+        results = {}
+        bundles = {}
+        self.prefetch(records)
+        for record_data in records:
+            stix_bundle = self._prepare(record_data)
+            if isinstance(stix_bundle, bool):
+                results[record_data["id"]] = stix_bundle
+            else:
+                bundles[record_data["id"]] = stix_bundle
+
+        try:
+            sent = self.handler.send_stix_bundles(bundles)
+            for record_data in records:
+                if record_data["id"] in sent:
+                    results[record_data["id"]] = self._record_outcome(
+                        record_data, sent[record_data["id"]]
+                    )
+        finally:
+            for record_data in records:
+                self._pending_delta.pop(record_data["id"], None)
+        return results
@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .profiling import profiled
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline stage: a function run by its own pool of worker threads
+
+    fn gets an item and returns what the next stage should receive, or None
+    when the item leaves the pipeline here. on_close, if given, runs once
+    after the last item went through the stage (e.g. to flush a batch).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        workers: int = 1,
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.on_close = on_close
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.lock = threading.Lock()
+
+    def record(self, busy_seconds: float, queue_depth: int) -> None:
+        with self.lock:
+            self.processed += 1
+            self.busy_seconds += busy_seconds
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+
+class StagedPipeline:
+    """Runs items through stages connected by bounded queues
+
+    Every stage has its own worker threads, so stages overlap: while one
+    record waits on DeepSeek another is classified and a third is sent to
+    OpenCTI. A full queue blocks the stage feeding it, which keeps the
+    number of records in flight bounded. Each record still goes through
+    the stages one after the other.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int, logger):
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.logger = logger
+        self.queues: List[queue.Queue] = []
+
+    def run(self, items: Iterable) -> Dict[str, Dict]:
+        self.queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        started = time.monotonic()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=profiled(self._work),
+                    args=(index, remaining),
+                    name=f"pipeline-{stage.name}-{n}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for item in items:
+                self.queues[0].put(item)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        stats = self.stats(time.monotonic() - started)
+        for name, stage_stats in stats.items():
+            self.logger.info(
+                f"Stage {name} - Processed: {stage_stats['processed']}, Throughput: {stage_stats['throughput']:.2f}/s, Busy: {stage_stats['busy_seconds']:.1f}s, Max queue depth: {stage_stats['max_queue_depth']}"
+            )
+        return stats
+
+    def _work(self, index: int, remaining: List[int]) -> None:
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            depth = inbox.qsize()
+            started = time.monotonic()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                self.logger.error(f"Pipeline stage {stage.name} failed: {str(e)}")
+                result = None
+            stage.record(time.monotonic() - started, depth)
+            if result is not None and outbox is not None:
+                outbox.put(result)
+
+        # The last worker out closes the stage and lets the next one finish
+        with stage.lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if not last:
+            return
+        if stage.on_close:
+            try:
+                stage.on_close()
+            except Exception as e:
+                self.logger.error(f"Pipeline stage {stage.name} failed: {str(e)}")
+        if outbox is not None:
+            for _ in range(self.stages[index + 1].workers):
+                outbox.put(_DONE)
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {
+            stage.name: inbox.qsize() for stage, inbox in zip(self.stages, self.queues)
+        }
+
+    def stats(self, elapsed: float) -> Dict[str, Dict]:
+        return {
+            stage.name: {
+                "processed": stage.processed,
+                "throughput": stage.processed / elapsed if elapsed > 0 else 0.0,
+                "busy_seconds": stage.busy_seconds,
+                "max_queue_depth": stage.max_queue_depth,
+            }
+            for stage in self.stages
+        }
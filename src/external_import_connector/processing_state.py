@@ -0,0 +1,72 @@
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .record_repository import RecordRepository
+
+# Stages a record goes through, as stored in db.processing_state
+CLASSIFY = "classify"
+TXT2STIX = "txt2stix"
+OPENCTI = "opencti"
+
+MAX_ERROR_LENGTH = 1000
+
+
+class RetryPolicy:
+    """Exponential backoff between attempts of a failing stage, with jitter"""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+
+    def next_attempt_at(
+        self, attempts: int, now: Optional[datetime] = None
+    ) -> Optional[datetime]:
+        """When to try again after the given failed attempts, None to give up"""
+        if attempts >= self.max_attempts:
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        # Up to 10% jitter spreads out records that failed together
+        delay *= 1 + random.uniform(0, 0.1)
+        return (now or datetime.now()) + timedelta(seconds=delay)
+
+
+class ProcessingState:
+    """Tracks failed stages so records are only fetched again once due
+
+    Every failure of a stage increments its attempt count and stores the
+    error. The record is left out of fetches until its next attempt is due,
+    and quarantined for good after the last attempt, so a poison page stops
+    costing classifier and DeepSeek calls. Completion itself is still
+    recorded by the sent_to_deepseek / sent_to_opencti / processed flags.
+    """
+
+    def __init__(self, db: RecordRepository, policy: RetryPolicy, logger):
+        self.db = db
+        self.policy = policy
+        self.logger = logger
+
+    def failed(self, record_id: int, stage: str, error: str) -> None:
+        try:
+            attempts = self.db.record_stage_failure(
+                record_id, stage, error[:MAX_ERROR_LENGTH]
+            )
+            next_attempt_at = self.policy.next_attempt_at(attempts)
+            self.db.schedule_stage_retry(record_id, stage, next_attempt_at)
+        except Exception as e:
+            self.logger.error(
+                f"Could not record {stage} failure of {record_id}: {str(e)}"
+            )
+            return
+        if next_attempt_at is None:
+            self.logger.warning(
+                f"Record {record_id} quarantined after {attempts} failed {stage} attempts: {error}"
+            )
+        else:
+            self.logger.info(
+                f"Record {record_id} failed {stage} (attempt {attempts}), retrying at {next_attempt_at:%Y-%m-%d %H:%M:%S}"
+            )
+
+    def completed(self, record_id: int) -> None:
+        self.db.mark_stages_done(record_id)
@@ -0,0 +1,265 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+SAMPLING = "sampling"
+DETERMINISTIC = "deterministic"
+
+# Deterministic profile of the run in progress, if any
+_active: Optional["ThreadProfiles"] = None
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+class StackSampler:
+    """Samples the stacks of all threads at a fixed interval
+
+    Samples are kept as collapsed stacks ("thread;outer;...;inner" and a
+    count), the input format of flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == threading.get_ident():
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="profiler-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, limit: int) -> List[Tuple[str, int, int]]:
+        """(function, self samples, total samples) of the hottest functions"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            # The first element is the thread name
+            functions = stack.split(";")[1:]
+            if not functions:
+                continue
+            own[functions[-1]] += count
+            for function in set(functions):
+                total[function] += count
+        return [
+            (function, count, total[function])
+            for function, count in own.most_common(limit)
+        ]
+
+
+class ThreadProfiles:
+    """cProfile on the calling thread and on the work wrapped with profiled
+
+    Each worker thread gets one profile, enabled only while it runs wrapped
+    work and disabled by the thread itself afterwards. Threads of pools
+    that outlive the run are then left unprofiled once it ends.
+    """
+
+    def __init__(self):
+        self.profiles: List[cProfile.Profile] = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @contextmanager
+    def thread(self):
+        if sys.getprofile() is not None:
+            # Already profiled, as the run's own thread is
+            yield
+            return
+        profile = getattr(self.local, "profile", None)
+        if profile is None:
+            profile = self.local.profile = cProfile.Profile()
+            with self.lock:
+                self.profiles.append(profile)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def start(self) -> None:
+        global _active
+        profile = cProfile.Profile()
+        self.profiles.append(profile)
+        profile.enable()
+        _active = self
+
+    def stop(self) -> pstats.Stats:
+        global _active
+        _active = None
+        self.profiles[0].disable()
+        with self.lock:
+            profiles = list(self.profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            try:
+                stats.add(profile)
+            except TypeError:
+                # Thread still running and never produced any stats
+                continue
+        return stats
+
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Wraps work handed to another thread so that the deterministic profile
+    of the run in progress covers it; outside profiled runs, fn is called
+    as is
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profiles = _active
+        if profiles is None:
+            return fn(*args, **kwargs)
+        with profiles.thread():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+class RunProfiler:
+    """Profiles N out of every M scheduled runs
+
+    Sampling mode records the stacks of all threads as collapsed stacks
+    (.folded) for flame graph tools; deterministic mode runs cProfile on the
+    run's thread and on the work it hands to worker threads (.pstats,
+    readable by snakeviz, flameprof or gprof2dot). The hottest functions are logged
+    after each profiled run, and only the newest keep profiles are kept.
+    """
+
+    TOP_FUNCTIONS = 15
+
+    def __init__(
+        self,
+        mode: str,
+        runs: int,
+        every: int,
+        directory: str,
+        keep: int,
+        logger,
+        interval: float = 0.01,
+    ):
+        self.mode = mode
+        self.runs = max(0, int(runs))
+        self.every = max(1, int(every))
+        self.directory = directory
+        self.keep = max(1, int(keep))
+        self.logger = logger
+        self.interval = interval
+        self.run_count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in (SAMPLING, DETERMINISTIC) and self.runs > 0
+
+    def should_profile(self) -> bool:
+        """True for the first N runs of every window of M runs"""
+        run = self.run_count
+        self.run_count += 1
+        return self.enabled and run % self.every < self.runs
+
+    @contextmanager
+    def profile(self):
+        if not self.should_profile():
+            yield
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = os.path.join(
+            self.directory, f"run-{datetime.now():%Y%m%d-%H%M%S}-{self.run_count}"
+        )
+        started = time.monotonic()
+        if self.mode == SAMPLING:
+            profiler = StackSampler(self.interval)
+        else:
+            profiler = ThreadProfiles()
+        profiler.start()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            try:
+                self._report(profiler, name, elapsed)
+                self._rotate()
+            except Exception as e:
+                self.logger.error(f"Writing the run profile failed: {str(e)}")
+
+    def _report(self, profiler, name: str, elapsed: float) -> None:
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+            path = f"{name}.folded"
+            profiler.write(path)
+            samples = max(1, sum(profiler.stacks.values()))
+            lines = [
+                f"{own / samples:6.1%} self {total / samples:6.1%} total  {function}"
+                for function, own, total in profiler.top(self.TOP_FUNCTIONS)
+            ]
+        else:
+            stats = profiler.stop()
+            path = f"{name}.pstats"
+            stats.dump_stats(path)
+            output = io.StringIO()
+            stats.stream = output
+            stats.strip_dirs().sort_stats("tottime").print_stats(self.TOP_FUNCTIONS)
+            lines = self._pstats_lines(output.getvalue())
+        self.logger.info(
+            f"Profiled run in {elapsed:.1f}s written to {path}. Top functions:\n"
+            + "\n".join(lines)
+        )
+
+    @staticmethod
+    def _pstats_lines(report: str) -> List[str]:
+        lines = report.splitlines()
+        for index, line in enumerate(lines):
+            if line.lstrip().startswith("ncalls"):
+                return [line for line in lines[index:] if line.strip()]
+        return lines
+
+    def _rotate(self) -> None:
+        profiles: Dict[str, float] = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.startswith("run-"):
+                profiles[entry.path] = entry.stat().st_mtime
+        for path in sorted(profiles, key=profiles.get)[: -self.keep]:
+            os.remove(path)
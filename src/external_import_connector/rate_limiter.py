@@ -0,0 +1,173 @@
+import functools
+import json
+import os
+import random
+import threading
+import time
+from typing import IO, Callable, Optional
+
+RATE_LIMIT_PHRASES = ("rate limit", "rate_limit", "too many requests")
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True when an LLM client error is an HTTP 429 / rate limit response"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    # Bare numbers are not checked: a record ID or CVE may contain 429
+    message = str(error).lower()
+    return any(phrase in message for phrase in RATE_LIMIT_PHRASES)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Reads the Retry-After header from a rate limit error, if there is one"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a constant rate"""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Blocks until the requested tokens are available"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Shared DeepSeek rate limiting with 429-aware backoff
+
+    Every call takes a token from a bucket sized to the API quota. When a call
+    is rejected with 429 all callers sharing the limiter pause, not only the
+    one that hit the limit, then the call is retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        burst: int,
+        max_retries: int,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+    ):
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+
+    def backoff(self, delay: float) -> None:
+        """Pauses every caller for at least delay seconds"""
+        with self.lock:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def acquire(self, tokens: float = 1) -> None:
+        while True:
+            with self.lock:
+                wait = self.paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        self.bucket.acquire(tokens)
+
+    def call(self, fn: Callable, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = retry_after_seconds(e) or min(
+                    self.max_delay, self.base_delay * 2**attempt
+                )
+                self.backoff(delay + random.uniform(0, self.base_delay))
+                attempt += 1
+
+    def wrap(self, call_name: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def limited(*args, **kwargs):
+            return self.call(fn, *args, **kwargs)
+
+        return limited
+
+    def serve(self, requests: IO[str], grants: IO[str]) -> None:
+        """Answers the requests of a RemoteRateLimiter until it closes its pipe"""
+        for line in requests:
+            message = json.loads(line)
+            if "backoff" in message:
+                self.backoff(message["backoff"])
+                continue
+            self.acquire(message["acquire"])
+            try:
+                grants.write("\n")
+                grants.flush()
+            except OSError:
+                break  # The child process is gone
+
+
+class RemoteRateLimiter(RateLimiter):
+    """Rate limiter of a child process, drawing on its parent's limiter
+
+    Every acquire sends an {"acquire": tokens} line over the requests pipe
+    and blocks until RateLimiter.serve grants it, so all workers share one
+    bucket. Backoffs are forwarded as {"backoff": delay} and pause them all.
+    """
+
+    def __init__(
+        self,
+        requests_fd: int,
+        grants_fd: int,
+        max_retries: int,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+    ):
+        self.requests = os.fdopen(requests_fd, "w")
+        self.grants = os.fdopen(grants_fd, "r")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+
+    def _send(self, message: dict) -> None:
+        self.requests.write(json.dumps(message) + "\n")
+        self.requests.flush()
+
+    def backoff(self, delay: float) -> None:
+        with self.lock:
+            self.rate_limited += 1
+            self._send({"backoff": delay})
+
+    def acquire(self, tokens: float = 1) -> None:
+        with self.lock:
+            self._send({"acquire": tokens})
+            if not self.grants.readline():
+                raise RuntimeError("Parent process stopped granting rate limit tokens")
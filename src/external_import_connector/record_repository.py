@@ -1,5 +1,7 @@
+from datetime import datetime
+
 from .db import DBSingleton
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Union
 
 
 class RecordRepository:
@@ -8,29 +10,63 @@ class RecordRepository:
     def __init__(self):
         self.db_handler = DBSingleton().get_instance()
 
-    def fetch_unprocessed(self) -> list:
-        return self.db_handler.fetch_unprocessed_data()
+    def fetch_unprocessed(self, with_html: bool = True) -> list:
+        return self.db_handler.fetch_unprocessed_data(with_html)
+
+    def fetch_html(self, record_ids: list) -> Dict[int, str]:
+        return self.db_handler.fetch_html(record_ids)
+
+    def get_run_cursor(self) -> Optional[int]:
+        """ID of the record the last budgeted run stopped after"""
+        value = self.db_handler.get_state("run_cursor")
+        return int(value) if value else None
+
+    def save_run_cursor(self, record_id: Optional[int]) -> None:
+        self.db_handler.set_state(
+            "run_cursor", str(record_id) if record_id is not None else None
+        )
 
     def mark_processed(self, record_id: int) -> None:
         self.db_handler.mark_as_processed(record_id)
 
-    def get_stix_bundle(self, record_id: int) -> Optional[dict]:
+    def get_stix_bundle(self, record_id: int) -> Optional[str]:
         return self.db_handler.get_stix_bundle(record_id)
 
+    def get_report_refs(self, record_ids: list) -> Dict[int, Tuple[str, Optional[str]]]:
+        """(STIX ID, created_by_ref) of each record's stored report"""
+        return self.db_handler.get_report_refs(record_ids)
+
     def mark_deepseek_complete(
-        self, record_id: int, stix_data: dict, stix_bundle: dict
+        self, record_id: int, stix_data: dict, stix_bundle: Union[dict, str]
     ) -> None:
         self.db_handler.mark_sent_to_deepseek(record_id, stix_data, stix_bundle)
 
     def mark_opencti_complete(self, record_id: int) -> None:
         self.db_handler.mark_sent_to_opencti(record_id)
 
+    def record_stage_failure(self, record_id: int, stage: str, error: str) -> int:
+        return self.db_handler.record_stage_failure(record_id, stage, error)
+
+    def schedule_stage_retry(
+        self, record_id: int, stage: str, next_attempt_at: Optional[datetime]
+    ) -> None:
+        self.db_handler.schedule_stage_retry(record_id, stage, next_attempt_at)
+
+    def mark_stages_done(self, record_id: int) -> None:
+        self.db_handler.mark_stages_done(record_id)
+
     def get_classification_results(
         self, record_id: int, table_name: str
     ) -> Optional[dict]:
         """Retrieve classification results from specified table"""
         return self.db_handler.get_classification_results(record_id, table_name)
 
+    def get_latest_classifications(
+        self, table_name: str, record_ids: list
+    ) -> Dict[int, dict]:
+        """Retrieve the latest classification of many records at once"""
+        return self.db_handler.get_latest_classifications(table_name, record_ids)
+
     @staticmethod
     def unpack_record(record: tuple) -> Optional[Dict[str, Any]]:
         try:
@@ -0,0 +1,91 @@
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+
+class RunBudget:
+    """Bounds one scheduled run in time and in records
+
+    Records are admitted into the pipeline until the deadline passes or the
+    record budget is used; records already admitted are still finished.
+    With a record budget, each run takes the first records of the backlog
+    in priority order when an order is given, otherwise in ID order. Among
+    records of equal priority, those after the cursor left by the previous
+    run come first, wrapping around, so records that keep being fetched
+    without completing cannot crowd out the rest. A budget of 0 means no
+    limit.
+    """
+
+    def __init__(self, max_seconds: float, max_records: int):
+        self.max_seconds = float(max_seconds or 0)
+        self.max_records = int(max_records or 0)
+        self.started = time.monotonic()
+        self.admitted: List[int] = []
+        self.stopped = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def expired(self) -> bool:
+        if self.max_records and len(self.admitted) >= self.max_records:
+            return True
+        return bool(self.max_seconds) and self.elapsed >= self.max_seconds
+
+    def admit(self, records: Iterable[dict]) -> Iterator[dict]:
+        """Yields records until the budget is exhausted"""
+        for record_data in records:
+            if self.expired():
+                self.stopped = True
+                return
+            self.admitted.append(record_data["id"])
+            yield record_data
+
+    def select(
+        self,
+        records: List[dict],
+        cursor: Optional[int],
+        order: Optional[Callable[[List[dict]], List[dict]]] = None,
+    ) -> List[dict]:
+        """
+        The records of this run, by priority when order is given, then
+        continuing after the previous run's cursor
+
+        order must sort stably, so records it ranks equal keep their
+        position relative to the cursor.
+        """
+        records = sorted(records, key=lambda record_data: record_data["id"])
+        if cursor is not None:
+            start = next(
+                (
+                    i
+                    for i, record_data in enumerate(records)
+                    if record_data["id"] > cursor
+                ),
+                0,
+            )
+            records = records[start:] + records[:start]
+        if order:
+            records = order(records)
+        if self.max_records:
+            records = records[: self.max_records]
+        return records
+
+    def cursor(self, selected: List[dict], previous: Optional[int]) -> Optional[int]:
+        """
+        Last ID of the selection, in cursor order, up to which every record
+        was admitted, so the next run starts with the first record this one
+        did not reach
+        """
+        admitted = set(self.admitted)
+        cursor = previous
+        for record_data in sorted(
+            selected,
+            key=lambda record_data: (
+                previous is not None and record_data["id"] <= previous,
+                record_data["id"],
+            ),
+        ):
+            if record_data["id"] not in admitted:
+                break
+            cursor = record_data["id"]
+        return cursor
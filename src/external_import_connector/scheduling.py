@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+EXPLOIT_CATEGORY = "Exploit"
+EXPLOIT_MIN_CONFIDENCE = 0.9
+
+
+def meets_criteria(v2: Optional[dict], v3: Optional[dict]) -> bool:
+    """Both classifiers label the record an exploit with high confidence"""
+    return bool(
+        v2
+        and v3
+        and v2["category"] == EXPLOIT_CATEGORY
+        and v3["category"] == EXPLOIT_CATEGORY
+        and v2["confidence"] > EXPLOIT_MIN_CONFIDENCE
+        and v3["confidence"] > EXPLOIT_MIN_CONFIDENCE
+    )
+
+
+def keyword_hits(keywords: Optional[str]) -> int:
+    return len([k for k in (keywords or "").split(",") if k.strip()])
+
+
+class PriorityScheduler:
+    """Orders a run's records so the most valuable ones are processed first
+
+    A record's score combines its exploit likelihood (the lower of the two
+    classifier confidences, or a neutral prior before classification), its
+    matched keyword hits and a recency bonus halving every half_life_hours.
+    An aging term growing with the record's age keeps old records from
+    being starved by a steady stream of new ones.
+
+    Records in the fast lane come first: those already converted by
+    txt2stix, then those already classified as exploits. They only need the
+    remaining stages and are the most likely to yield intelligence.
+    """
+
+    CONFIDENCE_WEIGHT = 1.0
+    KEYWORD_WEIGHT = 0.5
+    RECENCY_WEIGHT = 1.0
+    UNCLASSIFIED_CONFIDENCE = 0.5
+    MAX_KEYWORD_HITS = 5
+
+    def __init__(self, half_life_hours: float, aging_per_day: float):
+        self.half_life_hours = max(half_life_hours, 0.001)
+        self.aging_per_day = aging_per_day
+
+    @staticmethod
+    def _exploit_confidence(classification: Optional[dict]) -> Optional[float]:
+        if not classification:
+            return None
+        confidence = classification["confidence"] or 0.0
+        if classification["category"] != EXPLOIT_CATEGORY:
+            return 1.0 - confidence
+        return confidence
+
+    def score(
+        self,
+        record_data: dict,
+        v2: Optional[dict],
+        v3: Optional[dict],
+        now: datetime,
+    ) -> float:
+        confidences = [
+            c for c in map(self._exploit_confidence, (v2, v3)) if c is not None
+        ]
+        likelihood = min(confidences) if confidences else self.UNCLASSIFIED_CONFIDENCE
+        hits = min(keyword_hits(record_data.get("keywords")), self.MAX_KEYWORD_HITS)
+
+        age_hours = 0.0
+        if isinstance(record_data.get("timestamp"), datetime):
+            age_hours = max(
+                0.0, (now - record_data["timestamp"]).total_seconds() / 3600
+            )
+        recency = 0.5 ** (age_hours / self.half_life_hours)
+        aging = self.aging_per_day * age_hours / 24
+
+        return (
+            self.CONFIDENCE_WEIGHT * likelihood
+            + self.KEYWORD_WEIGHT * hits / self.MAX_KEYWORD_HITS
+            + self.RECENCY_WEIGHT * recency
+            + aging
+        )
+
+    def order(
+        self,
+        records: List[dict],
+        v2_results: Dict[int, dict],
+        v3_results: Dict[int, dict],
+        now: Optional[datetime] = None,
+    ) -> List[dict]:
+        now = now or datetime.now()
+
+        def key(record_data: dict):
+            v2 = v2_results.get(record_data["id"])
+            v3 = v3_results.get(record_data["id"])
+            if record_data.get("sent_to_deepseek"):
+                lane = 0
+            elif meets_criteria(v2, v3):
+                lane = 1
+            else:
+                lane = 2
+            return lane, -self.score(record_data, v2, v3, now)
+
+        return sorted(records, key=key)
@@ -0,0 +1,50 @@
+import json
+import uuid
+from typing import Dict, List, Tuple
+
+from .bundle_stream import OBJECT, scan_bundle
+
+
+def _version(obj: dict) -> Tuple[str, float]:
+    """Sort key of a STIX object version: 'modified', else 'created'"""
+    value = obj.get("modified") or obj.get("created") or ""
+    base, _, fraction = value.rstrip("Z").partition(".")
+    return base, float(f"0.{fraction}") if fraction.isdigit() else 0.0
+
+
+class BundleAggregator:
+    """Merges the bundles of several records into one de-duplicated bundle
+
+    Objects are keyed by STIX ID; when records share an object (ATT&CK
+    patterns, identities, marking definitions) the version with the latest
+    'modified' timestamp is kept.
+    """
+
+    def __init__(self):
+        self.objects: Dict[str, dict] = {}
+        self.record_ids: List[int] = []
+
+    def add(self, record_id: int, bundle_json: str) -> None:
+        """Adds a serialized bundle; nothing is kept if it is malformed"""
+        objects = [obj for event, obj in scan_bundle(bundle_json) if event == OBJECT]
+        # Checked up front, so a bad object leaves no partial merge behind
+        for obj in objects:
+            if not isinstance(obj, dict) or "id" not in obj:
+                raise ValueError(f"STIX object without an id: {str(obj)[:100]}")
+        for obj in objects:
+            existing = self.objects.get(obj["id"])
+            if existing is None or _version(obj) >= _version(existing):
+                self.objects[obj["id"]] = obj
+        self.record_ids.append(record_id)
+
+    def __len__(self) -> int:
+        return len(self.record_ids)
+
+    def serialize(self) -> str:
+        return json.dumps(
+            {
+                "type": "bundle",
+                "id": f"bundle--{uuid.uuid4()}",
+                "objects": list(self.objects.values()),
+            }
+        )
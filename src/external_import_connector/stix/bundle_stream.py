@@ -0,0 +1,136 @@
+import json
+import re
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Scanner events
+FIELD = "field"
+BEGIN_OBJECTS = "begin_objects"
+OBJECT = "object"
+END_OBJECTS = "end_objects"
+
+
+def _skip(text: str, index: int) -> int:
+    return _WHITESPACE.match(text, index).end()
+
+
+def _expect(text: str, index: int, char: str) -> int:
+    if text[index : index + 1] != char:
+        raise ValueError(f"Expected '{char}' at position {index} of STIX bundle")
+    return _skip(text, index + 1)
+
+
+def scan_bundle(bundle_json: str) -> Iterator[Tuple[str, object]]:
+    """
+    Incrementally parses a serialized STIX bundle
+
+    Yields (FIELD, (key, value)) for top-level fields and one (OBJECT, obj)
+    per entry of "objects", between BEGIN_OBJECTS and END_OBJECTS markers.
+    Only one STIX object is materialized at a time.
+    """
+    index = _expect(bundle_json, _skip(bundle_json, 0), "{")
+    if bundle_json[index : index + 1] == "}":
+        return
+    while True:
+        key, index = _decoder.raw_decode(bundle_json, index)
+        index = _expect(bundle_json, _skip(bundle_json, index), ":")
+        if key == "objects" and bundle_json[index : index + 1] == "[":
+            yield BEGIN_OBJECTS, None
+            index = _skip(bundle_json, index + 1)
+            while bundle_json[index : index + 1] != "]":
+                obj, index = _decoder.raw_decode(bundle_json, index)
+                yield OBJECT, obj
+                index = _skip(bundle_json, index)
+                if bundle_json[index : index + 1] == ",":
+                    index = _skip(bundle_json, index + 1)
+                elif bundle_json[index : index + 1] != "]":
+                    raise ValueError(
+                        f"Expected ',' or ']' at position {index} of STIX bundle"
+                    )
+            yield END_OBJECTS, None
+            index += 1
+        else:
+            value, index = _decoder.raw_decode(bundle_json, index)
+            yield FIELD, (key, value)
+        index = _skip(bundle_json, index)
+        if bundle_json[index : index + 1] != ",":
+            _expect(bundle_json, index, "}")
+            return
+        index = _skip(bundle_json, index + 1)
+
+
+def bundle_error(bundle_json: str) -> Optional[str]:
+    """
+    Checks the bundle structure
+
+    Top-level keys may come in any order. Scanning stops once both "type"
+    and the "objects" list have been seen, so the objects are only parsed
+    when "type" comes after them.
+
+    :return: None when valid, otherwise a description of the problem
+    """
+    bundle_type = None
+    has_objects = False
+    try:
+        for event, item in scan_bundle(bundle_json):
+            if event == FIELD and item[0] == "type":
+                bundle_type = item[1]
+            elif event == BEGIN_OBJECTS:
+                has_objects = True
+            if has_objects and bundle_type is not None:
+                break
+    except (ValueError, IndexError) as e:
+        return f"Malformed JSON: {str(e)}"
+    if bundle_type != "bundle":
+        return "Missing or incorrect 'type'"
+    if not has_objects:
+        return "Missing or invalid 'objects' list"
+    return None
+
+
+def rewrite_relationship_type(obj: dict) -> dict:
+    """Replace all 'relationship_type' values with 'related-to'"""
+    if "relationship_type" in obj:
+        obj["relationship_type"] = "related-to"
+    return obj
+
+
+class BundleTransformer:
+    """Applies per-object rewrite rules while re-serializing a bundle
+
+    A rule takes a STIX object and returns it (possibly modified) or None to
+    drop it. Output is produced piece by piece, so the full object tree is
+    never held in memory.
+    """
+
+    def __init__(self, rules: Iterable[Callable[[dict], Optional[dict]]]):
+        self.rules = list(rules)
+
+    def transform(self, bundle_json: str) -> Iterator[str]:
+        yield "{"
+        separator = ""
+        first_object = True
+        for event, item in scan_bundle(bundle_json):
+            if event == FIELD:
+                key, value = item
+                yield f"{separator}{json.dumps(key)}: {json.dumps(value)}"
+                separator = ", "
+            elif event == BEGIN_OBJECTS:
+                yield f'{separator}"objects": ['
+                separator = ", "
+            elif event == OBJECT:
+                for rule in self.rules:
+                    item = rule(item)
+                    if item is None:
+                        break
+                else:
+                    yield ("" if first_object else ", ") + json.dumps(item)
+                    first_object = False
+            elif event == END_OBJECTS:
+                yield "]"
+        yield "}"
+
+    def serialize(self, bundle_json: str) -> str:
+        return "".join(self.transform(bundle_json))
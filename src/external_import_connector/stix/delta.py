@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from .bundle_stream import OBJECT, BundleTransformer, scan_bundle
+from .known_objects import NEVER_STRIPPED, content_hash
+
+# Relationship-like objects, kept when they link a new or changed object
+LINK_REFS = {
+    "relationship": ("source_ref", "target_ref"),
+    "sighting": ("sighting_of_ref", "where_sighted_refs", "observed_data_refs"),
+}
+
+
+class DeltaTracker:
+    """Reduces bundles of re-crawled pages to what changed since last time
+
+    The content hash of every object delivered for a source URL is kept in
+    SQLite. A later bundle for the same URL keeps only new or modified
+    objects, the relationships that link them, and its report; the report
+    still lists every object, which OpenCTI resolves to the copies it
+    already has.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS delivered_objects (
+                    url TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    hash BLOB NOT NULL,
+                    PRIMARY KEY (url, id)
+                ) WITHOUT ROWID"""
+            )
+
+    def _delivered(self, url: str) -> Dict[str, bytes]:
+        with self.lock:
+            return dict(
+                self.conn.execute(
+                    "SELECT id, hash FROM delivered_objects WHERE url = ?", (url,)
+                )
+            )
+
+    def delta(self, url: str, bundle_json: str) -> Tuple[str, List[Tuple[str, bytes]]]:
+        """
+        :return: the reduced bundle and the (id, hash) of the objects it
+            still carries, to remember once it was delivered
+        """
+        delivered = self._delivered(url)
+        if not delivered:
+            pending = [
+                (obj["id"], content_hash(obj))
+                for event, obj in scan_bundle(bundle_json)
+                if event == OBJECT
+            ]
+            return bundle_json, pending
+
+        hashes: Dict[str, bytes] = {}
+        links: Dict[str, Set[str]] = {}
+        for event, obj in scan_bundle(bundle_json):
+            if event != OBJECT:
+                continue
+            hashes[obj["id"]] = content_hash(obj)
+            if obj["type"] in LINK_REFS:
+                links[obj["id"]] = self._linked(obj)
+        changed = {
+            stix_id
+            for stix_id, digest in hashes.items()
+            if delivered.get(stix_id) != digest
+        }
+
+        pending = []
+
+        def rule(obj: dict) -> Optional[dict]:
+            keep = (
+                obj["id"] in changed
+                or obj["type"] in NEVER_STRIPPED
+                or bool(links.get(obj["id"], set()) & changed)
+            )
+            if not keep:
+                return None
+            pending.append((obj["id"], hashes[obj["id"]]))
+            return obj
+
+        return BundleTransformer([rule]).serialize(bundle_json), pending
+
+    @staticmethod
+    def _linked(obj: dict) -> Set[str]:
+        linked = set()
+        for key in LINK_REFS[obj["type"]]:
+            value = obj.get(key)
+            if isinstance(value, str):
+                linked.add(value)
+            elif isinstance(value, list):
+                linked.update(value)
+        return linked
+
+    def remember(self, url: str, delivered: List[Tuple[str, bytes]]) -> None:
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO delivered_objects VALUES (?, ?, ?)",
+                [(url, stix_id, digest) for stix_id, digest in delivered],
+            )
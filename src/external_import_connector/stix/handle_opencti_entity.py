@@ -1,9 +1,36 @@
-from typing import Dict, Optional
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..metrics import count_cache
 
 
 class OpenCTIEntityHandler:
     """Handles OpenCTI entity search and verification operations"""
 
+    # Values per filter in one query; results are paginated with getAll
+    BATCH_SIZE = 100
+    ATTRIBUTES = """
+        id
+        standard_id
+        entity_type
+        created_at
+        updated_at
+    """
+    # A report's STIX ID may be one of those merged into the entity, and
+    # createdBy scopes it to its author
+    ID_ATTRIBUTES = (
+        ATTRIBUTES
+        + """
+        x_opencti_stix_ids
+        createdBy {
+            ... on Identity {
+                standard_id
+                x_opencti_stix_ids
+            }
+        }
+    """
+    )
+
     def __init__(self, helper, config):
         """
         Initialize with OpenCTI helper and config
@@ -14,6 +41,121 @@ class OpenCTIEntityHandler:
         self.helper = helper
         self.config = config
         self.logger = helper.connector_logger
+        self.cache_ttl = float(getattr(config, "entity_cache_ttl", 0) or 0)
+        self._cache: Dict[Tuple[str, str], Tuple[float, Optional[Dict]]] = {}
+
+    def _cached(self, key: Tuple[str, str]) -> Tuple[bool, Optional[Dict]]:
+        entry = self._cache.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            count_cache("entity", False)
+            return False, None
+        count_cache("entity", True)
+        return True, entry[1]
+
+    def _store(self, key: Tuple[str, str], entity: Optional[Dict]) -> None:
+        if self.cache_ttl > 0:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, entity)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        # Snapshot first: pipeline workers may update the cache meanwhile
+        for key, entry in list(self._cache.items()):
+            if entry[0] < now:
+                self._cache.pop(key, None)
+
+    def search_entities(
+        self, entity_type: str, names: Iterable[str]
+    ) -> Dict[str, Optional[Dict]]:
+        """
+        Search for many entities of one type by name
+
+        Names missing from the cache are resolved in filtered, paginated
+        queries of up to BATCH_SIZE names each; misses are cached too.
+
+        :param entity_type: OpenCTI entity type (e.g., 'Report', 'Malware')
+        :param names: Entity names to search for
+        :return: Matching entity or None, by name
+        """
+        self._expire()
+        results = {}
+        pending = []
+        for name in dict.fromkeys(names):
+            found, entity = self._cached((entity_type.lower(), name.lower()))
+            if found:
+                results[name] = entity
+            else:
+                pending.append(name)
+
+        for i in range(0, len(pending), self.BATCH_SIZE):
+            batch = pending[i : i + self.BATCH_SIZE]
+            entities = self.helper.api.stix_domain_object.list(
+                types=[entity_type],
+                filters={
+                    "mode": "and",
+                    "filters": [
+                        {
+                            "key": "name",
+                            "values": batch,
+                            "operator": "eq",
+                            "mode": "or",
+                        }
+                    ],
+                    "filterGroups": [],
+                },
+                getAll=True,
+                customAttributes=self.ATTRIBUTES
+                + f"... on {entity_type.replace('-', '')} {{ name }}",
+            )
+            by_name = {
+                entity["name"].lower(): entity
+                for entity in entities
+                if entity.get("name")
+            }
+            for name in batch:
+                entity = by_name.get(name.lower())
+                self._store((entity_type.lower(), name.lower()), entity)
+                results[name] = entity
+        return results
+
+    def search_entities_by_id(
+        self, stix_ids: Iterable[str]
+    ) -> Dict[str, Optional[Dict]]:
+        """
+        Search for many STIX core objects by STIX ID in batched queries
+
+        :param stix_ids: STIX IDs to search for
+        :return: Matching entity or None, by STIX ID
+        """
+        self._expire()
+        results = {}
+        pending: List[str] = []
+        for stix_id in dict.fromkeys(stix_ids):
+            found, entity = self._cached(("id", stix_id))
+            if found:
+                results[stix_id] = entity
+            else:
+                pending.append(stix_id)
+
+        for i in range(0, len(pending), self.BATCH_SIZE):
+            batch = pending[i : i + self.BATCH_SIZE]
+            entities = self.helper.api.stix_core_object.list(
+                filters={
+                    "mode": "and",
+                    "filters": [{"key": "ids", "values": batch}],
+                    "filterGroups": [],
+                },
+                getAll=True,
+                customAttributes=self.ID_ATTRIBUTES,
+            )
+            by_id = {}
+            for entity in entities:
+                for entity_id in _stix_ids(entity):
+                    by_id[entity_id] = entity
+            for stix_id in batch:
+                entity = by_id.get(stix_id)
+                self._store(("id", stix_id), entity)
+                results[stix_id] = entity
+        return results
 
     def search_entity_by_name_type(
         self, entity_type: str, name: str, stix_id: Optional[str] = None
@@ -27,33 +169,9 @@ class OpenCTIEntityHandler:
         :return: First matching entity or None
         """
         try:
-            filters = []
             if stix_id:
-                filters.append({"key": "id", "values": [stix_id]})
-            else:
-                filters.append(
-                    {
-                        "key": "name",
-                        "values": [name],
-                        "operator": "eq",
-                        "mode": "insensitive",
-                    }
-                )
-                filters.append({"key": "entity_type", "values": [entity_type]})
-
-            result = self.helper.api.stix_domain_object.list(
-                filters=filters,
-                first=1,
-                customAttributes="""
-                    id
-                    name
-                    entity_type
-                    created
-                    modified
-                """,
-            )
-
-            return result[0] if result else None
+                return self.search_entities_by_id([stix_id])[stix_id]
+            return self.search_entities(entity_type, [name])[name]
 
         except Exception as e:
             self.logger.error(
@@ -61,15 +179,55 @@ class OpenCTIEntityHandler:
             )
             return None
 
+    @staticmethod
+    def may_exist(record_data: Dict) -> bool:
+        """Whether a previous run may have delivered the record's bundle"""
+        # Bundles converted in this run cannot have been delivered yet
+        return bool(
+            record_data.get("sent_to_deepseek")
+            and not record_data.get("sent_to_opencti")
+        )
+
+    def prefetch(self, records: Iterable[Dict]) -> None:
+        """Looks up the reports of many records in one batched search"""
+        stix_ids = [
+            record_data["report_ref"][0]
+            for record_data in records
+            if self.may_exist(record_data) and record_data.get("report_ref")
+        ]
+        if not stix_ids:
+            return
+        try:
+            self.search_entities_by_id(stix_ids)
+        except Exception as e:
+            self.logger.error(f"Report prefetch failed: {str(e)}")
+
     def entity_exists(self, record_data: Dict) -> bool:
         """
-        Check if similar entity already exists in OpenCTI
+        Check if the record's report already exists in OpenCTI, e.g. when a
+        previous run delivered it but could not record the delivery
+
+        The report is matched on report_ref, the (STIX ID, created_by_ref)
+        of the report in the record's stored bundle: its ID was generated
+        for this record, and the platform's copy must have the same author.
+        A report merely named after the record does not count.
         """
-        if not record_data.get("stix_id"):
+        if not self.may_exist(record_data) or not record_data.get("report_ref"):
             return False
 
+        stix_id, created_by_ref = record_data["report_ref"]
         existing = self.search_entity_by_name_type(
-            entity_type=record_data["malware"], name=record_data[""]
+            entity_type="Report", name=stix_id, stix_id=stix_id
+        )
+        if existing is None:
+            return False
+        return created_by_ref is None or created_by_ref in _stix_ids(
+            existing.get("createdBy")
         )
 
-        return existing is not None
+
+def _stix_ids(entity: Optional[Dict]) -> List[str]:
+    """STIX IDs an entity answers to: its own and those merged into it"""
+    if not entity:
+        return []
+    return [entity["standard_id"], *(entity.get("x_opencti_stix_ids") or [])]
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from ..metrics import count_cache
+from .bundle_stream import BundleTransformer
+
+# Regenerated on every extraction, so they do not make an object new
+VOLATILE_PROPERTIES = ("created", "modified")
+# Containers are unique per record and must always carry their object_refs
+NEVER_STRIPPED = ("report",)
+
+
+def content_hash(obj: dict) -> bytes:
+    content = {k: v for k, v in obj.items() if k not in VOLATILE_PROPERTIES}
+    return hashlib.blake2b(
+        json.dumps(content, sort_keys=True).encode(), digest_size=16
+    ).digest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(1, capacity)
+        self.size = max(
+            8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class KnownObjectIndex:
+    """Persistent index of STIX objects already delivered to OpenCTI
+
+    Each delivered object is stored as its STIX ID and a content hash in
+    SQLite. An in-memory Bloom filter over the IDs answers the common "never
+    seen" case without touching the database. Objects delivered with the
+    same content within ttl_days are stripped from later bundles; references
+    to them are left in place, as OpenCTI resolves them on import.
+    """
+
+    def __init__(self, path: str, capacity: int, ttl_days: float):
+        self.path = path
+        self.capacity = int(capacity)
+        self.ttl = ttl_days * 86400
+        self.stripped = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS known_objects (
+                    id TEXT PRIMARY KEY,
+                    hash BLOB NOT NULL,
+                    delivered_at REAL NOT NULL
+                ) WITHOUT ROWID"""
+            )
+        self._build_filter()
+
+    def _build_filter(self) -> None:
+        """Loads the Bloom filter from disk, dropping expired entries first"""
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM known_objects WHERE delivered_at < ?",
+                (time.time() - self.ttl,),
+            )
+        total = self.conn.execute("SELECT COUNT(*) FROM known_objects").fetchone()[0]
+        self.bloom = BloomFilter(max(self.capacity, total * 2))
+        for (stix_id,) in self.conn.execute("SELECT id FROM known_objects"):
+            self.bloom.add(stix_id)
+
+    def is_known(self, stix_id: str, digest: bytes) -> bool:
+        if stix_id not in self.bloom:
+            return False
+        row = self.conn.execute(
+            "SELECT hash, delivered_at FROM known_objects WHERE id = ?", (stix_id,)
+        ).fetchone()
+        return row is not None and row[0] == digest and row[1] >= time.time() - self.ttl
+
+    def strip(self, bundle_json: str) -> Tuple[str, List[Tuple[str, bytes]]]:
+        """
+        Removes objects already delivered with identical content
+
+        :return: the stripped bundle and the (id, hash) of the objects left
+            in it, to remember once the delivery succeeded
+        """
+        pending = []
+
+        def rule(obj: dict) -> Optional[dict]:
+            digest = content_hash(obj)
+            if obj["type"] not in NEVER_STRIPPED and self.is_known(obj["id"], digest):
+                self.stripped += 1
+                return None
+            pending.append((obj["id"], digest))
+            return obj
+
+        with self.lock:
+            stripped = self.stripped
+            bundle_json = BundleTransformer([rule]).serialize(bundle_json)
+            stripped = self.stripped - stripped
+        count_cache("known_objects", True, stripped)
+        count_cache("known_objects", False, len(pending))
+        return bundle_json, pending
+
+    def remember(self, delivered: List[Tuple[str, bytes]]) -> None:
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO known_objects VALUES (?, ?, ?)",
+                [(stix_id, digest, now) for stix_id, digest in delivered],
+            )
+            for stix_id, _ in delivered:
+                self.bloom.add(stix_id)
+            if self.bloom.count > self.bloom.capacity:
+                self._build_filter()
@@ -1,80 +1,266 @@
 import time
 import json
+from contextlib import ExitStack
 from datetime import datetime, timezone
+from typing import Dict, Iterable, Set, Union
 
 from pycti import OpenCTIApiClient
 
+from ..backpressure import IngestBackpressure
+from ..metrics import OPENCTI_IMPORT, stage_timer
+from ..tracing import span
+from .bundle_aggregator import BundleAggregator
+from .bundle_stream import bundle_error
+from .known_objects import KnownObjectIndex
+from .reference_resolver import resolve_references
+
+# Platform lookups used to check references missing from a bundle, by type
+_REFERENCE_LOOKUPS = {
+    "marking-definition": "marking_definition",
+    "relationship": "stix_core_relationship",
+    "sighting": "stix_sighting_relationship",
+}
+
 
 class OpenCTIHandler:
     """Handles all OpenCTI-specific operations including bundle creation and sending."""
 
-    def __init__(self, client: OpenCTIApiClient, helper):
+    def __init__(self, client: OpenCTIApiClient, helper, config=None, caller=None):
         self.helper = helper
         self.client = client
+        self.config = config
+        # Optional OpenCTICaller adding per-call timeouts and retries
+        self.caller = caller
+        # Why the last delivery of a record failed, until its caller reads it
+        self.errors: Dict[int, str] = {}
+        self.known_objects = None
+        if config and config.known_objects_enabled:
+            self.known_objects = KnownObjectIndex(
+                config.known_objects_path,
+                int(config.known_objects_capacity),
+                float(config.known_objects_ttl_days),
+            )
+        self.backpressure = None
+        if config and config.opencti_backpressure:
+            self.backpressure = IngestBackpressure(
+                helper,
+                config.opencti_workers,
+                config.opencti_aggregate_batch_size,
+                config.opencti_queue_poll_interval,
+                config.opencti_queue_max_wait,
+            )
 
-    def send_stix_bundle(self, bundle: dict, record_id: int) -> bool:
+    def send_stix_bundle(self, bundle: Union[str, dict], record_id: int) -> bool:
         """
         Validates and sends STIX objects to OpenCTI as a bundle.
+        A serialized bundle is sent as is, without a loads/dumps round trip.
         Returns True on success, False otherwise.
         """
-        if not self._validate_stix_bundle(bundle, record_id):
+        bundle_str = bundle if isinstance(bundle, str) else json.dumps(bundle)
+        if not self._validate_stix_bundle(bundle_str, record_id):
             return False
 
         try:
+            with span("opencti.send_stix_bundle", record_id, size=len(bundle_str)):
+                self._import_bundle(bundle_str, f"Processed record {record_id}")
+            self.errors.pop(record_id, None)
+            return True
 
-            bundle_str = json.dumps(bundle)
-
-            #
-            # # Register work
-            timestamp = int(time.time())
-
-            now = datetime.fromtimestamp(timestamp, timezone.utc)
-            friendly_name = f"DarcConnector run @ {now.strftime('%Y-%m-%d %H:%M:%S')}"
-            work_id = self.helper.api.work.initiate_work(
-                self.helper.connect_id, friendly_name
-            )
-            # # Send bundle : todo verify how this work cannot be done by helper: issue with missing references
-            # bundle_created = self.helper.stix2_create_bundle(bundle["objects"])
-            # self.helper.send_stix2_bundle(
-            #     bundle_created,
-            #     entities_types=self.helper.connect_scope,
-            #     update=False,
-            #     work_id=work_id,
-            # )
-            #
-            self.client.stix2.import_bundle_from_json(bundle_str, False, None, work_id)
-
-            # Finalize work
-            message = (
-                f"Processed record {record_id} at {now.strftime('%Y-%m-%d %H:%M:%S')}"
+        except Exception as e:
+            self._failed(
+                record_id,
+                f"Failed to process bundle for record {record_id}: {str(e)}",
+                exc_info=True,
             )
+            return False
 
-            self.helper.api.work.to_processed(work_id, message)
+    def send_stix_bundles(self, bundles: Dict[int, str]) -> Dict[int, bool]:
+        """
+        Sends the bundles of several records as one de-duplicated bundle
+        under a single work.
+        If the combined import fails, the records are sent one by one so a
+        single bad bundle does not fail the whole batch.
+        Returns success per record ID.
+        """
+        results = {}
+        aggregator = BundleAggregator()
+        for record_id, bundle in bundles.items():
+            if not self._validate_stix_bundle(bundle, record_id):
+                results[record_id] = False
+                continue
+            try:
+                aggregator.add(record_id, bundle)
+            except (ValueError, KeyError) as e:
+                self._failed(
+                    record_id, f"Invalid STIX bundle (record {record_id}): {str(e)}"
+                )
+                results[record_id] = False
 
-            return True
+        if len(aggregator) == 0:
+            return results
 
+        try:
+            with span("opencti.send_stix_bundles", records=len(aggregator)):
+                self._import_bundle(
+                    aggregator.serialize(),
+                    f"Processed {len(aggregator)} records ({len(aggregator.objects)} objects)",
+                )
+            results.update({record_id: True for record_id in aggregator.record_ids})
+            for record_id in aggregator.record_ids:
+                self.errors.pop(record_id, None)
         except Exception as e:
             self.helper.connector_logger.error(
-                f"Failed to process bundle for record {record_id}: {str(e)}",
+                f"Failed to process aggregated bundle of records {aggregator.record_ids}: {str(e)}",
                 exc_info=True,
             )
-            return False
+            for record_id in aggregator.record_ids:
+                if len(aggregator) == 1:
+                    self.errors[record_id] = str(e)
+                    results[record_id] = False
+                else:
+                    results[record_id] = self.send_stix_bundle(
+                        bundles[record_id], record_id
+                    )
+        return results
 
-    def _validate_stix_bundle(self, bundle: dict, record_id: int) -> bool:
-        """Validates STIX bundle structure."""
-        if not isinstance(bundle, dict):
-            self.helper.connector_logger.error(
-                f"Invalid STIX format (record {record_id}): Expected dict, got {type(bundle)}"
+    def _call(self, call_type: str, fn, *args, **kwargs):
+        with span(f"opencti.{call_type}", call=getattr(fn, "__name__", None)):
+            if self.caller is None:
+                return fn(*args, **kwargs)
+            return self.caller.call(call_type, fn, *args, **kwargs)
+
+    @property
+    def send_to_queue(self) -> bool:
+        return bool(self.config and self.config.opencti_send_to_queue)
+
+    def _import_bundle(self, bundle_str: str, message: str) -> None:
+        """
+        Imports a serialized bundle under a new work, either synchronously
+        through the API or by publishing it to the connector queue
+        """
+        if self.send_to_queue:
+            with span("opencti.resolve_references"):
+                bundle_str = self._resolve_references(bundle_str)
+        delivered = None
+        if self.known_objects:
+            with span("known_objects.strip"):
+                bundle_str, delivered = self.known_objects.strip(bundle_str)
+            if not delivered:
+                self.helper.connector_logger.info(
+                    f"{message}: every object is already known to OpenCTI"
+                )
+                return
+        if self.backpressure is None and self.send_to_queue:
+            with span("opencti.wait_for_queue"):
+                self._wait_for_queue()
+        with ExitStack() as stack:
+            if self.backpressure:
+                with span("opencti.wait_for_slot"):
+                    stack.enter_context(self.backpressure.slot())
+            with stage_timer(OPENCTI_IMPORT), span("opencti.import"):
+                self._send_bundle(bundle_str, message)
+        # A queued bundle is not ingested yet and may still fail in the
+        # OpenCTI workers; only a synchronous import proves delivery
+        if delivered and not self.send_to_queue:
+            self.known_objects.remember(delivered)
+
+    def _send_bundle(self, bundle_str: str, message: str) -> None:
+        #
+        # # Register work
+        timestamp = int(time.time())
+
+        now = datetime.fromtimestamp(timestamp, timezone.utc)
+        friendly_name = f"DarcConnector run @ {now.strftime('%Y-%m-%d %H:%M:%S')}"
+        work_id = self._call(
+            "work",
+            self.helper.api.work.initiate_work,
+            self.helper.connect_id,
+            friendly_name,
+        )
+        if self.send_to_queue:
+            # OpenCTI workers ingest the bundle; the connector moves on
+            self._call(
+                "import",
+                self.helper.send_stix2_bundle,
+                bundle_str,
+                entities_types=self.helper.connect_scope,
+                update=False,
+                work_id=work_id,
+                send_to_queue=True,
             )
-            return False
-        if bundle.get("type") != "bundle":
-            self.helper.connector_logger.error(
-                f"Invalid STIX bundle (record {record_id}): Missing or incorrect 'type'"
+        else:
+            self._call(
+                "import",
+                self.client.stix2.import_bundle_from_json,
+                bundle_str,
+                False,
+                None,
+                work_id,
             )
-            return False
-        if not isinstance(bundle.get("objects"), list):
-            self.helper.connector_logger.error(
-                f"Invalid STIX bundle (record {record_id}): Missing or invalid 'objects' list"
+
+        # Finalize work
+        message = f"{message} at {now.strftime('%Y-%m-%d %H:%M:%S')}"
+
+        self._call("work", self.helper.api.work.to_processed, work_id, message)
+
+    def _resolve_references(self, bundle_str: str) -> str:
+        """Removes references the queue workers would not be able to resolve"""
+        bundle_str, stats = resolve_references(bundle_str, self._existing_ids)
+        if stats["dropped_objects"] or stats["pruned_refs"]:
+            self.helper.connector_logger.info(
+                f"Unresolved references - Dropped objects: {stats['dropped_objects']}, Pruned references: {stats['pruned_refs']}"
+            )
+        return bundle_str
+
+    def _existing_ids(self, stix_ids: Iterable[str]) -> Set[str]:
+        """Returns the STIX IDs that already exist in OpenCTI"""
+        by_lookup: Dict[str, list] = {}
+        for stix_id in stix_ids:
+            lookup = _REFERENCE_LOOKUPS.get(stix_id.split("--")[0], "stix_core_object")
+            by_lookup.setdefault(lookup, []).append(stix_id)
+
+        existing = set()
+        for lookup, ids in by_lookup.items():
+            api = getattr(self.helper.api, lookup)
+            for i in range(0, len(ids), 100):
+                entities = self._call(
+                    "lookup",
+                    api.list,
+                    filters={
+                        "mode": "and",
+                        "filters": [{"key": "ids", "values": ids[i : i + 100]}],
+                        "filterGroups": [],
+                    },
+                    getAll=True,
+                    customAttributes="id standard_id x_opencti_stix_ids",
+                )
+                for entity in entities:
+                    # A ref may be one of the IDs merged into the entity
+                    existing.add(entity["standard_id"])
+                    existing.update(entity.get("x_opencti_stix_ids") or [])
+        return existing
+
+    def _wait_for_queue(self) -> None:
+        """Holds delivery while the connector queue is above its threshold"""
+        deadline = time.monotonic() + int(self.config.opencti_queue_max_wait)
+        while self.helper.check_connector_buffering():
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    "Connector queue still above CONNECTOR_QUEUE_THRESHOLD"
+                )
+            time.sleep(int(self.config.opencti_queue_poll_interval))
+
+    def _validate_stix_bundle(self, bundle: str, record_id: int) -> bool:
+        """Validates STIX bundle structure without parsing its objects."""
+        error = bundle_error(bundle)
+        if error:
+            self._failed(
+                record_id, f"Invalid STIX bundle (record {record_id}): {error}"
             )
             return False
         return True
+
+    def _failed(self, record_id: int, message: str, **kwargs) -> None:
+        """Logs why a record was not delivered and keeps it in errors"""
+        self.helper.connector_logger.error(message, **kwargs)
+        self.errors[record_id] = message
@@ -0,0 +1,92 @@
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from .bundle_stream import OBJECT, BundleTransformer, scan_bundle
+
+# References an object cannot exist without
+REQUIRED_REFS = ("source_ref", "target_ref", "sighting_of_ref")
+
+
+def _references(value) -> Iterator[str]:
+    """Yields every STIX ID held in *_ref / *_refs properties, at any depth"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key.endswith("_ref") and isinstance(item, str):
+                yield item
+            elif key.endswith("_refs") and isinstance(item, list):
+                yield from (ref for ref in item if isinstance(ref, str))
+            else:
+                yield from _references(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _references(item)
+
+
+def _prune(value, missing: Set[str]):
+    if isinstance(value, dict):
+        pruned = {}
+        for key, item in value.items():
+            if key.endswith("_ref") and isinstance(item, str):
+                if item not in missing:
+                    pruned[key] = item
+            elif key.endswith("_refs") and isinstance(item, list):
+                pruned[key] = [ref for ref in item if ref not in missing]
+            else:
+                pruned[key] = _prune(item, missing)
+        return pruned
+    if isinstance(value, list):
+        return [_prune(item, missing) for item in value]
+    return value
+
+
+def resolve_references(
+    bundle_json: str, lookup: Callable[[Iterable[str]], Set[str]]
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Makes a bundle self-consistent before it is queued for OpenCTI workers
+
+    References that are neither in the bundle nor known to the platform
+    (lookup returns the IDs it knows) would make the workers retry the
+    referencing object until it is dropped. Instead, objects missing a
+    required reference (relationship ends, sighting_of_ref) are removed,
+    and every other dangling reference is pruned from the objects.
+
+    :return: the rewritten bundle and counts of dropped objects/pruned refs
+    """
+    ids = set()
+    references = set()
+    required: Dict[str, Set[str]] = {}
+    for event, obj in scan_bundle(bundle_json):
+        if event != OBJECT:
+            continue
+        ids.add(obj["id"])
+        references.update(_references(obj))
+        needs = {obj[key] for key in REQUIRED_REFS if isinstance(obj.get(key), str)}
+        if needs:
+            required[obj["id"]] = needs
+
+    missing = references - ids
+    if missing:
+        missing -= set(lookup(sorted(missing)))
+
+    # Dropping an object can orphan objects that require it in turn
+    dropped = set()
+    changed = bool(missing)
+    while changed:
+        changed = False
+        for obj_id, needs in required.items():
+            if obj_id not in dropped and needs & (missing | dropped):
+                dropped.add(obj_id)
+                changed = True
+
+    stats = {"dropped_objects": len(dropped), "pruned_refs": len(missing)}
+    if not missing and not dropped:
+        return bundle_json, stats
+
+    unavailable = missing | dropped
+
+    def rule(obj: dict) -> Optional[dict]:
+        if obj["id"] in dropped:
+            return None
+        return _prune(obj, unavailable)
+
+    return BundleTransformer([rule]).serialize(bundle_json), stats
@@ -1,80 +1,181 @@
+import functools
+import json
 import os
-import tempfile
 import subprocess
+import threading
+from typing import Dict, Tuple
 
 from .config_variables import ConfigConnector
+from .llm_cache import LLMCache
+from .metrics import count_cache
+from .rate_limiter import RateLimiter
+from .tracing import span
+from .txt2stix_runner import Txt2StixRunner
 
 
 class StixConverter:
     """Handles STIX conversion via external script"""
 
+    AI_PROVIDER = "deepseek:deepseek-chat"
+    EXTRACTIONS = "ai_mitre_attack_enterprise,ai_ipv4_address_only,ai_url,ai_file_name,ai_email_address"
+    TLP_LEVEL = "clear"
+    CONFIDENCE = 90
+
     def __init__(self, config: ConfigConnector, logger):
         self.config = config
         self.logger = logger
+        self.rate_limiter = RateLimiter(**self._rate_limit_settings())
+        call_wrappers = [self.rate_limiter]
+        self.llm_cache = None
+        if self.config.llm_cache_enabled:
+            # Outermost wrapper, so cache hits do not spend rate limit tokens
+            self.llm_cache = LLMCache(
+                **self._llm_cache_settings(),
+                on_lookup=functools.partial(count_cache, "llm"),
+            )
+            call_wrappers.append(self.llm_cache)
+        self.runner = Txt2StixRunner(
+            self._txt2stix_settings(),
+            self.EXTRACTIONS,
+            self.AI_PROVIDER,
+            self.TLP_LEVEL,
+            self.CONFIDENCE,
+            call_wrappers,
+        )
+
+    @property
+    def in_process(self) -> bool:
+        return self.config.txt2stix_mode == "inprocess"
+
+    def convert_in_memory(self, report_id: str, record_data: dict) -> Tuple[Dict, str]:
+        """
+        Runs txt2stix in-process and returns (stix_data, stix_bundle)
+
+        :raises RuntimeError: when txt2stix fails
+        """
+        try:
+            with span("txt2stix.run", record_data["id"]):
+                return self.runner.run(
+                    record_data["html"], f"Report {record_data['id']}", report_id
+                )
+        except Exception as e:
+            raise RuntimeError(f"STIX conversion failed: {str(e)}") from e
+
+    def convert(
+        self, report_id: str, record_data: dict, working_dir: str
+    ) -> Tuple[Dict, str]:
+        """
+        Runs txt2stix in a child process and returns (stix_data, stix_bundle)
 
-    def convert(self, report_id: str, record_data: dict, working_dir: str) -> bool:
+        The record text is piped to the worker's stdin and the result is read
+        back from its stdout, so nothing goes through temporary files. Each
+        DeepSeek call of the worker takes its token from self.rate_limiter
+        over a second pair of pipes, so the rate holds across all workers.
+
+        :raises RuntimeError: when txt2stix fails or its output is invalid
+        """
+        request = {
+            "text": record_data["html"],
+            "name": f"Report {record_data['id']}",
+            "report_id": report_id,
+            "extractions": self.EXTRACTIONS,
+            "ai_provider": self.AI_PROVIDER,
+            "tlp_level": self.TLP_LEVEL,
+            "confidence": self.CONFIDENCE,
+            "llm_cache": self._llm_cache_settings() if self.llm_cache else None,
+        }
         try:
-            with tempfile.NamedTemporaryFile(
-                mode="w+", delete=False, suffix=".txt"
-            ) as temp_file:
-                temp_file.write(record_data["html"])
-                temp_file_path = temp_file.name
-
-            cmd = [
-                "python3",
-                "../txt2stix/txt2stix.py",
-                "--relationship_mode",
-                "ai",
-                "--ai_settings_relationships",
-                "deepseek:deepseek-chat",
-                "--input_file",
-                temp_file_path,
-                "--name",
-                f"Report {record_data['id']}",
-                "--tlp_level",
-                "clear",
-                "--confidence",
-                "90",
-                "--use_extractions",
-                "ai_mitre_attack_enterprise,ai_ipv4_address_only,ai_url,ai_file_name,ai_email_address",
-                "--ai_settings_extractions",
-                "deepseek:deepseek-chat",
-                "--ai_content_check_provider",
-                "deepseek:deepseek-chat",
-                # "--ai_create_attack_flow",
-                "--report_id",
-                report_id,
-            ]
-
-            self.logger.info(f"Executing txt2stix: {' '.join(cmd)}")
-            env = self._prepare_environment()
-
-            subprocess.run(
-                cmd,
-                cwd=working_dir,
-                check=True,
-                env=env,
-                start_new_session=True,
+            self.logger.info(
+                f"Executing txt2stix for record {record_data['id']} (report {report_id})"
             )
-            return True
+            with span("txt2stix.subprocess", record_data["id"]):
+                stdout = self._run_worker(request, working_dir)
+            # The result header is a single line; the bundle stays serialized
+            header, stix_bundle = stdout.split("\n", 1)
+            result = json.loads(header)
+            if self.llm_cache and result.get("llm_cache"):
+                self.llm_cache.add_stats(result["llm_cache"])
+            return result["stix_data"], stix_bundle
         except subprocess.CalledProcessError as e:
-            self.logger.error(f"STIX conversion failed: {str(e)}")
-            return False
-        finally:
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
+            raise RuntimeError(f"STIX conversion failed: {str(e)}") from e
+        except (ValueError, KeyError) as e:
+            raise RuntimeError(f"Invalid txt2stix output: {str(e)}") from e
+
+    def _run_worker(self, request: dict, working_dir: str) -> str:
+        """
+        Runs the txt2stix worker on request, serving its rate limit requests
+        while it runs, and returns its stdout
+
+        :raises subprocess.CalledProcessError: when the worker fails
+        """
+        cmd = ["python3", os.path.join(os.path.dirname(__file__), "txt2stix_runner.py")]
+        requests_read, requests_write = os.pipe()
+        grants_read, grants_write = os.pipe()
+        request["rate_limit"] = {
+            "requests_fd": requests_write,
+            "grants_fd": grants_read,
+            "max_retries": self.rate_limiter.max_retries,
+            "base_delay": self.rate_limiter.base_delay,
+            "max_delay": self.rate_limiter.max_delay,
+        }
+        with os.fdopen(requests_read) as requests, os.fdopen(
+            grants_write, "w"
+        ) as grants:
+            try:
+                process = subprocess.Popen(
+                    cmd,
+                    cwd=working_dir,
+                    env=self._prepare_environment(),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                    start_new_session=True,
+                    pass_fds=(requests_write, grants_read),
+                )
+            finally:
+                # Only the worker keeps these ends, so the pipes close with it
+                os.close(requests_write)
+                os.close(grants_read)
+            server = threading.Thread(
+                target=self.rate_limiter.serve, args=(requests, grants), daemon=True
+            )
+            server.start()
+            stdout, _ = process.communicate(json.dumps(request))
+            server.join()
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+        return stdout
+
+    def _rate_limit_settings(self) -> dict:
+        return {
+            "requests_per_minute": self.config.deepseek_requests_per_minute,
+            "burst": self.config.deepseek_burst,
+            "max_retries": self.config.deepseek_max_retries,
+        }
+
+    def _llm_cache_settings(self) -> dict:
+        return {
+            "path": self.config.llm_cache_path,
+            "max_mb": float(self.config.llm_cache_max_mb),
+            "settings": {
+                "model": self.AI_PROVIDER,
+                "extractions": self.EXTRACTIONS,
+                "temperature": str(self.config.temperature),
+            },
+        }
+
+    def _txt2stix_settings(self) -> dict:
+        return {
+            "DEEPSEEK_API_KEY": self.config.deepseek_api_key,
+            "INPUT_TOKEN_LIMIT": str(self.config.input_token_limit),
+            "TEMPERATURE": str(self.config.temperature),
+            "CTIBUTLER_BASE_URL": self.config.ctibutler_base_url,
+            "CTIBUTLER_API_KEY": self.config.ctibutler_api_key,
+            "VULMATCH_BASE_URL": self.config.vulmatch_base_url,
+            "VULMATCH_API_KEY": self.config.vulmatch_api_key,
+        }
 
     def _prepare_environment(self) -> dict:
         env = os.environ.copy()
-        env.update(
-            {
-                "DEEPSEEK_API_KEY": self.config.deepseek_api_key,
-                "INPUT_TOKEN_LIMIT": str(self.config.input_token_limit),
-                "TEMPERATURE": str(self.config.temperature),
-                "CTIBUTLER_BASE_URL": self.config.ctibutler_base_url,
-                "CTIBUTLER_API_KEY": self.config.ctibutler_api_key,
-                "VULMATCH_BASE_URL": self.config.vulmatch_base_url,
-                "VULMATCH_API_KEY": self.config.vulmatch_api_key,
-            }
-        )
+        env.update(self._txt2stix_settings())
         return env
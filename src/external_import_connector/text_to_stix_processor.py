@@ -1,66 +1,179 @@
 import json
-import time
 import uuid
 import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+from .boilerplate import BoilerplateStripper
+from .chunking import estimate_tokens, merge_bundles, merge_data, split_text
 from .config_variables import ConfigConnector
+from .metrics import TXT2STIX, stage_timer
+from .profiling import profiled
 from .record_repository import RecordRepository
+from .stix.bundle_stream import BundleTransformer, rewrite_relationship_type
 from .stix_converter import StixConverter
+from .tracing import span
 
 
 class Text2StixProcessor:
-    """Handles Txt2Stix integration and file management"""
+    """Handles Txt2Stix integration and result storage"""
 
     def __init__(self, config: ConfigConnector, db: RecordRepository, logger):
         self.config = config
         self.db = db
         self.logger = logger
         self.stix_converter = StixConverter(config, logger)
+        self.bundle_transformer = BundleTransformer([rewrite_relationship_type])
+        self.chunk_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(config.txt2stix_chunk_workers)),
+            thread_name_prefix="txt2stix-chunk",
+        )
+        self.boilerplate = None
+        if config.boilerplate_stripping:
+            self.boilerplate = BoilerplateStripper(
+                int(config.boilerplate_min_pages),
+                float(config.boilerplate_min_ratio),
+            )
+
+    def learn_boilerplate(self, records: Iterable[dict]) -> None:
+        """Feeds fetched pages to the per-domain boilerplate model"""
+        if self.boilerplate:
+            for record_data in records:
+                self.boilerplate.observe(
+                    record_data["id"], record_data["url"], record_data["html"]
+                )
 
     def process(self, record_data: dict) -> bool:
-        report_id = str(uuid.uuid4())
-        output_dir = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), "../output")
+        """Converts and stores a record; raises when txt2stix fails"""
+        stix_data, stix_bundle = self.convert(record_data)
+        record_data["stix_bundle"] = self._store_output(
+            record_data["id"], stix_data, stix_bundle
         )
-        working_dir = os.path.dirname(output_dir)
+        return True
+
+    def process_many(self, records: Iterable[dict]) -> Iterator[Tuple[dict, bool]]:
+        """
+        Converts records on a bounded worker pool
 
-        os.makedirs(output_dir, exist_ok=True)
+        Conversions overlap, but results are stored and yielded in input order
+        from the calling thread, so each record's DB writes keep their order.
+        Records already sent to DeepSeek are passed through as successful.
+        """
+        workers = max(1, int(self.config.txt2stix_workers))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="txt2stix"
+        ) as executor:
+            pending = deque()
+            for record_data in records:
+                future = None
+                if not record_data["sent_to_deepseek"]:
+                    future = executor.submit(profiled(self.convert), record_data)
+                pending.append((record_data, future))
+                # Bound the number of finished-but-unstored results held in memory
+                if len(pending) >= workers * 2:
+                    yield self._complete(*pending.popleft())
+            while pending:
+                yield self._complete(*pending.popleft())
 
-        if not self.stix_converter.convert(report_id, record_data, working_dir):
-            return False
+        llm_cache = self.stix_converter.llm_cache
+        if llm_cache:
+            stats = llm_cache.stats()
+            self.logger.info(
+                f"LLM cache - Hits: {stats['hits']}, Misses: {stats['misses']}"
+            )
+
+    def convert(self, record_data: dict) -> Tuple[Dict, str]:
+        """Runs txt2stix for a record without touching the database"""
+        with stage_timer(TXT2STIX), span("txt2stix.convert", record_data["id"]):
+            return self._convert(record_data)
+
+    def _convert(self, record_data: dict) -> Tuple[Dict, str]:
+        report_id = str(uuid.uuid4())
+        if self.boilerplate:
+            text = self.boilerplate.strip(record_data["url"], record_data["html"])
+            self.logger.debug(
+                f"Boilerplate stripping kept {len(text)}/{len(record_data['html'])} characters of {record_data['id']}"
+            )
+            record_data = dict(record_data, html=text)
+
+        chunks = self._chunks(record_data["html"])
+        if len(chunks) == 1:
+            return self._run_txt2stix(report_id, record_data)
+
+        # Chunks share the report ID so their reports merge into one
+        self.logger.info(
+            f"Extracting record {record_data['id']} in {len(chunks)} chunks"
+        )
+        futures = [
+            self.chunk_executor.submit(
+                profiled(self._run_txt2stix), report_id, dict(record_data, html=chunk)
+            )
+            for chunk in chunks
+        ]
+        results = [future.result() for future in futures]
+        return (
+            merge_data([stix_data for stix_data, _ in results]),
+            json.dumps(
+                merge_bundles(
+                    [json.loads(stix_bundle) for _, stix_bundle in results],
+                    description=record_data["html"],
+                )
+            ),
+        )
+
+    def _chunks(self, text: str) -> List[str]:
+        max_tokens = int(self.config.txt2stix_chunk_tokens or 0)
+        if self.config.input_token_limit:
+            # Leave headroom for txt2stix's own token count of the chunk
+            limit = int(int(self.config.input_token_limit) * 0.9)
+            max_tokens = min(max_tokens, limit) if max_tokens else limit
+        if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+            return [text]
+        return split_text(
+            text, max_tokens, int(self.config.txt2stix_chunk_overlap_tokens)
+        )
 
-        return self._validate_and_store_output(report_id, output_dir, record_data["id"])
+    def _run_txt2stix(self, report_id: str, record_data: dict) -> Tuple[Dict, str]:
+        with span(
+            "txt2stix.chunk", record_data["id"], characters=len(record_data["html"])
+        ):
+            return self._run_converter(report_id, record_data)
 
-    def _validate_and_store_output(
-        self, report_id: str, output_dir: str, record_id: int
-    ) -> bool:
-        bundle_file = os.path.join(output_dir, f"bundle--{report_id}.json")
-        data_file = os.path.join(output_dir, f"data--{report_id}.json")
+    def _run_converter(self, report_id: str, record_data: dict) -> Tuple[Dict, str]:
+        if self.stix_converter.in_process:
+            return self.stix_converter.convert_in_memory(report_id, record_data)
 
-        for _ in range(4):
-            if all(os.path.exists(f) for f in [bundle_file, data_file]):
-                break
-            time.sleep(2**_)
-        else:
-            self.logger.error(f"Output files missing for {record_id}")
-            return False
+        working_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        return self.stix_converter.convert(report_id, record_data, working_dir)
 
+    def _complete(
+        self, record_data: dict, future: Optional[Future]
+    ) -> Tuple[dict, bool]:
+        if future is None:
+            return record_data, True
         try:
-            with open(data_file) as f:
-                stix_data = json.load(f)
-            with open(bundle_file) as f:
-                stix_bundle = json.load(f)
+            stix_data, stix_bundle = future.result()
+            record_data["stix_bundle"] = self._store_output(
+                record_data["id"], stix_data, stix_bundle
+            )
+            return record_data, True
+        except Exception as e:
+            self.logger.error(
+                f"txt2stix stage failed for {record_data['id']}: {str(e)}"
+            )
+            record_data["last_error"] = str(e)
+            return record_data, False
 
-            # Replace all 'relationship_type' values with 'related-to' in the bundle
-            for obj in stix_bundle.get("objects", []):
-                if "relationship_type" in obj:
-                    obj["relationship_type"] = "related-to"
+    def _store_output(self, record_id: int, stix_data: dict, stix_bundle: str) -> str:
+        """
+        Persists the txt2stix output and returns the bundle as stored
 
+        The DB copy is kept for records resumed in a later run; the returned
+        bundle is handed straight to the OpenCTI stage of this run.
+        """
+        with span("txt2stix.store", record_id):
+            # Rewrite the bundle object by object instead of loading the whole tree
+            stix_bundle = self.bundle_transformer.serialize(stix_bundle)
             self.db.mark_deepseek_complete(record_id, stix_data, stix_bundle)
-            return True
-        finally:
-            for f in [data_file, bundle_file]:
-                try:
-                    os.remove(f)
-                except Exception as e:
-                    self.logger.warning(f"Cleanup failed for {f}: {str(e)}")
+        return stix_bundle
@@ -0,0 +1,128 @@
+"""
+Per-record tracing spans
+
+Spans are created through OpenTelemetry and stay no-ops until
+configure_tracing installs an exporter. Stage spans carry the record ID as
+the darc.record_id attribute; spans started on another thread of a worker
+pool begin a new trace, so a record's spans are grouped by that attribute.
+"""
+
+import importlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+
+RECORD_ID = "darc.record_id"
+
+tracer = trace.get_tracer("darc-opencti")
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _timestamp(nanoseconds: Optional[int]) -> Optional[str]:
+        if nanoseconds is None:
+            return None
+        return datetime.fromtimestamp(nanoseconds / 1e9, timezone.utc).isoformat()
+
+    @classmethod
+    def to_dict(cls, span: ReadableSpan) -> dict:
+        context = span.get_span_context()
+        duration = None
+        if span.start_time is not None and span.end_time is not None:
+            duration = (span.end_time - span.start_time) / 1e6
+        return {
+            "name": span.name,
+            "trace_id": format(context.trace_id, "032x"),
+            "span_id": format(context.span_id, "016x"),
+            "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+            "start": cls._timestamp(span.start_time),
+            "end": cls._timestamp(span.end_time),
+            "duration_ms": duration,
+            "status": span.status.status_code.name,
+            "attributes": dict(span.attributes or {}),
+            "events": [
+                {
+                    "name": event.name,
+                    "timestamp": cls._timestamp(event.timestamp),
+                    "attributes": dict(event.attributes or {}),
+                }
+                for event in span.events
+            ],
+        }
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(
+            json.dumps(self.to_dict(span), default=str) + "\n" for span in spans
+        )
+        with self.lock:
+            if self.file.closed:
+                return SpanExportResult.FAILURE
+            self.file.write(lines)
+            self.file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+def create_exporter(exporter: str, path: str) -> Optional[SpanExporter]:
+    """
+    :param exporter: 'none', 'jsonl', 'console', or the 'module:Class' of
+        any OpenTelemetry SpanExporter taking no arguments
+    :param path: file of the jsonl exporter
+    """
+    if not exporter or exporter == "none":
+        return None
+    if exporter == "jsonl":
+        return JsonLinesSpanExporter(path)
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    module_name, _, class_name = exporter.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown tracing exporter: {exporter}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def configure_tracing(exporter: str, path: str) -> Optional[TracerProvider]:
+    """Installs the exporter as the global tracer provider's destination"""
+    span_exporter = create_exporter(exporter, path)
+    if span_exporter is None:
+        return None
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": "darc-opencti"})
+    )
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    return provider
+
+
+@contextmanager
+def span(name: str, record_id: Optional[int] = None, **attributes):
+    """Runs the block in a span, tagged with the record ID if given"""
+    attributes = {k: v for k, v in attributes.items() if v is not None}
+    if record_id is not None:
+        attributes[RECORD_ID] = record_id
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
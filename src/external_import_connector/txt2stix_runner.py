@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Tuple
+
+
+class Txt2StixRunner:
+    """Runs txt2stix inside the connector process
+
+    txt2stix, its extractor definitions and the AI clients are loaded once and
+    reused for every record instead of paying an interpreter start per call.
+    Objects in call_wrappers get to wrap each AI call through
+    wrap(call_name, fn), e.g. to rate limit them.
+    """
+
+    AI_CALLS = (
+        "check_content",
+        "extract_objects",
+        "extract_relationships",
+        "extract_attack_flow",
+    )
+
+    def __init__(
+        self,
+        env: Dict[str, str],
+        extractions: str,
+        ai_provider: str,
+        tlp_level: str,
+        confidence: int,
+        call_wrappers: List = None,
+    ):
+        self.env = env
+        self.extractions = extractions
+        self.ai_provider = ai_provider
+        self.tlp_level = tlp_level
+        self.confidence = confidence
+        self.call_wrappers = call_wrappers or []
+        self._lock = Lock()
+        self._loaded = False
+
+    def _load(self) -> None:
+        """Import txt2stix and parse its extractor configuration once"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            # txt2stix reads its settings from the environment
+            os.environ.update({k: v for k, v in self.env.items() if v is not None})
+
+            from txt2stix import extractions, txt2stix
+            from txt2stix.utils import remove_links
+
+            self._txt2stix = txt2stix
+            self._remove_links = remove_links
+            self.all_extractors = extractions.parse_extraction_config(
+                txt2stix.INCLUDES_PATH
+            )
+            self.use_extractions = txt2stix.parse_extractors_globbed(
+                "extractor", self.all_extractors, self.extractions
+            )
+            self.ai_model = txt2stix.parse_model(self.ai_provider)
+            for call_name in self.AI_CALLS:
+                call = getattr(self.ai_model, call_name)
+                for wrapper in self.call_wrappers:
+                    call = wrapper.wrap(call_name, call)
+                setattr(self.ai_model, call_name, call)
+            txt2stix.load_env()
+            self._loaded = True
+
+    def run(self, text: str, name: str, report_id: str) -> Tuple[Dict, str]:
+        """
+        Extract STIX objects from text
+
+        :return: (stix_data, stix_bundle) with the bundle kept serialized, so
+            large bundles are never copied into a Python object tree
+        """
+        self._load()
+        t2s = self._txt2stix
+
+        preprocessed_text = self._remove_links(text, True, True)
+        bundler = t2s.txt2stixBundler(
+            name,
+            None,
+            self.tlp_level,
+            text,
+            self.confidence,
+            self.all_extractors,
+            None,
+            created=datetime.now(),
+            report_id=report_id,
+        )
+        data = t2s.run_txt2stix(
+            bundler,
+            preprocessed_text,
+            self.use_extractions,
+            ai_content_check_provider=self.ai_model,
+            input_token_limit=int(os.environ["INPUT_TOKEN_LIMIT"]),
+            ai_settings_extractions=[self.ai_model],
+            ai_settings_relationships=self.ai_model,
+            relationship_mode="ai",
+        )
+        return json.loads(data.model_dump_json()), bundler.bundle.serialize()
+
+
+def main() -> None:
+    """
+    Pipe worker used by the subprocess mode
+
+    Reads one JSON request from stdin and writes a {"stix_data",
+    "rate_limited", "llm_cache"} JSON line to stdout, followed by the
+    serialized bundle. Everything txt2stix prints is sent to stderr so stdout
+    only carries the result. Rate limit tokens are requested from the parent
+    over the pipes named in the request's rate_limit.
+    """
+    # txt2stix falls back to an `includes` package in the working directory
+    sys.path.insert(0, os.getcwd())
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    result_stream = sys.stdout
+    sys.stdout = sys.stderr
+
+    # Run as a script, so sibling modules are imported without the package
+    from llm_cache import LLMCache
+    from rate_limiter import RemoteRateLimiter
+
+    request = json.load(sys.stdin)
+    rate_limiter = RemoteRateLimiter(**request["rate_limit"])
+    call_wrappers = [rate_limiter]
+    llm_cache = None
+    if request.get("llm_cache"):
+        llm_cache = LLMCache(**request["llm_cache"])
+        call_wrappers.append(llm_cache)
+    runner = Txt2StixRunner(
+        dict(os.environ),
+        request["extractions"],
+        request["ai_provider"],
+        request["tlp_level"],
+        request["confidence"],
+        call_wrappers,
+    )
+    stix_data, stix_bundle = runner.run(
+        request["text"], request["name"], request["report_id"]
+    )
+    json.dump(
+        {
+            "stix_data": stix_data,
+            "rate_limited": rate_limiter.rate_limited,
+            "llm_cache": llm_cache.stats() if llm_cache else None,
+        },
+        result_stream,
+    )
+    result_stream.write("\n")
+    result_stream.write(stix_bundle)
+    result_stream.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Synthetic matched_content corpus for load tests
+
+Pages are generated from a seed, so a corpus can be replayed identically
+across runs and machines. Each page belongs to one of a few domains that
+share their navigation and footer (as crawled forums do), and mentions
+IPv4 addresses, URLs and CVEs drawn from small pools, so extractions repeat
+across records like they do on real data.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+KEYWORDS = [
+    "exploit",
+    "0day",
+    "rce",
+    "poc",
+    "ransomware",
+    "botnet",
+    "credentials",
+    "vulnerability",
+    "privilege escalation",
+    "initial access",
+]
+WORDS = (
+    "the a of to and in for on with this that from by is are was new "
+    "server access shell payload target version patch release update "
+    "admin panel login database dump leak market vendor price escrow "
+    "bypass module loader builder crypter stealer logs build tested "
+    "working private public thread reply quote post user member rank"
+).split()
+
+
+class SyntheticCorpus:
+    """Deterministic generator of matched_content rows"""
+
+    def __init__(
+        self,
+        size: int,
+        seed: int = 0,
+        min_chars: int = 2000,
+        max_chars: int = 20000,
+        domains: int = 5,
+        max_age_days: float = 7,
+    ):
+        self.size = size
+        self.seed = seed
+        self.min_chars = min_chars
+        self.max_chars = max(min_chars, max_chars)
+        self.max_age_days = max_age_days
+        pools = random.Random(seed)
+        self.domains = [f"forum{i}.example.onion" for i in range(max(1, domains))]
+        self.ips = [
+            ".".join(str(pools.randint(1, 254)) for _ in range(4)) for _ in range(200)
+        ]
+        self.cves = [
+            f"CVE-{pools.randint(2019, 2025)}-{pools.randint(1000, 49999)}"
+            for _ in range(100)
+        ]
+        self.layouts = {domain: self._layout(pools, domain) for domain in self.domains}
+
+    @staticmethod
+    def _layout(rng: random.Random, domain: str) -> Dict[str, str]:
+        nav = " | ".join(
+            f'<a href="http://{domain}/{word}">{word.title()}</a>'
+            for word in rng.sample(WORDS, 8)
+        )
+        return {
+            "header": f"<html><head><title>{domain}</title></head><body><nav>{nav}</nav>",
+            "footer": f"<footer>{domain} - {' '.join(rng.sample(WORDS, 12))}</footer></body></html>",
+        }
+
+    def _paragraph(self, rng: random.Random, keywords: List[str]) -> str:
+        words = rng.choices(WORDS, k=rng.randint(20, 60))
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(len(words)), rng.choice(self.ips))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(self.cves))
+        if rng.random() < 0.3:
+            path = "/".join(rng.sample(WORDS, 2))
+            words.insert(
+                rng.randrange(len(words)), f"http://{rng.choice(self.domains)}/{path}"
+            )
+        return f"<p>{' '.join(words)}</p>"
+
+    def record(self, index: int, now: Optional[datetime] = None) -> Dict:
+        rng = random.Random(f"{self.seed}:{index}")
+        domain = rng.choice(self.domains)
+        keywords = rng.sample(KEYWORDS, rng.randint(1, 4))
+        length = rng.randint(self.min_chars, self.max_chars)
+        layout = self.layouts[domain]
+        body = []
+        size = len(layout["header"]) + len(layout["footer"])
+        while size < length:
+            body.append(self._paragraph(rng, keywords))
+            size += len(body[-1])
+        age = timedelta(days=rng.uniform(0, self.max_age_days))
+        return {
+            "url": f"http://{domain}/thread/{index}",
+            "matched_keywords": ",".join(keywords),
+            "html": layout["header"] + "".join(body) + layout["footer"],
+            "timestamp": (now or datetime.now()) - age,
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        now = datetime.now()
+        for index in range(self.size):
+            yield self.record(index, now)
+
+
+def seed_database(
+    db_config: Dict,
+    corpus: SyntheticCorpus,
+    preclassified: float = 0,
+    reset: bool = False,
+    batch_size: int = 500,
+) -> List[int]:
+    """
+    Loads the corpus into db.matched_content and returns the new record IDs
+
+    A preclassified share of the records gets V2/V3 exploit classifications
+    up front, so it reaches txt2stix and OpenCTI whatever the classifiers
+    would make of synthetic text. With reset, the connector's tables are
+    emptied first. The connector must already be configured with db_config
+    through CONNECTOR_DARC_DB_*, as it creates the tables.
+    """
+    # The connector creates its tables, but expects the schema to exist
+    with psycopg2.connect(**db_config) as conn, conn.cursor() as cursor:
+        cursor.execute("CREATE SCHEMA IF NOT EXISTS db")
+
+    from external_import_connector.db import DatabaseHandler
+
+    handler = DatabaseHandler()
+    conn = handler.db_conn
+    if handler.db_config["dbname"] != db_config["dbname"]:
+        conn.close()
+        raise ValueError(
+            f"The connector is configured with {handler.db_config['dbname']}, "
+            f"not the database to seed ({db_config['dbname']})"
+        )
+    record_ids = []
+    try:
+        with conn.cursor() as cursor:
+            if reset:
+                cursor.execute(
+                    "TRUNCATE db.matched_content, db.connector_state RESTART IDENTITY CASCADE"
+                )
+            rows = []
+            for record in corpus:
+                rows.append(
+                    (
+                        record["url"],
+                        record["matched_keywords"],
+                        record["html"],
+                        record["timestamp"],
+                    )
+                )
+                if len(rows) >= batch_size:
+                    record_ids.extend(_insert(cursor, rows))
+                    rows = []
+            if rows:
+                record_ids.extend(_insert(cursor, rows))
+
+            rng = random.Random(corpus.seed)
+            selected = [i for i in record_ids if rng.random() < preclassified]
+            now = datetime.now()
+            for table in ("classification_results", "classification_results_v3"):
+                if not selected:
+                    break
+                execute_values(
+                    cursor,
+                    f"""
+                    INSERT INTO db.{table}
+                    (processed_data_id, category, confidence, classification, timestamp)
+                    VALUES %s
+                    """,
+                    [
+                        (
+                            record_id,
+                            "Exploit",
+                            0.95,
+                            '{"category": "Exploit", "confidence": 0.95}',
+                            now,
+                        )
+                        for record_id in selected
+                    ],
+                )
+        conn.commit()
+    finally:
+        conn.close()
+    return record_ids
+
+
+def _insert(cursor, rows: List[tuple]) -> List[int]:
+    return [
+        row[0]
+        for row in execute_values(
+            cursor,
+            """
+            INSERT INTO db.matched_content (url, matched_keywords, html, timestamp)
+            VALUES %s RETURNING id
+            """,
+            rows,
+            fetch=True,
+        )
+    ]
@@ -0,0 +1,231 @@
+"""
+Local stand-in for the OpenCTI GraphQL API
+
+Answers the calls pycti makes while the connector starts and delivers
+bundles: the health check, connector registration, works, and the create,
+read and list operations of a bundle import. Responses are generated from
+the selection set of each query, so pycti finds every field it asked for.
+Mutations return a fresh object (keeping the STIX ID of the input), reads
+return null and lists are empty, as on an empty platform.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+PLATFORM_VERSION = "6.5.0"
+
+_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\.\.\.|[A-Za-z_][A-Za-z0-9_]*|\S')
+
+# Leaf values pycti needs to be of a given type or shape
+_LEAF_VALUES = {
+    "version": PLATFORM_VERSION,
+    "host": "localhost",
+    "vhost": "/",
+    "use_ssl": False,
+    "port": 5672,
+    "user": "guest",
+    "pass": "guest",
+    "hasNextPage": False,
+    "hasPreviousPage": False,
+    "globalCount": 0,
+    "parent_types": [],
+}
+# Object fields answered with an object rather than null
+_NESTED_OBJECTS = {"config", "connection", "pageInfo"}
+
+Selection = List[Tuple[str, Optional[list]]]
+
+
+def _skip_group(tokens: List[str], i: int, opening: str, closing: str) -> int:
+    depth = 0
+    while i < len(tokens):
+        if tokens[i] == opening:
+            depth += 1
+        elif tokens[i] == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _parse_selection(
+    tokens: List[str], i: int, fragments: Dict[str, Selection]
+) -> Tuple[Selection, int]:
+    """Parses the selection set starting at tokens[i] == '{'"""
+    fields: Selection = []
+    i += 1
+    while i < len(tokens) and tokens[i] != "}":
+        if tokens[i] == "...":
+            i += 1
+            if tokens[i] == "on":
+                # Inline fragment: its fields are merged into the parent
+                i += 2
+                nested, i = _parse_selection(tokens, i, fragments)
+                fields.extend(nested)
+            else:
+                fields.extend(fragments.get(tokens[i], []))
+                i += 1
+            continue
+        name = tokens[i]
+        i += 1
+        if i < len(tokens) and tokens[i] == ":":
+            # Aliased field; the response key is the alias
+            i += 2
+        if i < len(tokens) and tokens[i] == "(":
+            i = _skip_group(tokens, i, "(", ")")
+        while i < len(tokens) and tokens[i] == "@":
+            i += 2
+            if i < len(tokens) and tokens[i] == "(":
+                i = _skip_group(tokens, i, "(", ")")
+        nested = None
+        if i < len(tokens) and tokens[i] == "{":
+            nested, i = _parse_selection(tokens, i, fragments)
+        fields.append((name, nested))
+    return fields, i + 1
+
+
+def parse_operation(query: str) -> Tuple[str, Selection]:
+    """Returns the operation type and root selection of a GraphQL document"""
+    tokens = _TOKEN.findall(re.sub(r"#[^\n]*", "", query))
+    fragments: Dict[str, Selection] = {}
+    operation, root = "query", None
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == "fragment":
+            name = tokens[i + 1]
+            i = tokens.index("{", i)
+            fragments[name], i = _parse_selection(tokens, i, fragments)
+        elif tokens[i] in ("query", "mutation", "subscription", "{"):
+            if tokens[i] != "{":
+                operation = tokens[i]
+                i = tokens.index("{", i)
+            root, i = _parse_selection(tokens, i, fragments)
+        else:
+            i += 1
+    return operation, root or []
+
+
+def _entity_type(root_field: str) -> str:
+    """'threatActorIndividualAdd' -> 'Threat-Actor-Individual'"""
+    name = re.sub(r"(Add|Edit|Upsert)$", "", root_field)
+    return "-".join(part.capitalize() for part in re.findall(r"[A-Z]?[a-z0-9]+", name))
+
+
+class FakeOpenCTI:
+    """Serves the stub API on a local port from a background thread
+
+    Every request can be delayed by latency seconds to model the platform's
+    response time. Calls are counted by root field in calls.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _RequestHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOpenCTI":
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="fake-opencti", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeOpenCTI":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def answer(self, payload: Dict) -> Dict:
+        operation, root = parse_operation(payload.get("query", ""))
+        variables = payload.get("variables") or {}
+        data = {}
+        for name, selection in root:
+            with self.lock:
+                self.calls[name] += 1
+            if operation == "mutation":
+                data[name] = self._object(name, selection, variables.get("input"))
+            elif name == "about":
+                data[name] = self._object(name, selection, None)
+            elif selection and any(field == "edges" for field, _ in selection):
+                data[name] = self._object(name, selection, None)
+            else:
+                data[name] = None
+        if self.latency:
+            time.sleep(self.latency)
+        return {"data": data}
+
+    def _object(self, root_field: str, selection: Optional[Selection], source):
+        if selection is None:
+            return str(uuid.uuid4())
+        source = source if isinstance(source, dict) else {}
+        entity_type = _entity_type(root_field)
+        result = {}
+        for name, nested in selection:
+            if name == "edges":
+                result[name] = []
+            elif nested is not None:
+                result[name] = (
+                    self._object(name, nested, None)
+                    if name in _NESTED_OBJECTS
+                    else None
+                )
+            elif name == "id":
+                result[name] = str(uuid.uuid4())
+            elif name == "standard_id":
+                result[name] = source.get(
+                    "stix_id", f"{entity_type.lower()}--{uuid.uuid4()}"
+                )
+            elif name == "entity_type":
+                result[name] = entity_type
+            elif name in _LEAF_VALUES:
+                result[name] = _LEAF_VALUES[name]
+            else:
+                result[name] = source.get(name)
+        return result
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler answering POST /graphql from the stub"""
+
+    def do_POST(self):
+        if not self.path.startswith("/graphql"):
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            self._reply(200, self.server.stub.answer(payload))
+        except Exception as e:
+            self._reply(200, {"errors": [{"message": str(e)}], "data": None})
+
+    def _reply(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
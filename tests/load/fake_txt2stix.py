@@ -0,0 +1,166 @@
+"""
+Stand-in for the in-process txt2stix runner
+
+Takes the place of StixConverter.runner and answers run(text, name,
+report_id) like Txt2StixRunner, after sleeping for a configurable latency
+in place of the DeepSeek round trips. IPv4 addresses, URLs and CVEs found
+in the text become observables, indicators and relationships; their IDs
+derive from the value, so the same value extracted from two records yields
+the same object, as with txt2stix.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+IDENTITY_ID = "identity--a2f5a1c9-6b7b-4a9c-9d3a-2d4f0d4c1d70"
+TLP_CLEAR = "marking-definition--94868c89-83c2-464b-929b-a1a8aa3c8487"
+NAMESPACE = uuid.UUID("6b0f3f1e-0d5c-4e5e-8a1c-7f0f6c3a2b10")
+
+_EXTRACTORS = [
+    ("ipv4-addr", re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")),
+    ("url", re.compile(r"https?://[^\s<>\"']+")),
+    ("vulnerability", re.compile(r"\bCVE-\d{4}-\d{4,7}\b")),
+]
+
+
+def _id(object_type: str, value: str) -> str:
+    return f"{object_type}--{uuid.uuid5(NAMESPACE, f'{object_type}:{value}')}"
+
+
+class FakeTxt2Stix:
+    """
+    :param latency: mean seconds spent per run
+    :param jitter: relative spread of the latency, e.g. 0.5 for +/- 50%
+    :param max_objects: cap on the values extracted per run
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        jitter: float = 0,
+        max_objects: int = 50,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.max_objects = max_objects
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _sleep(self) -> None:
+        if not self.latency:
+            return
+        with self.lock:
+            spread = self.random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, self.latency * (1 + spread)))
+
+    def extract(self, text: str) -> List[Tuple[str, str]]:
+        values = []
+        for object_type, pattern in _EXTRACTORS:
+            for value in dict.fromkeys(pattern.findall(text)):
+                values.append((object_type, value))
+        return values[: self.max_objects]
+
+    def run(self, text: str, name: str, report_id: str) -> Tuple[Dict, str]:
+        with self.lock:
+            self.calls += 1
+        self._sleep()
+
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        common = {
+            "spec_version": "2.1",
+            "created": now,
+            "modified": now,
+            "created_by_ref": IDENTITY_ID,
+            "object_marking_refs": [TLP_CLEAR],
+        }
+        objects = [
+            {
+                "type": "identity",
+                "spec_version": "2.1",
+                "id": IDENTITY_ID,
+                "name": "txt2stix",
+                "identity_class": "system",
+                "created": "2020-01-01T00:00:00.000Z",
+                "modified": "2020-01-01T00:00:00.000Z",
+            },
+        ]
+        extractions, relationships, refs = [], [], []
+        for object_type, value in self.extract(text):
+            if object_type == "vulnerability":
+                objects.append(
+                    {
+                        "type": "vulnerability",
+                        "id": _id(object_type, value),
+                        "name": value,
+                        "external_references": [
+                            {"source_name": "cve", "external_id": value}
+                        ],
+                        **common,
+                    }
+                )
+                refs.append(objects[-1]["id"])
+            else:
+                observable = {
+                    "type": object_type,
+                    "spec_version": "2.1",
+                    "id": _id(object_type, value),
+                    "value": value,
+                }
+                indicator = {
+                    "type": "indicator",
+                    "id": _id("indicator", f"{object_type}:{value}"),
+                    "name": f"{object_type}: {value}",
+                    "pattern": f"[{object_type}:value = '{value}']",
+                    "pattern_type": "stix",
+                    "valid_from": now,
+                    **common,
+                }
+                relationship = {
+                    "type": "relationship",
+                    "id": _id("relationship", f"{indicator['id']}:{observable['id']}"),
+                    "relationship_type": "detected-using",
+                    "source_ref": indicator["id"],
+                    "target_ref": observable["id"],
+                    **common,
+                }
+                objects.extend([observable, indicator, relationship])
+                refs.extend([observable["id"], indicator["id"], relationship["id"]])
+                relationships.append(
+                    {
+                        "source_ref": indicator["id"],
+                        "target_ref": observable["id"],
+                        "relationship_type": "detected-using",
+                    }
+                )
+            extractions.append({"type": object_type, "value": value})
+
+        objects.append(
+            {
+                "type": "report",
+                "id": f"report--{report_id}",
+                "name": name,
+                "published": now,
+                "report_types": ["threat-report"],
+                "object_refs": refs or [IDENTITY_ID],
+                **common,
+            }
+        )
+        stix_data = {
+            "content_check": {"describes_incident": bool(refs)},
+            "extractions": {"ai": extractions},
+            "relationships": relationships,
+        }
+        bundle = {
+            "type": "bundle",
+            "id": f"bundle--{report_id}",
+            "objects": objects,
+        }
+        return stix_data, json.dumps(bundle)
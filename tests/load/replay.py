@@ -0,0 +1,358 @@
+"""
+End-to-end replay load test of DarcConnector
+
+Seeds a dedicated Postgres database with a synthetic corpus, points the
+connector at it and at a local OpenCTI stub, swaps txt2stix for a fake with
+a configurable latency and runs the real pipeline (classifiers included).
+Reports records/sec, per-stage latency from the connector's Prometheus
+histograms, CPU time and memory.
+
+    docker compose -f tests/load/docker-compose.yml up -d
+    python tests/load/replay.py --db-name darc_replay --reset --records 500
+
+The database is never taken from the connector's configuration: it is
+given with --db-* or REPLAY_DB_*, the name is required, and the one the
+connector is configured with is refused. Its connector tables are only
+emptied before seeding with --reset. Connector settings to compare are
+passed as environment variables or with --set; the harness only forces
+what the fakes and the replay database need.
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from prometheus_client import REGISTRY  # noqa: E402
+
+from external_import_connector import DarcConnector  # noqa: E402
+from external_import_connector.config_variables import ConfigConnector  # noqa: E402
+from external_import_connector.memory import MB, rss_bytes  # noqa: E402
+from external_import_connector.metrics import (  # noqa: E402
+    CLASSIFY_V2,
+    CLASSIFY_V3,
+    DB_WRITE,
+    FETCH,
+    OPENCTI_IMPORT,
+    TXT2STIX,
+)
+from load.corpus import SyntheticCorpus, seed_database  # noqa: E402
+from load.fake_opencti import FakeOpenCTI  # noqa: E402
+from load.fake_txt2stix import FakeTxt2Stix  # noqa: E402
+
+STAGES = [FETCH, CLASSIFY_V2, CLASSIFY_V3, TXT2STIX, DB_WRITE, OPENCTI_IMPORT]
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Defaults match the throwaway database of tests/load/docker-compose.yml
+DB_DEFAULTS = {
+    "host": "localhost",
+    "port": "55432",
+    "user": "replay",
+    "password": "replay",
+}
+
+Samples = Dict[Tuple[str, Tuple], float]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-chars", type=int, default=2000)
+    parser.add_argument("--max-chars", type=int, default=20000)
+    parser.add_argument("--domains", type=int, default=5)
+    parser.add_argument(
+        "--preclassified",
+        type=float,
+        default=0.5,
+        help="share of records seeded with exploit classifications",
+    )
+    parser.add_argument("--txt2stix-latency", type=float, default=1.0)
+    parser.add_argument("--txt2stix-jitter", type=float, default=0.5)
+    parser.add_argument(
+        "--opencti-latency", type=float, default=0.01, help="seconds per API call"
+    )
+    parser.add_argument("--runs", type=int, default=1, help="process_data calls")
+    for name in ("host", "port", "user", "password"):
+        parser.add_argument(
+            f"--db-{name}",
+            default=os.environ.get(f"REPLAY_DB_{name.upper()}", DB_DEFAULTS[name]),
+        )
+    parser.add_argument(
+        "--db-name",
+        default=os.environ.get("REPLAY_DB_NAME"),
+        help="dedicated database to seed (or REPLAY_DB_NAME), never a deployed one",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="empty the connector tables of the replay database before seeding",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="connector setting, e.g. OPENCTI_WORKERS=8",
+    )
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+    if not args.db_name:
+        parser.error("a dedicated database is required: --db-name or REPLAY_DB_NAME")
+    return args
+
+
+def replay_database(args: argparse.Namespace) -> Dict:
+    return {
+        "dbname": args.db_name,
+        "user": args.db_user,
+        "password": args.db_password,
+        "host": args.db_host,
+        "port": str(args.db_port),
+    }
+
+
+def check_database(db_config: Dict, deployed: ConfigConnector) -> None:
+    """Refuses to replay against the database the connector is configured with"""
+    configured = (deployed.db_host, str(deployed.db_port), deployed.db_name)
+    if configured == (db_config["host"], db_config["port"], db_config["dbname"]):
+        raise SystemExit(
+            f"Refusing to seed {db_config['dbname']} on {db_config['host']}: "
+            "it is the connector's configured database"
+        )
+
+
+def configure_environment(
+    opencti_url: str, workdir: str, settings: List[str], db_config: Dict
+):
+    """
+    Points the connector at the fakes and the replay database and keeps its
+    caches out of the tree
+    """
+    for setting in settings:
+        name, _, value = setting.partition("=")
+        os.environ[name] = value
+    defaults = {
+        "OPENCTI_TOKEN": str(uuid.uuid4()),
+        "CONNECTOR_ID": str(uuid.uuid4()),
+        "CONNECTOR_TYPE": "EXTERNAL_IMPORT",
+        "CONNECTOR_NAME": "darc-replay",
+        "CONNECTOR_SCOPE": "Stix Object",
+        "CONNECTOR_LOG_LEVEL": "warning",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite"),
+        "KNOWN_OBJECTS_PATH": os.path.join(workdir, "known_objects.sqlite"),
+        "DELTA_BUNDLES_PATH": os.path.join(workdir, "delta_bundles.sqlite"),
+        "PROFILING_DIR": os.path.join(workdir, "profiles"),
+        "TRACING_PATH": os.path.join(workdir, "spans.jsonl"),
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    # The fakes only stand in for the API and the in-process runner
+    os.environ["OPENCTI_URL"] = opencti_url
+    os.environ["OPENCTI_SEND_TO_QUEUE"] = "false"
+    os.environ["TXT2STIX_MODE"] = "inprocess"
+    for key, value in db_config.items():
+        name = "NAME" if key == "dbname" else key.upper()
+        os.environ[f"CONNECTOR_DARC_DB_{name}"] = value
+
+
+def collect() -> Samples:
+    samples = {}
+    for metric in REGISTRY.collect():
+        for sample in metric.samples:
+            if sample.name.startswith(("darc_stage_duration", "darc_records")):
+                key = (sample.name, tuple(sorted(sample.labels.items())))
+                samples[key] = sample.value
+    return samples
+
+
+def quantile(buckets: List[Tuple[float, float]], q: float) -> Optional[float]:
+    """
+    Estimates a quantile from cumulative (upper bound, count) histogram
+    buckets by linear interpolation, as Prometheus' histogram_quantile does
+    """
+    if not buckets or not buckets[-1][1]:
+        return None
+    rank = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if math.isinf(bound):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (
+                count - lower_count
+            )
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def stage_report(before: Samples, after: Samples) -> Dict[str, Dict]:
+    """Per-stage call count, total and quantiles observed between snapshots"""
+
+    def delta(name: str, **labels) -> float:
+        key = (name, tuple(sorted(labels.items())))
+        return after.get(key, 0) - before.get(key, 0)
+
+    stages = {}
+    for stage in STAGES:
+        count = delta("darc_stage_duration_seconds_count", stage=stage)
+        if not count:
+            continue
+        buckets = sorted(
+            (float(dict(labels)["le"]), value - before.get((name, labels), 0))
+            for (name, labels), value in after.items()
+            if name == "darc_stage_duration_seconds_bucket"
+            and dict(labels)["stage"] == stage
+        )
+        total = delta("darc_stage_duration_seconds_sum", stage=stage)
+        stages[stage] = {
+            "calls": int(count),
+            "total_seconds": total,
+            "mean_seconds": total / count,
+            **{f"p{int(q * 100)}_seconds": quantile(buckets, q) for q in QUANTILES},
+        }
+    return stages
+
+
+def outcomes(before: Samples, after: Samples) -> Dict[str, int]:
+    return {
+        dict(labels)["outcome"]: int(value - before.get((name, labels), 0))
+        for (name, labels), value in after.items()
+        if name == "darc_records_total" and value - before.get((name, labels), 0)
+    }
+
+
+class PeakRSS:
+    """Samples the resident set size while the replay runs"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak = rss_bytes() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    def __enter__(self) -> "PeakRSS":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def replay(connector, runs: int) -> Dict:
+    """Runs the connector and measures what happened meanwhile"""
+    before = collect()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    rss_start = rss_bytes()
+    started = time.monotonic()
+    with PeakRSS() as peak:
+        for _ in range(max(1, runs)):
+            connector.process_data()
+    elapsed = time.monotonic() - started
+    after = collect()
+    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    finished = outcomes(before, after)
+    cpu = (end_usage.ru_utime - usage.ru_utime) + (end_usage.ru_stime - usage.ru_stime)
+    return {
+        "elapsed_seconds": elapsed,
+        "records": sum(finished.values()),
+        "records_per_second": sum(finished.values()) / elapsed if elapsed else 0,
+        "outcomes": finished,
+        "stages": stage_report(before, after),
+        "resources": {
+            "cpu_seconds": cpu,
+            "cpu_utilization": cpu / elapsed if elapsed else 0,
+            "rss_start_mb": (rss_start or 0) / MB,
+            "rss_end_mb": (rss_bytes() or 0) / MB,
+            "rss_peak_mb": peak.peak / MB,
+            "threads_end": threading.active_count(),
+        },
+    }
+
+
+def format_report(report: Dict) -> str:
+    def seconds(value: Optional[float]) -> str:
+        return f"{value:10.3f}" if value is not None else f"{'n/a':>10}"
+
+    resources = report["resources"]
+    lines = [
+        f"Records: {report['records']} in {report['elapsed_seconds']:.1f}s "
+        f"({report['records_per_second']:.2f} records/s) - "
+        + ", ".join(f"{k}: {v}" for k, v in sorted(report["outcomes"].items())),
+        f"Still due after replay: {report.get('unprocessed', 'n/a')}",
+        f"CPU: {resources['cpu_seconds']:.1f}s ({resources['cpu_utilization']:.0%}), "
+        f"RSS: {resources['rss_start_mb']:.0f} -> {resources['rss_end_mb']:.0f} MB "
+        f"(peak {resources['rss_peak_mb']:.0f} MB), Threads: {resources['threads_end']}",
+        f"OpenCTI calls: {sum(report.get('opencti_calls', {}).values())}, "
+        f"txt2stix runs: {report.get('txt2stix_runs', 0)}",
+        "",
+        f"{'stage':<16}{'calls':>7}{'total s':>10}{'mean s':>10}"
+        + "".join(f"{f'p{int(q * 100)} s':>10}" for q in QUANTILES),
+    ]
+    for stage, stats in report["stages"].items():
+        lines.append(
+            f"{stage:<16}{stats['calls']:>7}{stats['total_seconds']:10.2f}"
+            + seconds(stats["mean_seconds"])
+            + "".join(seconds(stats[f"p{int(q * 100)}_seconds"]) for q in QUANTILES)
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    db_config = replay_database(args)
+    check_database(db_config, ConfigConnector())
+    with tempfile.TemporaryDirectory(prefix="darc-replay-") as workdir, FakeOpenCTI(
+        latency=args.opencti_latency
+    ) as stub:
+        configure_environment(stub.url, workdir, args.set, db_config)
+        corpus = SyntheticCorpus(
+            args.records, args.seed, args.min_chars, args.max_chars, args.domains
+        )
+        seed_database(db_config, corpus, args.preclassified, reset=args.reset)
+
+        connector = DarcConnector()
+        fake = FakeTxt2Stix(args.txt2stix_latency, args.txt2stix_jitter, seed=args.seed)
+        connector.deepseek_processor.stix_converter.runner = fake
+        stub.calls.clear()
+
+        report = replay(connector, args.runs)
+        report["unprocessed"] = len(connector.db.fetch_unprocessed(with_html=False))
+        report["opencti_calls"] = dict(stub.calls)
+        report["txt2stix_runs"] = fake.calls
+        report["settings"] = {
+            **{
+                k: v
+                for k, v in vars(args).items()
+                if k not in ("set", "output", "db_password")
+            },
+            "overrides": args.set,
+        }
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
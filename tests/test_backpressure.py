@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from external_import_connector.backpressure import IngestBackpressure
+from external_import_connector.opencti_processor import OpenCTIProcessor
+
+
+class QueueHelper:
+    """Reports a connector queue filled to the given share of its threshold"""
+
+    def __init__(self, *loads):
+        self.loads = list(loads)
+        self.connector_logger = MagicMock()
+        self.connector_info = SimpleNamespace(
+            queue_threshold=500.0, queue_messages_size=0.0
+        )
+
+    def check_connector_buffering(self) -> bool:
+        load = self.loads.pop(0) if len(self.loads) > 1 else self.loads[0]
+        self.connector_info.queue_messages_size = load * 500.0
+        return load >= 1.0
+
+
+def _backpressure(helper, max_wait=1):
+    return IngestBackpressure(helper, 8, 40, 0, max_wait)
+
+
+class TestIngestBackpressure(object):
+    def test_busy_queue_halves_and_idle_queue_restores(self) -> None:
+        backpressure = _backpressure(QueueHelper(0.9, 0.9, 0.1, 0.1, 0.1))
+
+        for _ in range(2):
+            backpressure.refresh()
+        assert (backpressure.concurrency, backpressure.batch_size) == (2, 10)
+
+        for _ in range(3):
+            backpressure.refresh()
+        assert (backpressure.concurrency, backpressure.batch_size) == (5, 40)
+
+    def test_unbounded_batch_size_is_restored(self) -> None:
+        """
+        OPENCTI_AGGREGATE_BATCH_SIZE=0 stays unbounded unless OpenCTI is behind
+        """
+        backpressure = IngestBackpressure(
+            QueueHelper(0.1, 0.9, 0.1, 0.1, 0.1), 8, 0, 0, 1
+        )
+
+        backpressure.refresh()
+        assert backpressure.batch_size == 0
+        backpressure.refresh()
+        assert backpressure.batch_size == 25
+        for _ in range(3):
+            backpressure.refresh()
+        assert backpressure.batch_size == 0
+
+    def test_full_queue_pauses_delivery_until_it_drains(self) -> None:
+        helper = QueueHelper(1.2, 0.9, 0.6)
+        backpressure = _backpressure(helper)
+
+        with backpressure.slot():
+            assert not backpressure.paused
+            assert backpressure.in_flight == 1
+        assert helper.loads == [0.6]
+        assert backpressure.in_flight == 0
+
+    def test_pause_times_out(self) -> None:
+        backpressure = _backpressure(QueueHelper(1.5), max_wait=0)
+
+        with pytest.raises(TimeoutError):
+            with backpressure.slot():
+                pass
+
+
+class TestAggregateBatchSize(object):
+    def _processor(self, batch_size, backpressure=None):
+        processor = OpenCTIProcessor.__new__(OpenCTIProcessor)
+        processor.config = SimpleNamespace(opencti_aggregate_batch_size=batch_size)
+        processor.handler = SimpleNamespace(backpressure=backpressure)
+        return processor
+
+    def test_zero_batch_size_never_fills(self) -> None:
+        """
+        A batch size of 0 sends the whole run as one bundle
+        """
+        batch = list(range(1000))
+
+        assert not self._processor(0).batch_full(batch)
+        unbounded = IngestBackpressure(QueueHelper(0.1), 8, 0, 0, 1)
+        assert not self._processor(40, unbounded).batch_full(batch)
+        assert self._processor(2).batch_full([1, 2])
+        assert not self._processor(2).batch_full([1])
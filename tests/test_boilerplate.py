@@ -0,0 +1,54 @@
+from external_import_connector.boilerplate import BoilerplateStripper
+
+CHROME = (
+    "Register Now New posts Search forums Menu Log in Register Install the app "
+    "You are using an out of date browser. It may not display this or other "
+    "websites correctly. You should upgrade or use an alternative browser ."
+)
+
+
+def _page(body: str) -> str:
+    return f"{CHROME} {body} Contact us Terms and rules Privacy policy Help Home RSS"
+
+
+class TestBoilerplateStripper(object):
+    def test_chrome_repeated_across_a_domain_is_stripped(self) -> None:
+        stripper = BoilerplateStripper(min_pages=3, min_ratio=0.5)
+        bodies = [
+            "Selling fresh zero day exploit for a popular VPN appliance, escrow accepted",
+            "Leaked database dump of an online shop with 40k customer records inside",
+            "Working RCE proof of concept for CVE-2024-1234 posted below, use with care",
+            "Looking for partners to run a phishing campaign against European banks",
+        ]
+        for i, body in enumerate(bodies):
+            stripper.observe(i, f"http://forum.onion/threads/{i}", _page(body))
+
+        cleaned = stripper.strip("http://forum.onion/threads/2", _page(bodies[2]))
+
+        assert "Register Now" not in cleaned
+        assert "Privacy policy" not in cleaned
+        assert bodies[2] in cleaned
+
+    def test_other_domains_and_small_samples_are_untouched(self) -> None:
+        stripper = BoilerplateStripper(min_pages=3, min_ratio=0.5)
+        stripper.observe(1, "http://forum.onion/a", _page("first body text"))
+        stripper.observe(2, "http://forum.onion/b", _page("second body text"))
+
+        assert stripper.strip("http://forum.onion/a", _page("x")) == _page("x")
+        assert stripper.strip("http://other.onion/a", _page("x")) == _page("x")
+
+    def test_pages_are_counted_once(self) -> None:
+        stripper = BoilerplateStripper(min_pages=3, min_ratio=0.5)
+        for _ in range(5):
+            stripper.observe(1, "http://forum.onion/a", _page("same page"))
+
+        assert stripper.strip("http://forum.onion/a", _page("x")) == _page("x")
+
+    def test_page_ids_kept_per_domain_are_bounded(self) -> None:
+        stripper = BoilerplateStripper(min_pages=3, min_ratio=0.5, max_seen_pages=10)
+        for i in range(100):
+            stripper.observe(i, "http://forum.onion/a", _page(f"page {i}"))
+
+        model = stripper.domains["forum.onion"]
+        assert model.pages == 100
+        assert len(model.seen) == 10
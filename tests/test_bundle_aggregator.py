@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from external_import_connector.stix.bundle_aggregator import BundleAggregator
+
+PATTERN = "attack-pattern--0b3a5e7c-3c39-4a1f-8f4b-2d6c5c1f0a11"
+
+
+def _bundle(*objects):
+    return json.dumps({"type": "bundle", "id": "bundle--1", "objects": list(objects)})
+
+
+def _pattern(modified, name):
+    return {"type": "attack-pattern", "id": PATTERN, "modified": modified, "name": name}
+
+
+class TestBundleAggregator(object):
+    def test_shared_objects_keep_latest_version(self) -> None:
+        aggregator = BundleAggregator()
+        aggregator.add(1, _bundle(_pattern("2024-01-02T00:00:00Z", "new")))
+        aggregator.add(
+            2,
+            _bundle(
+                _pattern("2024-01-01T23:59:59.999Z", "old"),
+                {"type": "url", "id": "url--1", "value": "http://x.onion"},
+            ),
+        )
+
+        bundle = json.loads(aggregator.serialize())
+
+        assert aggregator.record_ids == [1, 2]
+        assert bundle["type"] == "bundle"
+        assert [obj["id"] for obj in bundle["objects"]] == [PATTERN, "url--1"]
+        assert bundle["objects"][0]["name"] == "new"
+
+    def test_fractional_seconds_compare_numerically(self) -> None:
+        aggregator = BundleAggregator()
+        aggregator.add(1, _bundle(_pattern("2024-01-01T00:00:00.5Z", "later")))
+        aggregator.add(2, _bundle(_pattern("2024-01-01T00:00:00.123Z", "earlier")))
+
+        assert aggregator.objects[PATTERN]["name"] == "later"
+
+    def test_malformed_bundle_is_not_added(self) -> None:
+        aggregator = BundleAggregator()
+        with pytest.raises(ValueError):
+            aggregator.add(1, '{"type": "bundle", "objects": [{"id": "x"}, ')
+
+        assert len(aggregator) == 0
+        assert aggregator.objects == {}
+
+    def test_object_without_id_leaves_no_partial_merge(self) -> None:
+        aggregator = BundleAggregator()
+        bundle = json.dumps(
+            {"type": "bundle", "objects": [{"id": "x--1"}, {"type": "note"}]}
+        )
+        with pytest.raises(ValueError):
+            aggregator.add(1, bundle)
+
+        assert len(aggregator) == 0
+        assert aggregator.objects == {}
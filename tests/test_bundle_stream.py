@@ -0,0 +1,64 @@
+import json
+
+from external_import_connector.stix.bundle_stream import (
+    BundleTransformer,
+    bundle_error,
+    rewrite_relationship_type,
+)
+
+BUNDLE = {
+    "type": "bundle",
+    "id": "bundle--1",
+    "objects": [
+        {"type": "ipv4-addr", "id": "ipv4-addr--1", "value": "10.0.0.1"},
+        {
+            "type": "relationship",
+            "id": "relationship--1",
+            "relationship_type": "uses",
+            "source_ref": "ipv4-addr--1",
+            "target_ref": "url--1",
+        },
+        {"type": "url", "id": "url--1", "value": "http://x.onion/a, b"},
+    ],
+}
+
+
+class TestBundleStream(object):
+    def test_transform_matches_full_tree_rewrite(self) -> None:
+        transformer = BundleTransformer([rewrite_relationship_type])
+
+        for serialized in (json.dumps(BUNDLE), json.dumps(BUNDLE, indent=4)):
+            output = json.loads(transformer.serialize(serialized))
+
+            expected = json.loads(json.dumps(BUNDLE))
+            expected["objects"][1]["relationship_type"] = "related-to"
+            assert output == expected
+
+    def test_rules_can_drop_objects(self) -> None:
+        transformer = BundleTransformer(
+            [lambda obj: None if obj["type"] == "url" else obj]
+        )
+
+        output = json.loads(transformer.serialize(json.dumps(BUNDLE)))
+
+        assert [obj["id"] for obj in output["objects"]] == [
+            "ipv4-addr--1",
+            "relationship--1",
+        ]
+
+    def test_empty_objects(self) -> None:
+        output = BundleTransformer([]).serialize(
+            '{"type": "bundle", "id": "bundle--1", "objects": [ ]}'
+        )
+
+        assert json.loads(output)["objects"] == []
+
+    def test_bundle_error(self) -> None:
+        assert bundle_error(json.dumps(BUNDLE)) is None
+        assert bundle_error('{"type": "report", "objects": []}')
+        assert bundle_error('{"type": "bundle", "objects": {}}')
+        assert bundle_error("not json")
+        # Key order does not matter
+        assert bundle_error('{"objects": [{"id": "x--1"}], "type": "bundle"}') is None
+        assert bundle_error('{"objects": [], "type": "report"}')
+        assert bundle_error('{"id": "bundle--1", "type": "bundle"}')
@@ -0,0 +1,69 @@
+from external_import_connector.chunking import (
+    estimate_tokens,
+    merge_bundles,
+    split_text,
+)
+
+REPORT = "report--6f8c2a36-0a57-4f4e-9f1b-7d0f3c1e2a11"
+
+
+def _bundle(*objects):
+    return {"type": "bundle", "id": "bundle--1", "objects": list(objects)}
+
+
+class TestChunking(object):
+    def test_chunks_respect_budget_and_overlap(self) -> None:
+        text = " ".join(f"word{i:04d}" for i in range(500))
+
+        chunks = split_text(text, max_tokens=100, overlap_tokens=20)
+
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+        # Every word is covered and consecutive chunks overlap
+        assert chunks[0].split()[0] == "word0000"
+        assert chunks[-1].split()[-1] == "word0499"
+        for previous, current in zip(chunks, chunks[1:]):
+            assert current.split()[0] in previous.split()
+
+    def test_short_text_is_one_chunk(self) -> None:
+        assert split_text("a short page", 100, 20) == ["a short page"]
+
+    def test_merge_deduplicates_by_id_and_value(self) -> None:
+        identity = {"type": "identity", "id": "identity--a"}
+        ip_1 = {"type": "ipv4-addr", "id": "ipv4-addr--1", "value": "10.0.0.1"}
+        ip_2 = {"type": "ipv4-addr", "id": "ipv4-addr--2", "value": "10.0.0.1"}
+        url = {"type": "url", "id": "url--1", "value": "http://x.onion"}
+        rel_1 = {
+            "type": "relationship",
+            "id": "relationship--1",
+            "source_ref": "url--1",
+            "relationship_type": "related-to",
+            "target_ref": "ipv4-addr--1",
+        }
+        rel_2 = dict(rel_1, id="relationship--2", target_ref="ipv4-addr--2")
+        report_1 = {
+            "type": "report",
+            "id": REPORT,
+            "object_refs": ["ipv4-addr--1", "relationship--1"],
+        }
+        report_2 = {
+            "type": "report",
+            "id": REPORT,
+            "object_refs": ["ipv4-addr--2", "url--1", "relationship--2"],
+        }
+
+        merged = merge_bundles(
+            [
+                _bundle(identity, report_1, ip_1, url, rel_1),
+                _bundle(identity, report_2, ip_2, url, rel_2),
+            ],
+            description="full page",
+        )
+
+        ids = [obj["id"] for obj in merged["objects"]]
+        assert sorted(ids) == sorted(
+            ["identity--a", REPORT, "ipv4-addr--1", "url--1", "relationship--1"]
+        )
+        report = next(obj for obj in merged["objects"] if obj["type"] == "report")
+        assert report["object_refs"] == ["ipv4-addr--1", "relationship--1", "url--1"]
+        assert report["description"] == "full page"
@@ -0,0 +1,76 @@
+import json
+
+from external_import_connector.stix.delta import DeltaTracker
+
+URL = "http://forum.onion/thread/1"
+
+
+def _bundle(report_id, *objects):
+    report = {
+        "type": "report",
+        "id": report_id,
+        "object_refs": [obj["id"] for obj in objects],
+    }
+    return json.dumps(
+        {"type": "bundle", "id": "bundle--1", "objects": [report, *objects]}
+    )
+
+
+def _url(i, **extra):
+    return {"type": "url", "id": f"url--{i}", "value": f"http://x{i}.onion", **extra}
+
+
+def _relationship(i, source, target):
+    return {
+        "type": "relationship",
+        "id": f"relationship--{i}",
+        "relationship_type": "related-to",
+        "source_ref": source,
+        "target_ref": target,
+    }
+
+
+def _ids(bundle_json):
+    return [obj["id"] for obj in json.loads(bundle_json)["objects"]]
+
+
+class TestDeltaTracker(object):
+    def test_first_delivery_is_sent_in_full(self, tmp_path) -> None:
+        tracker = DeltaTracker(str(tmp_path / "delta.sqlite"))
+        bundle = _bundle("report--1", _url(1), _url(2))
+
+        reduced, delivered = tracker.delta(URL, bundle)
+
+        assert reduced == bundle
+        assert len(delivered) == 3
+
+    def test_recrawl_sends_changes_and_their_links(self, tmp_path) -> None:
+        path = str(tmp_path / "delta.sqlite")
+        tracker = DeltaTracker(path)
+        first = _bundle(
+            "report--1", _url(1), _url(2), _relationship(1, "url--1", "url--2")
+        )
+        tracker.remember(URL, tracker.delta(URL, first)[1])
+
+        second = _bundle(
+            "report--2",
+            _url(1),
+            _url(2),
+            _url(3),
+            _relationship(1, "url--1", "url--2"),
+            _relationship(2, "url--1", "url--3"),
+        )
+        reduced, _ = DeltaTracker(path).delta(URL, second)
+
+        assert _ids(reduced) == ["report--2", "url--3", "relationship--2"]
+        # The report still lists every object of the page
+        assert len(json.loads(reduced)["objects"][0]["object_refs"]) == 5
+
+    def test_urls_are_tracked_separately(self, tmp_path) -> None:
+        tracker = DeltaTracker(str(tmp_path / "delta.sqlite"))
+        bundle = _bundle("report--1", _url(1))
+        tracker.remember(URL, tracker.delta(URL, bundle)[1])
+
+        reduced, _ = tracker.delta("http://other.onion/", bundle)
+
+        assert _ids(reduced) == ["report--1", "url--1"]
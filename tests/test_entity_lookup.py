@@ -0,0 +1,130 @@
+import uuid
+from types import SimpleNamespace
+
+from external_import_connector.stix.handle_opencti_entity import OpenCTIEntityHandler
+
+AUTHOR = "identity--a2f5a1c9-6b7b-4a9c-9d3a-2d4f0d4c1d70"
+
+
+class FakeDomainObjects:
+    """Local stand-in for helper.api.stix_domain_object"""
+
+    def __init__(self, names):
+        self.names = names
+        self.calls = []
+
+    def list(self, types, filters, getAll, customAttributes):
+        values = filters["filters"][0]["values"]
+        self.calls.append(values)
+        return [
+            {"id": f"id-{name}", "standard_id": f"report--{name}", "name": name}
+            for name in values
+            if name in self.names
+        ]
+
+
+class FakeCoreObjects:
+    """Local stand-in for helper.api.stix_core_object, answering ID filters"""
+
+    def __init__(self, entities):
+        self.entities = entities
+        self.calls = []
+
+    def list(self, filters, getAll, customAttributes):
+        values = filters["filters"][0]["values"]
+        self.calls.append(values)
+        return [
+            entity
+            for entity in self.entities
+            if {entity["standard_id"], *entity["x_opencti_stix_ids"]} & set(values)
+        ]
+
+
+def _report(stix_id, author=AUTHOR):
+    # OpenCTI recomputes report and identity IDs; the bundle's are merged in
+    return {
+        "id": f"id-{stix_id}",
+        "standard_id": f"report--{uuid.uuid4()}",
+        "x_opencti_stix_ids": [stix_id],
+        "createdBy": {
+            "standard_id": f"identity--{uuid.uuid4()}",
+            "x_opencti_stix_ids": [author],
+        },
+    }
+
+
+def _handler(existing=(), reports=(), ttl=300):
+    domain_objects = FakeDomainObjects(existing)
+    core_objects = FakeCoreObjects(list(reports))
+    helper = SimpleNamespace(
+        connector_logger=SimpleNamespace(error=print),
+        api=SimpleNamespace(
+            stix_domain_object=domain_objects, stix_core_object=core_objects
+        ),
+    )
+    config = SimpleNamespace(entity_cache_ttl=ttl)
+    return OpenCTIEntityHandler(helper, config), domain_objects, core_objects
+
+
+def _record(record_id, sent_to_deepseek=True, author=AUTHOR):
+    return {
+        "id": record_id,
+        "sent_to_deepseek": sent_to_deepseek,
+        "sent_to_opencti": False,
+        "report_ref": (f"report--00000000-0000-4000-8000-{record_id:012d}", author),
+    }
+
+
+class TestEntityLookup(object):
+    def test_prefetch_resolves_records_in_one_query(self) -> None:
+        records = [_record(1), _record(2), _record(3, sent_to_deepseek=False)]
+        handler, _, core_objects = _handler(
+            reports=[_report(records[0]["report_ref"][0])]
+        )
+
+        handler.prefetch(records)
+
+        assert core_objects.calls == [
+            [records[0]["report_ref"][0], records[1]["report_ref"][0]]
+        ]
+        assert [handler.entity_exists(record) for record in records] == [
+            True,
+            False,
+            False,
+        ]
+        # Hits and misses were both answered from the cache
+        assert len(core_objects.calls) == 1
+
+    def test_only_this_records_report_counts(self) -> None:
+        record = _record(1)
+        other_author = _record(2, author="identity--" + str(uuid.uuid4()))
+        handler, domain_objects, _ = _handler(
+            existing={"Report 1", "Report 3"},
+            reports=[_report(other_author["report_ref"][0])],
+        )
+
+        # A report named after the record, by someone else
+        assert not handler.entity_exists(record)
+        # The record's report ID, under another author
+        assert not handler.entity_exists(other_author)
+        # No stored report to match
+        assert not handler.entity_exists(dict(_record(3), report_ref=None))
+        assert domain_objects.calls == []
+
+    def test_large_batches_are_split(self) -> None:
+        handler, domain_objects, _ = _handler()
+
+        handler.search_entities("Report", [f"Report {i}" for i in range(250)])
+
+        assert [len(call) for call in domain_objects.calls] == [100, 100, 50]
+
+    def test_cache_can_be_disabled(self) -> None:
+        record = _record(1)
+        handler, _, core_objects = _handler(
+            reports=[_report(record["report_ref"][0])], ttl=0
+        )
+
+        assert handler.entity_exists(record)
+        assert handler.entity_exists(record)
+
+        assert len(core_objects.calls) == 2
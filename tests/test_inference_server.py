@@ -0,0 +1,59 @@
+import threading
+
+from external_import_connector.classification.inference_server import MicroBatcher
+
+
+class TestMicroBatcher(object):
+    def test_concurrent_requests_are_batched(self) -> None:
+        """
+        Requests submitted together are classified in bounded batches
+        """
+        batch_sizes = []
+        release = threading.Event()
+
+        def classify_batch(items):
+            release.wait(1)
+            batch_sizes.append(len(items))
+            return [{"category": text, "confidence": 1.0} for text, _ in items]
+
+        batcher = MicroBatcher("test", classify_batch, 4, 50)
+        futures = [batcher.submit(str(i), {}) for i in range(10)]
+        release.set()
+
+        results = [future.result(timeout=5) for future in futures]
+
+        assert [r["category"] for r in results] == [str(i) for i in range(10)]
+        assert sum(batch_sizes) == 10
+        assert max(batch_sizes) <= 4
+        assert len(batch_sizes) < 10
+
+    def test_batch_errors_reach_every_caller(self) -> None:
+        def classify_batch(items):
+            raise ValueError("model failure")
+
+        batcher = MicroBatcher("test", classify_batch, 4, 0)
+        future = batcher.submit("text", {})
+
+        assert isinstance(future.exception(timeout=5), ValueError)
+
+    def test_invalid_request_fails_alone(self) -> None:
+        """
+        A request missing a feature fails without failing its batch
+        """
+        release = threading.Event()
+
+        def classify_batch(items):
+            release.wait(1)
+            return [{"category": text, "confidence": 1.0} for text, _ in items]
+
+        def validate(features):
+            if "sentiment" not in features:
+                raise ValueError("Missing required feature: sentiment")
+
+        batcher = MicroBatcher("test", classify_batch, 4, 50, validate)
+        valid = batcher.submit("ok", {"sentiment": 0})
+        invalid = batcher.submit("bad", {})
+        release.set()
+
+        assert valid.result(timeout=5)["category"] == "ok"
+        assert isinstance(invalid.exception(timeout=5), ValueError)
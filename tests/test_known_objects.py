@@ -0,0 +1,107 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from external_import_connector.stix.known_objects import BloomFilter, KnownObjectIndex
+from external_import_connector.stix.opencti_handler import OpenCTIHandler
+
+PATTERN = {
+    "type": "attack-pattern",
+    "id": "attack-pattern--1",
+    "name": "Exploit Public-Facing Application",
+    "modified": "2024-01-01T00:00:00Z",
+}
+
+
+def _bundle(*objects):
+    return json.dumps({"type": "bundle", "id": "bundle--1", "objects": list(objects)})
+
+
+def _report(report_id):
+    return {"type": "report", "id": report_id, "object_refs": [PATTERN["id"]]}
+
+
+def _ids(bundle_json):
+    return [obj["id"] for obj in json.loads(bundle_json)["objects"]]
+
+
+def _handler(tmp_path, send_to_queue):
+    config = SimpleNamespace(
+        known_objects_enabled=True,
+        known_objects_path=str(tmp_path / "known.sqlite"),
+        known_objects_capacity=1000,
+        known_objects_ttl_days=30,
+        opencti_backpressure=False,
+        opencti_send_to_queue=send_to_queue,
+        opencti_queue_max_wait=0,
+        opencti_queue_poll_interval=0,
+    )
+    helper = MagicMock()
+    helper.check_connector_buffering.return_value = False
+    # Every object is unknown to the platform, nothing gets pruned
+    helper.api.stix_core_object.list.return_value = []
+    client = MagicMock()
+    return OpenCTIHandler(client, helper, config), helper, client
+
+
+class TestKnownObjects(object):
+    def test_bloom_filter_has_no_false_negatives(self) -> None:
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(f"url--{i}")
+
+        assert all(f"url--{i}" in bloom for i in range(1000))
+        assert sum(f"ipv4-addr--{i}" in bloom for i in range(1000)) < 20
+
+    def test_delivered_objects_are_stripped_after_restart(self, tmp_path) -> None:
+        path = str(tmp_path / "known.sqlite")
+        index = KnownObjectIndex(path, 1000, 30)
+        first, delivered = index.strip(_bundle(_report("report--1"), PATTERN))
+        assert _ids(first) == ["report--1", PATTERN["id"]]
+        index.remember(delivered)
+
+        restarted = KnownObjectIndex(path, 1000, 30)
+        updated = dict(PATTERN, modified="2024-02-01T00:00:00Z")
+        second, delivered = restarted.strip(_bundle(_report("report--2"), updated))
+
+        # Only timestamps changed; the report keeps its reference to the pattern
+        assert _ids(second) == ["report--2"]
+        assert json.loads(second)["objects"][0]["object_refs"] == [PATTERN["id"]]
+        assert [stix_id for stix_id, _ in delivered] == ["report--2"]
+
+    def test_changed_content_is_sent_again(self, tmp_path) -> None:
+        index = KnownObjectIndex(str(tmp_path / "known.sqlite"), 1000, 30)
+        _, delivered = index.strip(_bundle(PATTERN))
+        index.remember(delivered)
+
+        renamed = dict(PATTERN, name="Phishing")
+        bundle, _ = index.strip(_bundle(renamed))
+
+        assert _ids(bundle) == [PATTERN["id"]]
+
+    def test_expired_entries_are_sent_again(self, tmp_path) -> None:
+        index = KnownObjectIndex(str(tmp_path / "known.sqlite"), 1000, 0)
+        _, delivered = index.strip(_bundle(PATTERN))
+        index.remember(delivered)
+
+        bundle, _ = index.strip(_bundle(PATTERN))
+
+        assert _ids(bundle) == [PATTERN["id"]]
+
+    def test_imported_objects_are_not_sent_again(self, tmp_path) -> None:
+        handler, _, client = _handler(tmp_path, send_to_queue=False)
+
+        assert handler.send_stix_bundle(_bundle(PATTERN), 1)
+        assert handler.send_stix_bundle(_bundle(PATTERN), 2)
+
+        assert client.stix2.import_bundle_from_json.call_count == 1
+
+    def test_queued_objects_are_sent_again(self, tmp_path) -> None:
+        handler, helper, _ = _handler(tmp_path, send_to_queue=True)
+
+        # The workers may still fail to ingest the first bundle
+        assert handler.send_stix_bundle(_bundle(PATTERN), 1)
+        assert handler.send_stix_bundle(_bundle(PATTERN), 2)
+
+        sent = [call.args[0] for call in helper.send_stix2_bundle.call_args_list]
+        assert [_ids(bundle) for bundle in sent] == [[PATTERN["id"]], [PATTERN["id"]]]
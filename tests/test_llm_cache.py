@@ -0,0 +1,107 @@
+from pydantic import BaseModel
+
+from external_import_connector.llm_cache import LLMCache
+
+
+class ExtractionList(BaseModel):
+    extractions: list
+
+
+class DescribesIncident(BaseModel):
+    describes_incident: bool
+
+
+class FakeDeepSeek:
+    """Local stand-in for the DeepSeek-backed txt2stix extractor"""
+
+    def __init__(self):
+        self.requests = []
+
+    def check_content(self, text):
+        self.requests.append(("check_content", text))
+        return DescribesIncident(describes_incident="exploit" in text)
+
+    def extract_objects(self, input_text, extractors):
+        self.requests.append(("extract_objects", input_text))
+        return ExtractionList(extractions=[{"type": "url", "value": input_text}])
+
+
+def _wrapped(cache, api):
+    return (
+        cache.wrap("check_content", api.check_content),
+        cache.wrap("extract_objects", api.extract_objects),
+    )
+
+
+SETTINGS = {
+    "model": "deepseek:deepseek-chat",
+    "extractions": "ai_url",
+    "temperature": "0",
+}
+
+
+class TestLLMCache(object):
+    def test_repeated_text_is_served_from_cache(self, tmp_path) -> None:
+        api = FakeDeepSeek()
+        cache = LLMCache(str(tmp_path / "cache.sqlite"), 1, SETTINGS)
+        check_content, extract_objects = _wrapped(cache, api)
+
+        first = check_content("new exploit  for sale")
+        second = check_content("new exploit for sale\n")
+        extract_objects("new exploit for sale", [])
+
+        assert first == second
+        assert [call for call, _ in api.requests] == [
+            "check_content",
+            "extract_objects",
+        ]
+        assert cache.stats() == {"hits": 1, "misses": 2}
+
+    def test_cache_survives_restart(self, tmp_path) -> None:
+        path = str(tmp_path / "cache.sqlite")
+        api = FakeDeepSeek()
+        check_content, _ = _wrapped(LLMCache(path, 1, SETTINGS), api)
+        check_content("exploit")
+
+        restarted = LLMCache(path, 1, SETTINGS)
+        check_content, _ = _wrapped(restarted, api)
+        result = check_content("exploit")
+
+        assert isinstance(result, DescribesIncident)
+        assert result.describes_incident
+        assert len(api.requests) == 1
+        assert restarted.stats()["hits"] == 1
+
+    def test_settings_are_part_of_the_key(self, tmp_path) -> None:
+        path = str(tmp_path / "cache.sqlite")
+        api = FakeDeepSeek()
+        check_content, _ = _wrapped(LLMCache(path, 1, SETTINGS), api)
+        check_content("exploit")
+
+        other = LLMCache(path, 1, {**SETTINGS, "temperature": "0.7"})
+        check_content, _ = _wrapped(other, api)
+        check_content("exploit")
+
+        assert len(api.requests) == 2
+
+    def test_least_recently_used_entries_are_evicted(self, tmp_path) -> None:
+        api = FakeDeepSeek()
+        # Room for roughly two ExtractionList responses
+        cache = LLMCache(str(tmp_path / "cache.sqlite"), 130 / (1024 * 1024), SETTINGS)
+        _, extract_objects = _wrapped(cache, api)
+
+        extract_objects("a" * 20, [])
+        extract_objects("b" * 20, [])
+        extract_objects("a" * 20, [])
+        extract_objects("c" * 20, [])
+        extract_objects("a" * 20, [])
+        extract_objects("b" * 20, [])
+
+        assert [text for _, text in api.requests] == [
+            "a" * 20,
+            "b" * 20,
+            "c" * 20,
+            "b" * 20,
+        ]
+        # The running size matches what is stored after evictions
+        assert cache.total == cache._stored_size() <= 130
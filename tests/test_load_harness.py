@@ -0,0 +1,143 @@
+import json
+import os
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from pycti import OpenCTIApiClient, OpenCTIConnectorHelper
+
+from external_import_connector.stix.bundle_stream import bundle_error
+from external_import_connector.stix.opencti_handler import OpenCTIHandler
+from load.corpus import SyntheticCorpus
+from load.fake_opencti import FakeOpenCTI, parse_operation
+from load.fake_txt2stix import FakeTxt2Stix
+from load.replay import (
+    check_database,
+    configure_environment,
+    parse_args,
+    quantile,
+    replay_database,
+)
+
+
+class TestSyntheticCorpus(object):
+    def test_corpus_is_reproducible(self) -> None:
+        first = list(SyntheticCorpus(20, seed=3, min_chars=500, max_chars=2000))
+        second = list(SyntheticCorpus(20, seed=3, min_chars=500, max_chars=2000))
+
+        assert [r["html"] for r in first] == [r["html"] for r in second]
+        assert all(len(r["html"]) >= 500 for r in first)
+        assert [r["html"] for r in first] != [
+            r["html"] for r in SyntheticCorpus(20, seed=4)
+        ]
+
+
+class TestFakeTxt2Stix(object):
+    def test_shared_values_yield_the_same_objects(self) -> None:
+        fake = FakeTxt2Stix()
+        text = "dump on 10.1.2.3 see http://forum0.example.onion/a/b CVE-2024-1234"
+
+        data, bundle = fake.run(text, "Report 1", str(uuid.uuid4()))
+        _, other = fake.run(text, "Report 2", str(uuid.uuid4()))
+
+        assert bundle_error(bundle) is None
+        assert len(data["extractions"]["ai"]) == 3
+        ids = {obj["id"] for obj in json.loads(bundle)["objects"]}
+        other_ids = {obj["id"] for obj in json.loads(other)["objects"]}
+        # Only the reports differ
+        assert len(ids - other_ids) == 1
+        assert fake.calls == 2
+
+
+class TestFakeOpenCTI(object):
+    def test_parse_operation(self) -> None:
+        operation, root = parse_operation(
+            """
+            mutation Add($input: ReportAddInput!) {
+                reportAdd(input: $input) {
+                    id
+                    ... on StixObject { standard_id }
+                    objectMarking { id }
+                }
+            }
+            """
+        )
+
+        assert operation == "mutation"
+        assert root == [
+            (
+                "reportAdd",
+                [
+                    ("id", None),
+                    ("standard_id", None),
+                    ("objectMarking", [("id", None)]),
+                ],
+            )
+        ]
+
+    def test_bundle_delivery_through_pycti(self, monkeypatch) -> None:
+        """
+        The connector's handler registers, opens a work and imports a bundle
+        against the stub with the real pycti clients
+        """
+        fake = FakeTxt2Stix()
+        _, bundle = fake.run(
+            "c2 at 192.0.2.10 CVE-2023-4966", "Report 1", str(uuid.uuid4())
+        )
+
+        with FakeOpenCTI() as stub:
+            token = str(uuid.uuid4())
+            for name, value in {
+                "OPENCTI_URL": stub.url,
+                "OPENCTI_TOKEN": token,
+                "CONNECTOR_ID": str(uuid.uuid4()),
+                "CONNECTOR_TYPE": "EXTERNAL_IMPORT",
+                "CONNECTOR_NAME": "darc-test",
+                "CONNECTOR_SCOPE": "Stix Object",
+                "CONNECTOR_LOG_LEVEL": "error",
+            }.items():
+                monkeypatch.setenv(name, value)
+            helper = OpenCTIConnectorHelper({})
+            client = OpenCTIApiClient(stub.url, token, log_level="error")
+            handler = OpenCTIHandler(client, helper)
+
+            assert handler.send_stix_bundle(bundle, 1)
+
+        assert stub.calls["registerConnector"] == 1
+        assert stub.calls["workAdd"] == 1
+        assert stub.calls["reportAdd"] == 1
+        assert stub.calls["indicatorAdd"] == 1
+        assert stub.calls["vulnerabilityAdd"] == 1
+
+
+class TestReplay(object):
+    def test_quantile_interpolates_within_buckets(self) -> None:
+        buckets = [(0.1, 0), (1.0, 10), (10.0, 20), (float("inf"), 20)]
+
+        assert quantile(buckets, 0.5) == 1.0
+        assert quantile(buckets, 0.25) == 0.1 + 0.9 * 0.5
+        assert quantile(buckets, 0.75) == 5.5
+        assert quantile([(1.0, 0), (float("inf"), 0)], 0.5) is None
+
+    def test_replay_database_is_dedicated(self, monkeypatch, tmp_path) -> None:
+        # configure_environment writes to os.environ; keep it to this test
+        monkeypatch.setattr(os, "environ", dict(os.environ))
+        monkeypatch.delenv("REPLAY_DB_NAME", raising=False)
+        with pytest.raises(SystemExit):
+            parse_args([])
+
+        monkeypatch.setenv("REPLAY_DB_NAME", "darc_replay")
+        monkeypatch.setenv("CONNECTOR_DARC_DB_NAME", "darknet")
+        args = parse_args(["--db-port", "5433"])
+        db_config = replay_database(args)
+        assert not args.reset
+        assert db_config["dbname"] == "darc_replay"
+
+        configure_environment("http://127.0.0.1:1", str(tmp_path), [], db_config)
+        assert os.environ["CONNECTOR_DARC_DB_NAME"] == "darc_replay"
+        assert os.environ["CONNECTOR_DARC_DB_PORT"] == "5433"
+
+        deployed = SimpleNamespace(db_host="localhost", db_port=5433, db_name="darknet")
+        check_database(db_config, deployed)
+        with pytest.raises(SystemExit):
+            check_database(dict(db_config, dbname="darknet"), deployed)
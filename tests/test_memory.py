@@ -0,0 +1,46 @@
+import tracemalloc
+from unittest.mock import MagicMock
+
+from external_import_connector.lock_manager import LockManager
+from external_import_connector.memory import MemoryMonitor, active_stage, rss_bytes
+from external_import_connector.metrics import stage_timer
+
+_leak = []
+
+
+class TestMemory(object):
+    def test_stage_peaks_are_attributed_to_running_stages(self) -> None:
+        monitor = MemoryMonitor(MagicMock(), interval=0.001)
+        with monitor.run():
+            with stage_timer("txt2stix"):
+                monitor.sample()
+        assert monitor.stage_peaks["txt2stix"] == monitor.run_peak > 0
+        assert "Peak by stage: txt2stix" in monitor.logger.info.call_args[0][0]
+
+    def test_growth_sites_are_logged_between_runs(self) -> None:
+        monitor = MemoryMonitor(MagicMock(), tracemalloc_frames=1)
+        try:
+            with monitor.run():
+                pass
+            with monitor.run(), active_stage("classify_v2"):
+                _leak.append(["x" * 100 for _ in range(10000)])
+            message = monitor.logger.info.call_args[0][0]
+            assert message.startswith("Top memory growth since last run")
+            assert "test_memory.py" in message
+        finally:
+            tracemalloc.stop()
+            _leak.clear()
+
+    def test_rss_limit(self) -> None:
+        assert not MemoryMonitor(MagicMock()).over_limit()
+        assert MemoryMonitor(MagicMock(), rss_limit_mb=1).over_limit() == (
+            rss_bytes() is not None
+        )
+
+    def test_lock_manager_prunes_free_locks(self) -> None:
+        locks = LockManager()
+        held = locks.acquire_record_lock(1)
+        locks.acquire_record_lock(2)
+        with held:
+            locks.prune()
+        assert list(locks.record_locks) == [1]
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from prometheus_client import REGISTRY
+
+from external_import_connector.metrics import (
+    TXT2STIX,
+    count_cache,
+    observe_backlog,
+    stage_timer,
+)
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics(object):
+    def test_stage_timer_observes_duration(self) -> None:
+        before = _value("darc_stage_duration_seconds_count", stage=TXT2STIX)
+        with stage_timer(TXT2STIX):
+            pass
+        assert _value("darc_stage_duration_seconds_count", stage=TXT2STIX) == before + 1
+
+    def test_cache_counts(self) -> None:
+        before = _value("darc_cache_requests_total", cache="llm", result="miss")
+        count_cache("llm", False, 3)
+        count_cache("llm", False, 0)
+        assert (
+            _value("darc_cache_requests_total", cache="llm", result="miss")
+            == before + 3
+        )
+
+    def test_backlog_gauges(self) -> None:
+        now = datetime(2025, 1, 10, 12, 0)
+        observe_backlog([now - timedelta(hours=2), now, None], now)
+        assert _value("darc_backlog_records") == 3
+        assert _value("darc_oldest_unprocessed_age_seconds") == 7200
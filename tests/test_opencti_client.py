@@ -0,0 +1,58 @@
+import pytest
+import requests
+
+from external_import_connector.opencti_client import OpenCTICaller, PooledSession
+
+
+class FlakyCall:
+    """Fails with the given errors before succeeding"""
+
+    def __init__(self, session, *errors):
+        self.session = session
+        self.errors = list(errors)
+        self.timeouts = []
+
+    def __call__(self, value):
+        self.timeouts.append(getattr(self.session._local, "timeout", None))
+        if self.errors:
+            raise self.errors.pop(0)
+        return value
+
+
+def _caller(session, max_retries=3):
+    return OpenCTICaller(session, {"import": 120, "work": 5}, max_retries, base_delay=0)
+
+
+class TestOpenCTICaller(object):
+    def test_transient_errors_are_retried_with_call_timeout(self) -> None:
+        session = PooledSession(4)
+        call = FlakyCall(session, requests.ConnectionError(), requests.Timeout())
+
+        assert _caller(session).call("import", call, "done") == "done"
+        assert call.timeouts == [120, 120, 120]
+        # The timeout only applies inside the call
+        assert getattr(session._local, "timeout", None) is None
+
+    def test_permanent_errors_are_not_retried(self) -> None:
+        session = PooledSession(4)
+        call = FlakyCall(session, ValueError("GraphQL validation error"))
+
+        with pytest.raises(ValueError):
+            _caller(session).call("work", call, "done")
+        assert call.timeouts == [5]
+
+    def test_gateway_errors_are_retried(self) -> None:
+        session = PooledSession(4)
+        session._local.last_status = 503
+        call = FlakyCall(session, ValueError("<html>Service Unavailable</html>"))
+
+        assert _caller(session).call("work", call, "done") == "done"
+
+    def test_retries_are_bounded(self) -> None:
+        session = PooledSession(4)
+        errors = [requests.ConnectionError() for _ in range(3)]
+        call = FlakyCall(session, *errors)
+
+        with pytest.raises(requests.ConnectionError):
+            _caller(session, max_retries=2).call("lookup", call, "done")
+        assert len(call.timeouts) == 3
@@ -0,0 +1,84 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from external_import_connector.pipeline import Stage, StagedPipeline
+
+LOGGER = SimpleNamespace(info=lambda message: None, error=print)
+
+
+class TestStagedPipeline(object):
+    def test_items_pass_every_stage_in_order(self) -> None:
+        seen = []
+        lock = threading.Lock()
+
+        def collect(item):
+            with lock:
+                seen.append(item)
+
+        pipeline = StagedPipeline(
+            [
+                Stage("double", lambda item: item * 2, workers=3),
+                # Odd inputs leave the pipeline at this stage
+                Stage("filter", lambda item: item if item % 4 == 0 else None),
+                Stage("collect", collect, workers=2),
+            ],
+            queue_size=2,
+            logger=LOGGER,
+        )
+
+        stats = pipeline.run(range(20))
+
+        assert sorted(seen) == [i * 2 for i in range(20) if i % 2 == 0]
+        assert stats["double"]["processed"] == 20
+        assert stats["filter"]["processed"] == 20
+        assert stats["collect"]["processed"] == 10
+
+    def test_stages_overlap(self) -> None:
+        def slow(item):
+            time.sleep(0.05)
+            return item
+
+        pipeline = StagedPipeline(
+            [Stage("a", slow, workers=2), Stage("b", slow, workers=2)],
+            queue_size=4,
+            logger=LOGGER,
+        )
+
+        started = time.monotonic()
+        pipeline.run(range(8))
+
+        # Sequential processing would take 8 * 2 * 0.05 = 0.8 s
+        assert time.monotonic() - started < 0.6
+
+    def test_close_runs_once_after_last_item(self) -> None:
+        batch, flushed = [], []
+
+        pipeline = StagedPipeline(
+            [
+                Stage(
+                    "batch", batch.append, on_close=lambda: flushed.append(list(batch))
+                )
+            ],
+            queue_size=1,
+            logger=LOGGER,
+        )
+        pipeline.run(range(5))
+
+        assert flushed == [[0, 1, 2, 3, 4]]
+
+    def test_failures_do_not_stop_the_pipeline(self) -> None:
+        def fail_on_three(item):
+            if item == 3:
+                raise ValueError("bad record")
+            return item
+
+        out = []
+        pipeline = StagedPipeline(
+            [Stage("check", fail_on_three, workers=2), Stage("out", out.append)],
+            queue_size=2,
+            logger=SimpleNamespace(info=lambda message: None, error=lambda m: None),
+        )
+        pipeline.run(range(6))
+
+        assert sorted(out) == [0, 1, 2, 4, 5]
@@ -0,0 +1,86 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from external_import_connector.connector import DarcConnector
+from external_import_connector.opencti_processor import OpenCTIProcessor
+from external_import_connector.processing_state import (
+    OPENCTI,
+    TXT2STIX,
+    ProcessingState,
+    RetryPolicy,
+)
+
+NOW = datetime(2025, 1, 10, 12, 0)
+
+
+class StateStore:
+    """In-memory stand-in for the processing_state table"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def record_stage_failure(self, record_id, stage, error):
+        row = self.rows.setdefault((record_id, stage), {"attempts": 0})
+        row.update(attempts=row["attempts"] + 1, error=error)
+        return row["attempts"]
+
+    def schedule_stage_retry(self, record_id, stage, next_attempt_at):
+        self.rows[(record_id, stage)]["next_attempt_at"] = next_attempt_at
+
+    def mark_stages_done(self, record_id):
+        for key in [key for key in self.rows if key[0] == record_id]:
+            self.rows.pop(key)
+
+
+class TestProcessingState(object):
+    def test_backoff_doubles_up_to_max_delay(self) -> None:
+        policy = RetryPolicy(10, 60, 300)
+
+        delays = [
+            (policy.next_attempt_at(attempts, NOW) - NOW).total_seconds()
+            for attempts in (1, 2, 3, 4)
+        ]
+        for delay, expected in zip(delays, (60, 120, 240, 300)):
+            assert expected <= delay <= expected * 1.1
+
+    def test_last_attempt_quarantines(self) -> None:
+        store = StateStore()
+        state = ProcessingState(store, RetryPolicy(2, 60, 300), MagicMock())
+
+        state.failed(7, TXT2STIX, "txt2stix stage failed")
+        assert store.rows[(7, TXT2STIX)]["next_attempt_at"] > datetime.now()
+
+        state.failed(7, TXT2STIX, "x" * 5000)
+        row = store.rows[(7, TXT2STIX)]
+        assert row["attempts"] == 2
+        assert row["next_attempt_at"] is None
+        assert len(row["error"]) == 1000
+
+        state.completed(7)
+        assert store.rows == {}
+
+
+class TestStageErrors(object):
+    def test_failure_reason_reaches_processing_state(self) -> None:
+        store = StateStore()
+        processor = OpenCTIProcessor(MagicMock(), MagicMock(), MagicMock())
+        processor.entity_checker = MagicMock(entity_exists=lambda record: False)
+        connector = SimpleNamespace(
+            processing_state=ProcessingState(
+                store, RetryPolicy(3, 60, 300), MagicMock()
+            ),
+            db=MagicMock(),
+            logger=MagicMock(),
+            _outcome=DarcConnector._outcome,
+        )
+
+        record_data = {"id": 7, "stix_bundle": '{"type": "report"}'}
+        assert not processor.process(record_data)
+        DarcConnector._complete_record(connector, record_data, False, OPENCTI)
+
+        assert store.rows[(7, OPENCTI)]["error"] == (
+            "Invalid STIX bundle (record 7): Missing or incorrect 'type'"
+        )
+        assert "last_error" not in record_data
+        assert processor.handler.errors == {}
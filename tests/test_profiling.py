@@ -0,0 +1,84 @@
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from external_import_connector.profiling import (
+    DETERMINISTIC,
+    SAMPLING,
+    RunProfiler,
+    profiled,
+)
+
+
+def _busy_work():
+    total = 0
+    for i in range(50000):
+        total += len(json.dumps({"i": i}))
+    return total
+
+
+def _profiler(tmp_path, mode, runs=1, every=3, keep=10):
+    return RunProfiler(mode, runs, every, str(tmp_path), keep, MagicMock(), 0.001)
+
+
+class TestRunProfiler(object):
+    def test_profiles_n_out_of_every_m_runs(self, tmp_path) -> None:
+        profiler = _profiler(tmp_path, SAMPLING, runs=2, every=5)
+        assert [profiler.should_profile() for _ in range(10)] == [
+            True,
+            True,
+            False,
+            False,
+            False,
+            True,
+            True,
+            False,
+            False,
+            False,
+        ]
+        assert not _profiler(tmp_path, "none").should_profile()
+
+    def test_sampling_writes_collapsed_stacks(self, tmp_path) -> None:
+        profiler = _profiler(tmp_path, SAMPLING)
+        with profiler.profile():
+            worker = threading.Thread(target=_busy_work, name="worker")
+            worker.start()
+            worker.join()
+
+        (name,) = os.listdir(tmp_path)
+        assert name.endswith(".folded")
+        lines = (tmp_path / name).read_text().splitlines()
+        assert any(line.startswith("worker;") for line in lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert "Top functions" in profiler.logger.info.call_args[0][0]
+
+    def test_deterministic_profiles_worker_threads_and_rotates(self, tmp_path) -> None:
+        profiler = _profiler(tmp_path, DETERMINISTIC, runs=1, every=1, keep=1)
+        for _ in range(2):
+            with profiler.profile():
+                worker = threading.Thread(target=profiled(_busy_work))
+                worker.start()
+                worker.join()
+
+        (name,) = os.listdir(tmp_path)
+        assert name.endswith(".pstats")
+        # The worker thread started during the run was profiled too
+        assert "_busy_work" in profiler.logger.info.call_args[0][0]
+
+    def test_pool_threads_are_not_left_profiled(self, tmp_path) -> None:
+        profiler = _profiler(tmp_path, DETERMINISTIC, runs=1, every=1)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # The pool outlives the run and starts its threads during it
+            with profiler.profile():
+                futures = [executor.submit(profiled(_busy_work)) for _ in range(2)]
+                assert all(future.result() for future in futures)
+
+            assert "_busy_work" in profiler.logger.info.call_args[0][0]
+            assert [executor.submit(sys.getprofile).result() for _ in range(4)] == [
+                None
+            ] * 4
+        assert sys.getprofile() is None
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from external_import_connector.rate_limiter import (
+    RateLimiter,
+    TokenBucket,
+    is_rate_limit_error,
+)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class TestRateLimiter(object):
+    def test_bucket_blocks_once_burst_is_spent(self) -> None:
+        bucket = TokenBucket(rate_per_second=20, capacity=2)
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+
+        # Two tokens come from the burst, two are refilled at 20/s
+        assert time.monotonic() - start >= 0.09
+
+    def test_rate_limited_calls_are_retried(self) -> None:
+        limiter = RateLimiter(6000, 10, max_retries=3, base_delay=0.01)
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise RateLimitError("Too Many Requests")
+            return "ok"
+
+        assert limiter.call(flaky) == "ok"
+        assert len(calls) == 3
+        assert limiter.rate_limited == 2
+
+    def test_other_errors_are_not_retried(self) -> None:
+        limiter = RateLimiter(6000, 10, max_retries=3, base_delay=0.01)
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise ValueError("bad input")
+
+        with pytest.raises(ValueError):
+            limiter.call(broken)
+        assert len(calls) == 1
+
+    def test_rate_limit_errors_are_recognized(self) -> None:
+        assert is_rate_limit_error(RateLimitError("slow down"))
+        assert is_rate_limit_error(Exception("Rate limit reached for requests"))
+        assert is_rate_limit_error(Exception("Too Many Requests"))
+        assert not is_rate_limit_error(Exception("CVE-2024-4290 not found"))
+        assert not is_rate_limit_error(Exception("record 4291 failed"))
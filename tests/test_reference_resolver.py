@@ -0,0 +1,85 @@
+import json
+from unittest.mock import MagicMock
+
+from external_import_connector.stix.opencti_handler import OpenCTIHandler
+from external_import_connector.stix.reference_resolver import resolve_references
+
+MARKING = "marking-definition--94868c89-83c2-464b-929b-a1a8aa3c8487"
+
+
+def _bundle(*objects):
+    return json.dumps({"type": "bundle", "id": "bundle--1", "objects": list(objects)})
+
+
+def _relationship(rel_id, source, target):
+    return {
+        "type": "relationship",
+        "id": rel_id,
+        "relationship_type": "related-to",
+        "source_ref": source,
+        "target_ref": target,
+    }
+
+
+class TestReferenceResolver(object):
+    def test_consistent_bundle_is_unchanged(self) -> None:
+        bundle = _bundle(
+            {"type": "url", "id": "url--1", "object_marking_refs": [MARKING]},
+            {"type": "url", "id": "url--2"},
+            _relationship("relationship--1", "url--1", "url--2"),
+        )
+        lookups = []
+
+        resolved, stats = resolve_references(
+            bundle, lambda ids: lookups.append(ids) or {MARKING}
+        )
+
+        assert resolved == bundle
+        assert lookups == [[MARKING]]
+        assert stats == {"dropped_objects": 0, "pruned_refs": 0}
+
+    def test_dangling_references_are_removed(self) -> None:
+        bundle = _bundle(
+            {
+                "type": "report",
+                "id": "report--1",
+                "created_by_ref": "identity--gone",
+                "object_refs": ["url--1", "relationship--1", "relationship--2"],
+            },
+            {"type": "url", "id": "url--1"},
+            _relationship("relationship--1", "url--1", "indicator--gone"),
+            # Only reachable through the relationship that gets dropped
+            _relationship("relationship--2", "url--1", "relationship--1"),
+        )
+
+        resolved, stats = resolve_references(bundle, lambda ids: set())
+        objects = {obj["id"]: obj for obj in json.loads(resolved)["objects"]}
+
+        assert set(objects) == {"report--1", "url--1"}
+        assert "created_by_ref" not in objects["report--1"]
+        assert objects["report--1"]["object_refs"] == ["url--1"]
+        assert stats == {"dropped_objects": 2, "pruned_refs": 2}
+
+
+class TestExistingIds(object):
+    def test_ids_known_as_aliases_exist(self) -> None:
+        """
+        Refs OpenCTI knows through x_opencti_stix_ids count as existing
+        """
+        helper = MagicMock()
+        helper.api.stix_core_object.list.return_value = [
+            {
+                "id": "internal-1",
+                "standard_id": "url--1",
+                "x_opencti_stix_ids": ["url--old"],
+            }
+        ]
+        handler = OpenCTIHandler(MagicMock(), helper)
+
+        existing = handler._existing_ids(["url--1", "url--old", "url--2"])
+
+        assert {"url--1", "url--old"} <= existing
+        assert "url--2" not in existing
+        assert "x_opencti_stix_ids" in (
+            helper.api.stix_core_object.list.call_args.kwargs["customAttributes"]
+        )
@@ -0,0 +1,51 @@
+from external_import_connector.run_budget import RunBudget
+
+
+def _records(*ids):
+    return [{"id": record_id} for record_id in ids]
+
+
+class TestRunBudget(object):
+    def test_select_continues_after_cursor_and_wraps(self) -> None:
+        budget = RunBudget(0, 3)
+        selected = budget.select(_records(5, 1, 9, 3, 7), cursor=5)
+        assert [r["id"] for r in selected] == [7, 9, 1]
+
+    def test_admit_stops_at_record_budget(self) -> None:
+        budget = RunBudget(0, 2)
+        admitted = list(budget.admit(_records(1, 2, 3)))
+        assert [r["id"] for r in admitted] == [1, 2]
+        assert budget.stopped
+
+    def test_admit_stops_at_deadline(self) -> None:
+        budget = RunBudget(0.001, 0)
+        budget.started -= 1
+        assert list(budget.admit(_records(1, 2))) == []
+        assert budget.stopped
+
+    def test_cursor_stops_at_first_record_not_reached(self) -> None:
+        budget = RunBudget(0, 4)
+        selected = budget.select(_records(1, 2, 3, 4), cursor=None)
+        # Priority scheduling admitted 3 ahead of 2 before the deadline
+        budget.admitted = [1, 3]
+        assert budget.cursor(selected, previous=None) == 1
+        budget.admitted = [1, 2, 3, 4]
+        assert budget.cursor(selected, previous=None) == 4
+        budget.admitted = []
+        assert budget.cursor(selected, previous=8) == 8
+
+    def test_select_takes_highest_priority_records(self) -> None:
+        budget = RunBudget(0, 3)
+        priority = {1: 0, 3: 2, 5: 1, 7: 1, 9: 0}
+
+        def order(records):
+            return sorted(records, key=lambda r: -priority[r["id"]])
+
+        selected = budget.select(_records(1, 3, 5, 7, 9), cursor=5, order=order)
+
+        # 5 and 7 rank equal: 7 comes after the cursor, so it goes first
+        assert [r["id"] for r in selected] == [3, 7, 5]
+
+        budget.admitted = [3, 7]
+        # In cursor order the selection is 7, 3, 5: 5 was not reached
+        assert budget.cursor(selected, previous=5) == 3
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from external_import_connector.scheduling import PriorityScheduler, meets_criteria
+
+NOW = datetime(2025, 1, 10, 12, 0)
+EXPLOIT = {"category": "Exploit", "confidence": 0.95}
+OTHER = {"category": "Other", "confidence": 0.9}
+
+
+def _record(record_id, age_hours=0, keywords="", sent_to_deepseek=False):
+    return {
+        "id": record_id,
+        "keywords": keywords,
+        "timestamp": NOW - timedelta(hours=age_hours),
+        "sent_to_deepseek": sent_to_deepseek,
+    }
+
+
+class TestPriorityScheduler(object):
+    def test_meets_criteria(self) -> None:
+        assert meets_criteria(EXPLOIT, EXPLOIT)
+        assert not meets_criteria(EXPLOIT, OTHER)
+        assert not meets_criteria(EXPLOIT, None)
+
+    def test_fast_lane_comes_first(self) -> None:
+        scheduler = PriorityScheduler(24, 0.05)
+        records = [_record(1), _record(2, age_hours=500), _record(3, age_hours=900)]
+        records[2]["sent_to_deepseek"] = True
+        ordered = scheduler.order(records, {2: EXPLOIT}, {2: EXPLOIT}, NOW)
+        assert [r["id"] for r in ordered] == [3, 2, 1]
+
+    def test_score_prefers_recent_likely_exploits(self) -> None:
+        scheduler = PriorityScheduler(24, 0.0)
+        records = [
+            _record(1, age_hours=48),
+            _record(2),
+            _record(3, keywords="exploit,rce,0day"),
+            _record(4, keywords="exploit,rce,0day"),
+        ]
+        ordered = scheduler.order(records, {4: OTHER}, {}, NOW)
+        assert [r["id"] for r in ordered] == [3, 2, 4, 1]
+
+    def test_aging_prevents_starvation(self) -> None:
+        records = [_record(1), _record(2, age_hours=24 * 60)]
+        fresh_first = PriorityScheduler(24, 0.0).order(records, {}, {}, NOW)
+        assert [r["id"] for r in fresh_first] == [1, 2]
+        aged_first = PriorityScheduler(24, 0.05).order(records, {}, {}, NOW)
+        assert [r["id"] for r in aged_first] == [2, 1]
@@ -0,0 +1,41 @@
+import json
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from external_import_connector.tracing import (
+    RECORD_ID,
+    JsonLinesSpanExporter,
+    create_exporter,
+)
+
+
+class TestTracing(object):
+    def test_jsonl_exporter_writes_one_span_per_line(self, tmp_path) -> None:
+        path = tmp_path / "spans.jsonl"
+        exporter = JsonLinesSpanExporter(str(path))
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        tracer = provider.get_tracer("test")
+
+        with tracer.start_as_current_span(
+            "txt2stix.convert", attributes={RECORD_ID: 7}
+        ):
+            with tracer.start_as_current_span("txt2stix.subprocess"):
+                pass
+        provider.shutdown()
+
+        child, parent = [json.loads(line) for line in path.read_text().splitlines()]
+        assert parent["name"] == "txt2stix.convert"
+        assert parent["attributes"] == {RECORD_ID: 7}
+        assert child["parent_id"] == parent["span_id"]
+        assert child["trace_id"] == parent["trace_id"]
+        assert parent["duration_ms"] >= child["duration_ms"] >= 0
+
+    def test_create_exporter(self) -> None:
+        assert create_exporter("none", "unused") is None
+        exporter = create_exporter(
+            "opentelemetry.sdk.trace.export.in_memory_span_exporter:InMemorySpanExporter",
+            "unused",
+        )
+        assert type(exporter).__name__ == "InMemorySpanExporter"
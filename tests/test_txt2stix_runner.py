@@ -0,0 +1,165 @@
+import textwrap
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from external_import_connector.rate_limiter import RateLimiter
+from external_import_connector.stix_converter import StixConverter
+
+# Stand-in for the txt2stix package: the worker puts its working directory
+# first on sys.path, so this is what it imports there. Only the calls the
+# runner makes are answered; check_content goes through the AI wrappers and
+# is rejected with a 429 once when the text asks for it.
+FAKE_TXT2STIX = {
+    "__init__.py": "",
+    "extractions.py": """
+        def parse_extraction_config(path):
+            return {}
+    """,
+    "utils.py": """
+        def remove_links(text, images, anchors):
+            return text
+    """,
+    "txt2stix.py": """
+        import json
+
+        from pydantic import BaseModel
+
+        INCLUDES_PATH = "includes"
+
+
+        class ContentCheck(BaseModel):
+            describes_incident: bool
+
+
+        class RateLimitError(Exception):
+            status_code = 429
+
+
+        class Model:
+            busy = True
+
+            def check_content(self, text):
+                if "busy" in text and Model.busy:
+                    Model.busy = False
+                    raise RateLimitError("Too Many Requests")
+                return ContentCheck(describes_incident="exploit" in text)
+
+            def extract_objects(self, text, extractors):
+                return None
+
+            def extract_relationships(self, text, extractions, types):
+                return None
+
+            def extract_attack_flow(self, text, extractions, relationships):
+                return None
+
+
+        class Data(BaseModel):
+            content_check: ContentCheck
+
+
+        class Bundle:
+            def __init__(self, report_id):
+                self.report_id = report_id
+
+            def serialize(self):
+                return json.dumps(
+                    {"type": "bundle", "id": f"bundle--{self.report_id}", "objects": []}
+                )
+
+
+        class txt2stixBundler:
+            def __init__(self, name, *args, report_id=None, **kwargs):
+                self.bundle = Bundle(report_id)
+
+
+        def parse_extractors_globbed(kind, extractors, names):
+            return {}
+
+
+        def parse_model(provider):
+            return Model()
+
+
+        def load_env():
+            pass
+
+
+        def run_txt2stix(bundler, text, extractors, ai_content_check_provider, **kwargs):
+            return Data(content_check=ai_content_check_provider.check_content(text))
+    """,
+}
+
+
+class CountingRateLimiter(RateLimiter):
+    """Records the tokens handed out"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = []
+
+    def acquire(self, tokens: float = 1) -> None:
+        super().acquire(tokens)
+        self.acquired.append(tokens)
+
+
+def _converter(tmp_path):
+    package = tmp_path / "txt2stix"
+    package.mkdir()
+    for name, source in FAKE_TXT2STIX.items():
+        (package / name).write_text(textwrap.dedent(source))
+    config = SimpleNamespace(
+        deepseek_requests_per_minute=600,
+        deepseek_burst=5,
+        deepseek_max_retries=1,
+        llm_cache_enabled=True,
+        llm_cache_path=str(tmp_path / "llm_cache.sqlite"),
+        llm_cache_max_mb=1,
+        temperature=0,
+        deepseek_api_key="",
+        input_token_limit=1000,
+        ctibutler_base_url="",
+        ctibutler_api_key="",
+        vulmatch_base_url="",
+        vulmatch_api_key="",
+    )
+    converter = StixConverter(config, MagicMock())
+    converter.rate_limiter = CountingRateLimiter(
+        6000, 10, max_retries=1, base_delay=0.01
+    )
+    return converter, converter.rate_limiter.acquired
+
+
+REPORT_ID = "9f6a4c1e-0000-4000-8000-000000000001"
+
+
+class TestTxt2StixWorker(object):
+    def test_worker_script_returns_a_result(self, tmp_path) -> None:
+        converter, acquired = _converter(tmp_path)
+        record = {"id": 1, "html": "new exploit for the panel"}
+
+        stix_data, bundle = converter.convert(REPORT_ID, record, str(tmp_path))
+        assert stix_data == {"content_check": {"describes_incident": True}}
+        assert (
+            bundle
+            == f'{{"type": "bundle", "id": "bundle--{REPORT_ID}", "objects": []}}'
+        )
+        assert converter.llm_cache.stats() == {"hits": 0, "misses": 1}
+        # The worker's only DeepSeek call took its token in this process
+        assert acquired == [1]
+
+        # The second worker answers the content check from the shared cache
+        converter.convert(REPORT_ID, record, str(tmp_path))
+        assert converter.llm_cache.stats() == {"hits": 1, "misses": 1}
+        assert acquired == [1]
+
+    def test_worker_rate_limits_pause_this_process(self, tmp_path) -> None:
+        converter, acquired = _converter(tmp_path)
+        record = {"id": 1, "html": "busy exploit"}
+
+        stix_data, _ = converter.convert(REPORT_ID, record, str(tmp_path))
+
+        assert stix_data == {"content_check": {"describes_incident": True}}
+        assert converter.rate_limiter.rate_limited == 1
+        # The retry took a token of its own
+        assert acquired == [1, 1]